@@ -1,6 +1,11 @@
 # ML/dtypes.py
 import pandas as pd
 
+
+class UnknownCategoryError(ValueError):
+    """A categorical value that was not seen in training (strict: requests carrying one are rejected)."""
+
+
 def cast_fn(df, cats=None, num_cols=None, all_cols=None, categorical_col="type"):
     df = pd.DataFrame(df).copy()
 
@@ -16,7 +21,7 @@ def cast_fn(df, cats=None, num_cols=None, all_cols=None, categorical_col="type")
             if df[categorical_col].isna().any():
                 unseen = sorted(set(df[categorical_col].astype(str).unique()) - set(cats))
                 if unseen:
-                    raise ValueError(f"Unknown category in '{categorical_col}': {unseen}. Allowed: {cats}")
+                    raise UnknownCategoryError(f"Unknown category in '{categorical_col}': {unseen}. Allowed: {cats}")
         else:
             df[categorical_col] = df[categorical_col].astype("category")
 
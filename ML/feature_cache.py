@@ -0,0 +1,141 @@
+# ML/feature_cache.py
+"""
+Content-addressed on-disk cache for the training feature matrix.
+
+An entry is a directory of one ``.npy`` file per column (categoricals as codes
+plus their categories in ``meta.json``), so a warm run memory-maps the columns
+instead of re-reading the CSV and rebuilding the temporal features. The key
+hashes the input file's contents, ``FEATURES_VERSION`` and the requested
+columns: editing the data or the feature builder invalidates the entry by
+construction. Entries are evicted least-recently-used once the cache grows
+past ``max_bytes``.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ML.features import FEATURES_VERSION
+
+META = "meta.json"
+_HASHES = "source_hashes.json"  # (path, size, mtime) -> sha256, so unchanged inputs aren't re-hashed
+
+
+class FeatureCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    # ── keys ──────────────────────────────────────────────────────────────────
+    def source_digest(self, path: str) -> str:
+        """sha256 of the input file, memoised on (path, size, mtime)."""
+        st = os.stat(path)
+        stamp = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+        memo_path = os.path.join(self.root, _HASHES)
+        try:
+            with open(memo_path) as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            memo = {}
+        if stamp not in memo:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 22), b""):
+                    h.update(block)
+            memo = {k: v for k, v in memo.items() if not k.startswith(f"{os.path.abspath(path)}|")}
+            memo[stamp] = h.hexdigest()
+            _write_json(memo_path, memo)
+        return memo[stamp]
+
+    def key(self, path: str, columns: List[str]) -> str:
+        spec = {"source": self.source_digest(path), "features_version": FEATURES_VERSION, "columns": list(columns)}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:32]
+
+    # ── read ──────────────────────────────────────────────────────────────────
+    def load(self, key: str) -> Optional[pd.DataFrame]:
+        """Memory-mapped DataFrame for ``key``, or None on a miss."""
+        entry = os.path.join(self.root, key)
+        try:
+            with open(os.path.join(entry, META)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        data = {}
+        for col in meta["columns"]:
+            values = np.asarray(np.load(os.path.join(entry, col["file"]), mmap_mode="c"))  # copy-on-write view of the map
+            if "categories" in col:
+                values = pd.Categorical.from_codes(values, categories=col["categories"])
+            data[col["name"]] = values
+        meta["last_used"] = time.time()
+        _write_json(os.path.join(entry, META), meta)
+        return pd.DataFrame(data, copy=False)
+
+    # ── write ─────────────────────────────────────────────────────────────────
+    def store(self, key: str, df: pd.DataFrame, source: str = "") -> None:
+        """Persists ``df`` under ``key`` (atomically) and evicts old entries past the size cap."""
+        staging = tempfile.mkdtemp(dir=self.root, prefix=".staging.")
+        try:
+            columns, size = [], 0
+            for i, name in enumerate(df.columns):
+                s = df[name]
+                col: Dict = {"name": name, "file": f"{i:03d}.npy"}
+                if isinstance(s.dtype, pd.CategoricalDtype):
+                    values = s.cat.codes.to_numpy()
+                    col["categories"] = [str(c) for c in s.cat.categories]
+                else:
+                    values = s.to_numpy()
+                np.save(os.path.join(staging, col["file"]), values, allow_pickle=False)
+                size += values.nbytes
+                columns.append(col)
+            now = time.time()
+            _write_json(os.path.join(staging, META), {
+                "key": key, "source": source, "features_version": FEATURES_VERSION, "rows": len(df),
+                "bytes": size, "columns": columns, "created_at": now, "last_used": now,
+            })
+            target = os.path.join(self.root, key)
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self.evict(protect=key)
+
+    def entries(self) -> List[Dict]:
+        out = []
+        for name in os.listdir(self.root):
+            try:
+                with open(os.path.join(self.root, name, META)) as f:
+                    out.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return out
+
+    def evict(self, protect: str = "") -> List[str]:
+        """Drops least-recently-used entries until the cache fits in ``max_bytes``."""
+        entries = sorted(self.entries(), key=lambda m: m.get("last_used", 0))
+        total = sum(m["bytes"] for m in entries)
+        removed = []
+        for m in entries:
+            if total <= self.max_bytes:
+                break
+            if m["key"] == protect:
+                continue
+            shutil.rmtree(os.path.join(self.root, m["key"]), ignore_errors=True)
+            total -= m["bytes"]
+            removed.append(m["key"])
+        return removed
+
+
+def _write_json(path: str, obj) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
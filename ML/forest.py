@@ -0,0 +1,207 @@
+# ML/forest.py
+"""
+Flattened tree ensembles + a batched NumPy scorer.
+
+``export_forest(pipe)`` turns the estimator inside a pipeline produced by
+ML/train.py (XGBClassifier or RandomForestClassifier) into one set of
+contiguous node arrays shared by every tree. ``FlatForest.predict_proba``
+walks all (row, tree) pairs level by level, so a batch costs ``max_depth``
+vectorised steps instead of per-tree Python dispatch.
+
+Usage (offline export):
+    python -m ML.forest model/pipeline.joblib model/forest.npz
+"""
+import json
+import sys
+from typing import Optional
+
+import numpy as np
+
+_ARRAYS = ("feature", "threshold", "left", "right", "default_left", "is_cat", "cat_mask", "value", "roots")
+
+
+class FlatForest:
+    """
+    Node arrays (one entry per node across all trees):
+      feature       split feature index (-1 on leaves)
+      threshold     numeric split value
+      left, right   child node ids (-1 on leaves)
+      default_left  direction for missing values
+      is_cat        categorical split flag
+      cat_mask      categorical split set as a bitmask over category codes (in set -> right)
+      value         leaf output (XGB margin contribution, or RF class-1 probability)
+    ``roots`` holds the root node id of each tree.
+
+    ``kind`` selects the split rule and aggregation: "xgb" goes left on
+    ``x < threshold`` and applies a sigmoid to ``base_margin + sum(leaves)``;
+    "rf" goes left on ``x <= threshold`` and averages the leaves.
+    """
+
+    def __init__(self, kind: str, feature, threshold, left, right, default_left, is_cat, cat_mask,
+                 value, roots, base_margin: float = 0.0, max_depth: Optional[int] = None):
+        self.kind = kind
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.default_left = np.ascontiguousarray(default_left, dtype=bool)
+        self.is_cat = np.ascontiguousarray(is_cat, dtype=bool)
+        self.cat_mask = np.ascontiguousarray(cat_mask, dtype=np.uint64)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.base_margin = float(base_margin)
+        self.max_depth = int(max_depth) if max_depth is not None else self._depth()
+        self._has_cat = bool(self.is_cat.any())
+        # Traversal copies where leaves loop back to themselves, so every (row, tree)
+        # pair can take exactly max_depth steps without tracking which ones finished.
+        leaf = self.left < 0
+        own = np.arange(len(self.left), dtype=np.intp)
+        self._step_left = np.where(leaf, own, self.left).astype(np.intp)
+        self._step_right = np.where(leaf, own, self.right).astype(np.intp)
+        self._step_feature = np.where(leaf, 0, self.feature).astype(np.intp)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def _depth(self) -> int:
+        depth, frontier = 0, self.roots
+        while True:
+            internal = frontier[self.left[frontier] >= 0]
+            if not len(internal):
+                return depth
+            frontier = np.concatenate([self.left[internal], self.right[internal]])
+            depth += 1
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class-1 probability for a float32 matrix in the estimator's input layout."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, d = X.shape
+        flat = X.ravel()
+        offsets = np.repeat(np.arange(n, dtype=np.intp) * d, self.n_trees)
+        node = np.tile(self.roots.astype(np.intp), n)
+        strict = self.kind == "xgb"
+        for _ in range(self.max_depth):
+            x = flat[offsets + self._step_feature[node]]
+            go_left = x < self.threshold[node] if strict else x <= self.threshold[node]
+            if self._has_cat:
+                cat = self.is_cat[node]
+                valid = cat & (x >= 0) & (x < 64)  # NaN/out-of-range categories go left
+                code = np.where(valid, x, 0).astype(np.uint64)
+                in_set = ((self.cat_mask[node] >> code) & np.uint64(1)).astype(bool)
+                go_left = np.where(cat, ~(valid & in_set), go_left)
+            go_left = np.where(np.isnan(x), self.default_left[node], go_left)
+            node = np.where(go_left, self._step_left[node], self._step_right[node])
+
+        leaves = self.value[node].reshape(n, self.n_trees)
+        if self.kind == "xgb":
+            margin = self.base_margin + leaves.sum(axis=1)
+            return (1.0 / (1.0 + np.exp(-margin))).astype(np.float32)
+        return leaves.mean(axis=1)
+
+    # --- persistence ---
+    def save(self, path: str) -> None:
+        np.savez(path, kind=self.kind, base_margin=self.base_margin, max_depth=self.max_depth,
+                 **{k: getattr(self, k) for k in _ARRAYS})
+
+    @classmethod
+    def load(cls, path: str) -> "FlatForest":
+        with np.load(path) as z:
+            return cls(str(z["kind"]), *(z[k] for k in _ARRAYS),
+                       base_margin=float(z["base_margin"]), max_depth=int(z["max_depth"]))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Exporters
+# ──────────────────────────────────────────────────────────────────────────────
+def _from_xgb(estimator) -> Optional[FlatForest]:
+    booster = estimator.get_booster()
+    model = json.loads(booster.save_raw("json"))["learner"]
+    if model["objective"]["name"] != "binary:logistic":
+        return None
+    gbm = model["gradient_booster"]["model"]
+
+    try:
+        n_trees = int(estimator.best_iteration) + 1
+    except AttributeError:
+        n_trees = len(gbm["trees"])
+    trees = gbm["trees"][:n_trees]
+
+    cols = {k: [] for k in _ARRAYS}
+    offset = 0
+    for t in trees:
+        left = np.asarray(t["left_children"], dtype=np.int32)
+        right = np.asarray(t["right_children"], dtype=np.int32)
+        leaf = left < 0
+        n_nodes = len(left)
+        cat_mask = np.zeros(n_nodes, dtype=np.uint64)
+        for nid, seg, size in zip(t["categories_nodes"], t["categories_segments"], t["categories_sizes"]):
+            cats = t["categories"][seg:seg + size]
+            if any(c >= 64 for c in cats):
+                return None
+            cat_mask[nid] = np.bitwise_or.reduce([np.uint64(1) << np.uint64(c) for c in cats] or [np.uint64(0)])
+
+        cols["feature"].append(np.where(leaf, -1, t["split_indices"]))
+        # leaf values live in split_conditions; keep float32 thresholds exactly
+        cond = np.asarray(t["split_conditions"], dtype=np.float32)
+        cols["threshold"].append(np.where(leaf, 0.0, cond))
+        cols["value"].append(np.where(leaf, cond, 0.0))
+        cols["left"].append(np.where(leaf, -1, left + offset))
+        cols["right"].append(np.where(leaf, -1, right + offset))
+        cols["default_left"].append(np.asarray(t["default_left"], dtype=bool))
+        cols["is_cat"].append(np.asarray(t["split_type"], dtype=bool))
+        cols["cat_mask"].append(cat_mask)
+        cols["roots"].append([offset])
+        offset += n_nodes
+
+    base_score = float(model["learner_model_param"]["base_score"])
+    base_margin = float(np.log(base_score / (1.0 - base_score)))
+    return FlatForest("xgb", *(np.concatenate(cols[k]) for k in _ARRAYS), base_margin=base_margin)
+
+
+def _from_sklearn_forest(estimator) -> Optional[FlatForest]:
+    if list(estimator.classes_) != [0, 1]:
+        return None
+    cols = {k: [] for k in _ARRAYS}
+    offset = 0
+    for tree in estimator.estimators_:
+        t = tree.tree_
+        left = t.children_left.astype(np.int32)
+        leaf = left < 0
+        counts = t.value[:, 0, :]
+        proba1 = counts[:, 1] / counts.sum(axis=1)
+        n_nodes = t.node_count
+        missing_left = getattr(t, "missing_go_to_left", np.zeros(n_nodes, dtype=np.uint8))
+
+        cols["feature"].append(np.where(leaf, -1, t.feature))
+        cols["threshold"].append(np.where(leaf, 0.0, t.threshold))
+        cols["value"].append(np.where(leaf, proba1, 0.0))
+        cols["left"].append(np.where(leaf, -1, left + offset))
+        cols["right"].append(np.where(leaf, -1, t.children_right + offset))
+        cols["default_left"].append(np.asarray(missing_left, dtype=bool))
+        cols["is_cat"].append(np.zeros(n_nodes, dtype=bool))
+        cols["cat_mask"].append(np.zeros(n_nodes, dtype=np.uint64))
+        cols["roots"].append([offset])
+        offset += n_nodes
+    return FlatForest("rf", *(np.concatenate(cols[k]) for k in _ARRAYS))
+
+
+def export_forest(pipe) -> Optional[FlatForest]:
+    """Flatten the pipeline's final estimator, or None if it isn't a supported tree ensemble."""
+    estimator = pipe.named_steps["model"] if hasattr(pipe, "named_steps") else pipe
+    if hasattr(estimator, "get_booster"):
+        return _from_xgb(estimator)
+    if hasattr(estimator, "estimators_") and hasattr(estimator.estimators_[0], "tree_"):
+        return _from_sklearn_forest(estimator)
+    return None
+
+
+if __name__ == "__main__":
+    import joblib
+
+    src, dst = sys.argv[1], sys.argv[2]
+    forest = export_forest(joblib.load(src))
+    if forest is None:
+        raise SystemExit(f"{src}: unsupported estimator for export.")
+    forest.save(dst)
+    print(f"[OK] Exported {forest.n_trees} trees ({len(forest.feature)} nodes, depth {forest.max_depth}) to {dst}")
@@ -0,0 +1,143 @@
+# ML/native_artifact.py
+"""
+Compact native artifact for XGBoost pipelines.
+
+An uncompressed tar with two members:
+
+    manifest.json   feature order, category list, decision threshold, best iteration, booster checksum
+    booster.ubj     the booster in XGBoost's binary (UBJSON) format
+
+Loading it needs only xgboost and the manifest: nothing is unpickled, so the
+service doesn't import joblib or rebuild a sklearn Pipeline at startup, and the
+artifact doesn't depend on the sklearn/xgboost class layout of the training
+environment. ``NativeXGBModel`` exposes the parts of the pipeline the API uses
+(``raw_feature_names_in_``, ``type_categories_``, ``predict`` /
+``predict_proba`` on DataFrames with the same strict casting as ``cast_fn``,
+``get_booster``). Random forests have no native form; they keep the joblib
+artifact.
+"""
+import hashlib
+import io
+import json
+import os
+import tarfile
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from ML.dtypes import UnknownCategoryError
+
+FORMAT = "fraud-native-xgb"
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+BOOSTER = "booster.ubj"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Write (ML/train.py)
+# ──────────────────────────────────────────────────────────────────────────────
+def save_native(pipe: Any, path: str, threshold: float = 0.5) -> Optional[str]:
+    """Writes the native artifact for an XGB pipeline from ML/train.py; returns None for other models."""
+    steps = getattr(pipe, "named_steps", None)
+    if steps is None or "preprocessor" in steps or not hasattr(steps.get("model"), "get_booster"):
+        return None
+    import xgboost as xgb
+
+    estimator = steps["model"]
+    booster = bytes(estimator.get_booster().save_raw(raw_format="ubj"))
+    try:
+        best_iteration = int(estimator.best_iteration)
+    except AttributeError:
+        best_iteration = None  # no early stopping: every tree counts
+    manifest = {
+        "format": FORMAT,
+        "format_version": FORMAT_VERSION,
+        "features": [str(c) for c in pipe.raw_feature_names_in_],
+        "categorical_col": "type",
+        "categories": [str(c) for c in pipe.type_categories_],
+        "threshold": threshold,
+        "best_iteration": best_iteration,
+        "booster_sha256": hashlib.sha256(booster).hexdigest(),
+        "xgboost_version": xgb.__version__,
+        "created_at": time.time(),
+    }
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with tarfile.open(tmp, "w") as tar:
+        for name, data in ((MANIFEST, json.dumps(manifest, indent=2).encode()), (BOOSTER, booster)):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(manifest["created_at"])
+            tar.addfile(info, io.BytesIO(data))
+    os.replace(tmp, path)
+    return path
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Read (app/main.py)
+# ──────────────────────────────────────────────────────────────────────────────
+def is_native_artifact(path: str) -> bool:
+    """True for a native artifact; pickled pipelines are never valid tar files."""
+    return tarfile.is_tarfile(path)
+
+
+def load_native(path: str) -> "NativeXGBModel":
+    with tarfile.open(path, "r") as tar:
+        manifest = json.loads(tar.extractfile(MANIFEST).read())
+        booster_raw = tar.extractfile(BOOSTER).read()
+    if manifest.get("format") != FORMAT or manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported artifact format {manifest.get('format')}/{manifest.get('format_version')}")
+    if hashlib.sha256(booster_raw).hexdigest() != manifest["booster_sha256"]:
+        raise ValueError(f"{path}: booster checksum does not match the manifest")
+
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(bytearray(booster_raw))
+    return NativeXGBModel(booster, manifest)
+
+
+class NativeXGBModel:
+    """A booster plus its manifest, standing in for the sklearn pipeline at serving time."""
+
+    def __init__(self, booster: Any, manifest: Dict[str, Any]):
+        self.booster = booster
+        self.manifest = manifest
+        self.features = list(manifest["features"])
+        self.categorical_col = manifest["categorical_col"]
+        self.numeric_cols = [c for c in self.features if c != self.categorical_col]
+        self.threshold = float(manifest["threshold"])
+        self.raw_feature_names_in_ = np.asarray(self.features, dtype=object)
+        self.type_categories_ = list(manifest["categories"])
+        if manifest.get("best_iteration") is not None:
+            self.best_iteration = int(manifest["best_iteration"])
+        self.iteration_range = (0, self.best_iteration + 1) if hasattr(self, "best_iteration") else (0, 0)
+
+    def get_booster(self) -> Any:
+        return self.booster
+
+    def _matrix(self, df: pd.DataFrame) -> np.ndarray:
+        """DataFrame -> float32 matrix in feature order, category codes in place (strict like cast_fn)."""
+        cats = self.type_categories_
+        col = self.categorical_col
+        codes = pd.Categorical(df[col], categories=cats).codes
+        if (codes < 0).any():
+            unseen = sorted(set(df[col].astype(str).unique()) - set(cats))
+            if unseen:
+                raise UnknownCategoryError(f"Unknown category in '{col}': {unseen}. Allowed: {cats}")
+        X = np.empty((len(df), len(self.features)), dtype=np.float32)
+        for j, c in enumerate(self.features):
+            if c == col:
+                X[:, j] = np.where(codes < 0, np.nan, codes)
+            else:
+                X[:, j] = pd.to_numeric(df[c], errors="raise")
+        return X
+
+    def predict_proba(self, df: pd.DataFrame) -> np.ndarray:
+        p = self.booster.inplace_predict(self._matrix(df), iteration_range=self.iteration_range)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        return (self.predict_proba(df)[:, 1] > self.threshold).astype(np.int64)
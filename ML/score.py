@@ -0,0 +1,238 @@
+# ML/score.py
+"""
+Offline batch scoring of large CSV / Parquet files with a trained pipeline.
+
+    python -m ML.score --input data/scored_input.csv --output out/scores --workers 8
+
+The input must carry the serving contract (``pipe.raw_feature_names_in_``),
+i.e. the temporal features are already computed (``ML.features``); rows are
+scored independently so chunks can go to any worker.
+
+Output is a directory of Parquet parts, one per input chunk, in input order
+(``part-000000.parquet``, ...). Each row has its global ``row`` index,
+``prediction`` and ``probability`` (null for rows whose ``type`` the model
+has never seen) plus any ``--keep-columns``. A part is written atomically when
+its chunk is done, so rerunning the same command after a crash only scores
+the missing chunks.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from ML.threads import pin_model_threads
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Configuration
+# ──────────────────────────────────────────────────────────────────────────────
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL = os.path.join(BASE_DIR, "model", "pipeline.joblib")
+DEFAULT_CHUNK_ROWS = 250_000
+MANIFEST = "_job.json"
+SUCCESS = "_SUCCESS"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Input: chunked CSV (memory-mapped) or Parquet
+# ──────────────────────────────────────────────────────────────────────────────
+def _is_parquet(path: str) -> bool:
+    return path.endswith((".parquet", ".pq"))
+
+
+def iter_chunks(path: str, columns: List[str], chunk_rows: int, features: List[str],
+                categorical_col: str = "type") -> Iterator[pd.DataFrame]:
+    """Yields DataFrames of at most ``chunk_rows`` rows; chunk boundaries depend only on the input and ``chunk_rows``."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(path, memory_map=True)
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        dtypes = {c: ("category" if c == categorical_col else "float32") for c in features}
+        yield from pd.read_csv(path, usecols=columns, dtype=dtypes, memory_map=True, chunksize=chunk_rows)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Worker side: model loaded once per process
+# ──────────────────────────────────────────────────────────────────────────────
+_pipe = None
+_features: List[str] = []
+_categories: List[str] = []
+
+
+def _init_worker(model_path: str, threads: int) -> None:
+    from threadpoolctl import threadpool_limits
+
+    global _pipe, _features, _categories
+    threadpool_limits(threads)  # BLAS/OpenMP pools in this process
+    _pipe = joblib.load(model_path)
+    pin_model_threads(_pipe, threads)  # the artifact was trained with n_jobs=-1
+    _features = list(_pipe.raw_feature_names_in_)
+    _categories = list(getattr(_pipe, "type_categories_", None) or [])
+
+
+def score_frame(pipe, features: List[str], categories: List[str], df: pd.DataFrame,
+                categorical_col: str = "type") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (prediction, probability) for every row of ``df``. Rows with an unseen
+    category get -1 / NaN instead of failing the chunk (``cast_fn`` is strict).
+    """
+    X = df[features]
+    ok = np.ones(len(X), dtype=bool)
+    if categories and categorical_col in X:
+        ok = X[categorical_col].isin(categories).to_numpy()
+    proba = np.full(len(X), np.nan, dtype=np.float64)
+    if ok.any():
+        proba[ok] = pipe.predict_proba(X[ok] if not ok.all() else X)[:, -1]
+    pred = np.where(ok, proba > 0.5, -1).astype(np.int8)  # class 1 iff p > 0.5, same as predict()
+    return pred, proba
+
+
+def _part_name(chunk_id: int) -> str:
+    return f"part-{chunk_id:06d}.parquet"
+
+
+def _score_chunk(chunk_id: int, row_offset: int, df: pd.DataFrame, keep: List[str], out_dir: str) -> Tuple[int, int, int]:
+    """Scores one chunk and writes its part atomically; returns (chunk_id, rows, unscored rows)."""
+    pred, proba = score_frame(_pipe, _features, _categories, df)
+    out = pd.DataFrame({"row": np.arange(row_offset, row_offset + len(df), dtype=np.int64)})
+    for c in keep:
+        out[c] = df[c].to_numpy()
+    out["prediction"] = pd.Series(pred, dtype="Int8").mask(pred < 0)
+    out["probability"] = proba.astype(np.float32)
+
+    final = os.path.join(out_dir, _part_name(chunk_id))
+    tmp = f"{final}.{os.getpid()}.tmp"
+    out.to_parquet(tmp, index=False)
+    os.replace(tmp, final)
+    return chunk_id, len(df), int((pred < 0).sum())
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Driver: fan out, checkpoint, report
+# ──────────────────────────────────────────────────────────────────────────────
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _job_manifest(args, model_sha: str) -> Dict:
+    st = os.stat(args.input)
+    return {
+        "input": os.path.abspath(args.input),
+        "input_size": st.st_size,
+        "input_mtime": st.st_mtime,
+        "model_sha256": model_sha,
+        "chunk_rows": args.chunk_rows,
+        "keep_columns": args.keep_columns,
+    }
+
+
+def _prepare_output(out_dir: str, manifest: Dict, restart: bool) -> set:
+    """Returns the chunk ids already written by a previous run of the same job."""
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        if name.endswith(".tmp"):  # parts a crashed run was still writing
+            os.remove(os.path.join(out_dir, name))
+    path = os.path.join(out_dir, MANIFEST)
+    if os.path.exists(path) and not restart:
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            changed = sorted(k for k in manifest if previous.get(k) != manifest[k])
+            raise SystemExit(f"{out_dir} holds a different job (changed: {changed}); use --restart to overwrite.")
+    else:
+        for name in os.listdir(out_dir):
+            if name.startswith("part-") or name in (MANIFEST, SUCCESS):
+                os.remove(os.path.join(out_dir, name))
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=2)
+    return {int(n[5:11]) for n in os.listdir(out_dir) if n.startswith("part-") and n.endswith(".parquet")}
+
+
+def run(args) -> Dict:
+    pipe = joblib.load(args.model)
+    features = list(pipe.raw_feature_names_in_)
+    keep = [c for c in args.keep_columns.split(",") if c] if args.keep_columns else []
+    columns = list(dict.fromkeys(features + keep))
+
+    done = _prepare_output(args.output, _job_manifest(args, _file_sha256(args.model)), args.restart)
+    if os.path.exists(os.path.join(args.output, SUCCESS)):
+        print(f"[OK] {args.output} is already complete.")
+        return {}
+    if done:
+        print(f"[INFO] Resuming: {len(done)} chunks already scored.")
+    del pipe
+
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    print(f"[INFO] Scoring on {args.workers} workers x {threads} threads")
+
+    t0 = time.perf_counter()
+    rows = skipped_rows = unscored = 0
+    pending = set()
+    max_in_flight = 2 * args.workers  # bounds memory: chunks read ahead of the pool
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.model, threads)) as pool:
+        def drain(block_until: int) -> None:
+            nonlocal rows, unscored, pending
+            while len(pending) > block_until:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    _, n, bad = fut.result()
+                    rows += n
+                    unscored += bad
+                elapsed = time.perf_counter() - t0
+                print(f"[INFO] {rows:,} rows scored, {rows / elapsed:,.0f} rows/s", flush=True)
+
+        offset = 0
+        for chunk_id, df in enumerate(iter_chunks(args.input, columns, args.chunk_rows, features)):
+            if chunk_id in done:
+                skipped_rows += len(df)
+            else:
+                pending.add(pool.submit(_score_chunk, chunk_id, offset, df, keep, args.output))
+                drain(max_in_flight)
+            offset += len(df)
+        drain(0)
+
+    elapsed = time.perf_counter() - t0
+    summary = {
+        "rows": offset,
+        "scored_this_run": rows,
+        "resumed_rows": skipped_rows,
+        "unknown_category_rows": unscored,
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(rows / elapsed, 1) if elapsed > 0 else None,
+    }
+    with open(os.path.join(args.output, SUCCESS), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"[OK] Scored {rows:,} rows in {elapsed:.1f}s ({summary['rows_per_s']:,} rows/s) -> {args.output}")
+    if unscored:
+        print(f"[WARN] {unscored:,} rows had an unknown 'type' and were left unscored (null prediction).")
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", required=True, help="CSV or Parquet (.parquet/.pq) file")
+    parser.add_argument("--output", required=True, help="output directory of Parquet parts")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--keep-columns", default="", help="comma-separated input columns copied to the output")
+    parser.add_argument("--restart", action="store_true", help="discard any previous progress in --output")
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
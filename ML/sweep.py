@@ -0,0 +1,168 @@
+# ML/sweep.py
+"""
+Hyperparameter sweep: train a grid of XGB / RF candidates in parallel and keep the best.
+
+    python -m ML.sweep --workers 4                  # default grid below
+    python -m ML.sweep --grid grid.json             # {"xgb": {"max_depth": [4, 6]}, "rf": {...}}
+
+Features are loaded and split once (same split as ML/train.py). The split is
+written as raw arrays to shared memory (/dev/shm when available) and every
+worker memory-maps it copy-on-write, so no DataFrame is pickled across
+processes and the pages are shared. Each worker gets ``cpu_count // workers``
+threads for its estimator and BLAS/OpenMP pools so ``n_jobs=-1`` doesn't
+oversubscribe the machine. Candidates are ranked by validation AUC; only the
+winner is written to model/pipeline.joblib, with the same serving metadata as
+a regular training run.
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+
+from ML.train import (ARTIFACT, attach_metadata, build_pipeline, evaluate, fit_pipeline, load_features,
+                      numeric_cols, save, split, type_categories)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Configuration
+# ──────────────────────────────────────────────────────────────────────────────
+DEFAULT_GRID = {
+    "xgb": {"max_depth": [4, 6, 8], "learning_rate": [0.05, 0.1]},
+    "rf": {"max_depth": [12, 18], "n_estimators": [200]},
+}
+SPLITS = ("train", "val")  # what the workers need; test stays in the parent
+
+
+def expand_grid(grid: Dict[str, Dict[str, List]]) -> List[Dict]:
+    """{"xgb": {"max_depth": [4, 6]}} -> [{"model_type": "xgb", "params": {"max_depth": 4}}, ...]"""
+    candidates = []
+    for model_type, space in grid.items():
+        keys = list(space)
+        for values in itertools.product(*(space[k] for k in keys)):
+            candidates.append({"model_type": model_type, "params": dict(zip(keys, values))})
+    return candidates
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Shared split: raw arrays on shared memory, memory-mapped by every worker
+# ──────────────────────────────────────────────────────────────────────────────
+def _share(shared_dir: str, name: str, X: pd.DataFrame, y: pd.Series) -> None:
+    np.save(os.path.join(shared_dir, f"{name}_num.npy"), X[numeric_cols].to_numpy(dtype=np.float32))
+    np.save(os.path.join(shared_dir, f"{name}_type.npy"), X["type"].cat.codes.to_numpy())
+    np.save(os.path.join(shared_dir, f"{name}_y.npy"), y.to_numpy())
+
+
+def _attach(shared_dir: str, name: str, cats: List[str]):
+    num = np.load(os.path.join(shared_dir, f"{name}_num.npy"), mmap_mode="c")
+    codes = np.load(os.path.join(shared_dir, f"{name}_type.npy"), mmap_mode="c")
+    X = pd.DataFrame(np.asarray(num), columns=numeric_cols, copy=False)
+    X.insert(0, "type", pd.Categorical.from_codes(codes, categories=cats))
+    y = pd.Series(np.asarray(np.load(os.path.join(shared_dir, f"{name}_y.npy"), mmap_mode="c")), name="isFraud")
+    return X, y
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Worker
+# ──────────────────────────────────────────────────────────────────────────────
+_data: Dict = {}
+
+
+def _init_worker(shared_dir: str, cats: List[str], threads: int) -> None:
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(threads)  # BLAS/OpenMP pools in this process
+    _data.update(shared_dir=shared_dir, cats=cats, threads=threads)
+    for name in SPLITS:
+        _data[name] = _attach(shared_dir, name, cats)
+
+
+def _train_candidate(index: int, candidate: Dict) -> Dict:
+    (X_train, y_train), (X_val, y_val) = _data["train"], _data["val"]
+    t0 = time.perf_counter()
+    pipe = build_pipeline(candidate["model_type"], _data["cats"], y_train, candidate["params"],
+                          n_jobs=_data["threads"], verbose=False)
+    fit_pipeline(pipe, candidate["model_type"], X_train, y_train, X_val, y_val, verbose=False)
+    val_auc = float(roc_auc_score(y_val, pipe.predict_proba(X_val)[:, -1]))
+    path = os.path.join(_data["shared_dir"], f"candidate-{index:03d}.joblib")
+    joblib.dump(pipe, path)
+    return {**candidate, "index": index, "val_auc": val_auc, "fit_s": time.perf_counter() - t0, "path": path}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Driver
+# ──────────────────────────────────────────────────────────────────────────────
+def sweep(candidates: List[Dict], workers: int) -> Dict:
+    X_train, X_val, X_test, y_train, y_val, y_test = split(load_features())
+    cats = type_categories(X_train)
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers, len(candidates)))
+    threads = max(1, cpus // workers)
+    shm = "/dev/shm" if os.access("/dev/shm", os.W_OK) else None
+    shared_dir = tempfile.mkdtemp(prefix="fraud-sweep-", dir=shm)
+    print(f"[INFO] Sweeping {len(candidates)} candidates on {workers} workers x {threads} threads "
+          f"(shared split in {shared_dir})")
+
+    results, best = [], None
+    try:
+        for name, X, y in (("train", X_train, y_train), ("val", X_val, y_val)):
+            _share(shared_dir, name, X, y)
+        del X_train
+
+        t0 = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared_dir, cats, threads)) as pool:
+            futures = [pool.submit(_train_candidate, i, c) for i, c in enumerate(candidates)]
+            for fut in as_completed(futures):
+                r = fut.result()
+                results.append(r)
+                print(f"[INFO] {r['model_type']} {json.dumps(r['params'])}: val AUC {r['val_auc']:.4f} "
+                      f"({r['fit_s']:.1f}s)", flush=True)
+                # keep only the best candidate's artifact on disk
+                if best is None or r["val_auc"] > best["val_auc"]:
+                    if best is not None:
+                        os.remove(best["path"])
+                    best = r
+                else:
+                    os.remove(r["path"])
+        print(f"[INFO] Sweep finished in {time.perf_counter() - t0:.1f}s")
+
+        results.sort(key=lambda r: r["val_auc"], reverse=True)
+        print("\n=== Leaderboard (validation AUC) ===")
+        for rank, r in enumerate(results, 1):
+            print(f"{rank:>3}. {r['val_auc']:.4f}  {r['model_type']:<4} {json.dumps(r['params'])}")
+
+        pipe = attach_metadata(joblib.load(best["path"]), cats)
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+    print(f"\n[INFO] Winner: {best['model_type']} {json.dumps(best['params'])}")
+    best["test_auc"] = evaluate(pipe, X_test, y_test)
+    save(pipe, ARTIFACT)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--grid", help="JSON file: {model_type: {param: [values, ...]}}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    sweep(expand_grid(grid), args.workers)
+
+
+if __name__ == "__main__":
+    main()
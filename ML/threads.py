@@ -0,0 +1,16 @@
+# ML/threads.py
+"""
+Thread caps for loaded models, shared by serving (app/admission.py) and the
+offline batch scorer (ML/score.py).
+"""
+from typing import Any
+
+
+def pin_model_threads(model: Any, threads: int) -> None:
+    """Caps the threads one model call may use (XGBoost ``nthread``, sklearn ``n_jobs``)."""
+    estimator = model.steps[-1][1] if hasattr(model, "steps") else model
+    if hasattr(estimator, "n_jobs"):
+        estimator.n_jobs = threads
+    get_booster = getattr(estimator, "get_booster", None)
+    if get_booster is not None:
+        get_booster().set_param({"nthread": threads})
@@ -1,5 +1,6 @@
 import os
 import gc
+import time
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
@@ -8,106 +9,38 @@ from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, FunctionTransformer
 from ML.dtypes import cast_fn
+from ML.features import build_temporal_features_fast
+from ML.feature_cache import FeatureCache
+from ML.native_artifact import save_native
 import joblib
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Configuration
 # ──────────────────────────────────────────────────────────────────────────────
 MODEL_TYPE = os.environ.get("MODEL_TYPE", "xgb").lower()
+FEATURE_PARTITIONS = int(os.environ.get("FEATURE_PARTITIONS", "8"))  # user-hash partitions for the feature pass (bounds its memory)
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(BASE_DIR, "data", "paysim.csv")
 MODEL_DIR = os.path.join(BASE_DIR, "model")
-ARTIFACT = os.path.join(MODEL_DIR, "pipeline.joblib")
+# MODEL_ARTIFACT writes elsewhere, e.g. a challenger for CHALLENGER_MODELS: MODEL_TYPE=rf MODEL_ARTIFACT=model/challenger_rf.joblib
+ARTIFACT = os.environ.get("MODEL_ARTIFACT", os.path.join(MODEL_DIR, "pipeline.joblib"))
+NATIVE_ARTIFACT = (  # XGB only: booster + manifest, loads without unpickling
+    os.path.join(MODEL_DIR, "native_model.tar") if "MODEL_ARTIFACT" not in os.environ
+    else os.path.splitext(ARTIFACT)[0] + ".native.tar"
+)
 os.makedirs(MODEL_DIR, exist_ok=True)
 
-RANDOM_SEED = 21
-# ──────────────────────────────────────────────────────────────────────────────
-# Helpers: memory‑efficient feature builder
-# ──────────────────────────────────────────────────────────────────────────────
-def build_temporal_features(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Adds per-user time-based features using PaySim's 'step' (hours).
-    Designed to be memory-efficient:
-      * uses float32/int16/int8 where possible
-      * avoids per-group DataFrame copies
-      * uses groupby + rolling(on=...) instead of set_index in a loop
-    """
-    # Keep only the columns we need (already done at read_csv), set dtypes
-    df = df.copy()
-
-    # Precompute a proper time column from 'step' (hours)
-    df["tx_time"] = pd.to_timedelta(df["step"].astype("int32"), unit="h")
-
-    # Sort once (stable, in-place to avoid extra copies)
-    df.sort_values(["nameOrig", "tx_time"], kind="mergesort", inplace=True)
-    df.reset_index(drop=True, inplace=True)
-
-    # Per-user rolling windows using the time column
-    # NOTE: groupby(...).rolling(window='2h', on='tx_time') returns a Series with a MultiIndex.
-    # We immediately "reset" the group level by dropping it with reset_index(drop=True).
-    grp = df.groupby("nameOrig", sort=False)
-
-    # Counts
-    df["tx_count_2h"] = (
-        grp.rolling("2h", on="tx_time")["amount"].count()
-           .reset_index(drop=True)
-           .astype("int16")
-    )
-    df["tx_count_6h"] = (
-        grp.rolling("6h", on="tx_time")["amount"].count()
-           .reset_index(drop=True)
-           .astype("int16")
-    )
-
-    # Amount stats
-    df["tx_max_amt_2h"] = (
-        grp.rolling("2h", on="tx_time")["amount"].max()
-           .reset_index(drop=True)
-           .astype("float32")
-    )
-    df["tx_avg_amt_2h"] = (
-        grp.rolling("2h", on="tx_time")["amount"].mean()
-           .reset_index(drop=True)
-           .astype("float32")
-    )
-    df["tx_sum_amt_6h"] = (
-        grp.rolling("6h", on="tx_time")["amount"].sum()
-           .reset_index(drop=True)
-           .astype("float32")
-    )
-
-    # Recency feature: hours since last tx (per user)
-    df["hours_since_last_tx"] = (
-        grp["tx_time"].diff().dt.total_seconds().div(3600).fillna(-1).astype("float32")
-    )
-
-    # Account maturity features
-    df["tx_count_so_far"] = grp.cumcount().astype("int32")
-    df["is_returning_user"] = (df["tx_count_so_far"] > 0).astype("int8")
-
-    # Log-transform amount (becomes float32)
-    df["amount_log"] = np.log1p(df["amount"]).astype("float32")
+# Built feature matrices are cached per (input contents, feature version); see ML/feature_cache.py
+USE_FEATURE_CACHE = os.environ.get("FEATURE_CACHE", "1") == "1"
+FEATURE_CACHE_DIR = os.environ.get("FEATURE_CACHE_DIR", os.path.join(BASE_DIR, "data", "feature_cache"))
+FEATURE_CACHE_MAX_BYTES = int(float(os.environ.get("FEATURE_CACHE_MAX_GB", "20")) * 2**30)  # LRU-evicted past this
 
-    return df
+RANDOM_SEED = 21
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Load data (memory‑aware)
+# Feature contract
 # ──────────────────────────────────────────────────────────────────────────────
-# Only read the columns we actually use. Downcast to smaller dtypes.
-usecols = ["step", "nameOrig", "amount", "type", "isFraud"]
-dtypes = {
-    "step": "int32",
-    "nameOrig": "category",   # categories are very memory efficient
-    "amount": "float32",
-    "type": "category",       # we'll keep as category for XGB; code it for RF
-    "isFraud": "int8"
-}
-df = pd.read_csv(DATA_PATH, usecols=usecols, dtype=dtypes, memory_map=True, low_memory=True)
-
-# Build features
-df = build_temporal_features(df)
-
 # Select model features
 model_input_features = [
     "type",                # categorical
@@ -122,25 +55,8 @@ model_input_features = [
     "tx_count_so_far",     # int32
     "is_returning_user"    # int8
 ]
+cached_cols = model_input_features + ["isFraud"]
 
-X = df[model_input_features]
-y = df["isFraud"].astype("int8")
-
-# Free memory: drop columns we won't use further
-drop_these = [c for c in df.columns if c not in model_input_features + ["isFraud"]]
-df.drop(columns=drop_these, inplace=True, errors="ignore")
-gc.collect()
-
-# Train/val/test split (fixed bug: split temp into val/test, not X,y again)
-X_train, X_temp, y_train, y_temp = train_test_split(
-    X, y, test_size=0.30, stratify=y, random_state=RANDOM_SEED
-)
-X_val, X_test, y_val, y_test = train_test_split(
-    X_temp, y_temp, test_size=0.50, stratify=y_temp, random_state=RANDOM_SEED
-)
-# ──────────────────────────────────────────────────────────────────────────────
-# Build Pipeline
-# ──────────────────────────────────────────────────────────────────────────────
 categorical_cols = ["type"]
 numeric_cols = [
     "amount", "amount_log",
@@ -150,47 +66,125 @@ numeric_cols = [
     "is_returning_user",
 ]
 all_cols = categorical_cols + numeric_cols
-type_cats = None
-if "type" in X_train.columns:
-    type_cats = X_train["type"].astype("category").cat.categories.tolist()
-
-caster = FunctionTransformer(cast_fn, validate=False, feature_names_out="one-to-one", kw_args={
-        "cats": type_cats,
-        "num_cols": numeric_cols,
-        "all_cols": all_cols,
-        "categorical_col": "type",
-    },)
-
-# Handle categorical depending on model choice
-use_xgb = MODEL_TYPE == "xgb"
-if use_xgb:
-    import xgboost as xgb  # fixed import name
-    # Imbalance handling in a memory-friendly way
-    pos = max(1, int(y_train.sum()))  # fraud transactions
-    neg = int((y_train == 0).sum())  # non-fraud transactions
-    scale_pos_weight = neg / pos  # tell XGBoost to weigh up-weight fraud samples, so they get equal attention
-
-    print(f"[INFO] Training XGBoost (enable_categorical=True). XGBoost version: {xgb.__version__}")
-    model = xgb.XGBClassifier(
-        enable_categorical=True,
-        tree_method="hist",  # fast & memory efficient
-        max_depth=6,
-        max_bin=256,  # tighter bins reduce memory
-        n_estimators=300,
-        learning_rate=0.1,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        random_state=RANDOM_SEED,
-        n_jobs=-1,
-        scale_pos_weight=scale_pos_weight,
-        eval_metric=["auc", "logloss", ],
-        early_stopping_rounds=50,
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Load data (memory‑aware)
+# ──────────────────────────────────────────────────────────────────────────────
+def load_features() -> pd.DataFrame:
+    """Model input features + isFraud, from the feature cache or built from the CSV."""
+    t_load = time.perf_counter()
+    cache = FeatureCache(FEATURE_CACHE_DIR, FEATURE_CACHE_MAX_BYTES) if USE_FEATURE_CACHE else None
+    cache_key = cache.key(DATA_PATH, cached_cols) if cache else None
+    df = cache.load(cache_key) if cache else None
+
+    if df is not None:
+        print(f"[INFO] Feature cache hit ({cache_key[:12]}): {len(df):,} rows memory-mapped "
+              f"in {time.perf_counter() - t_load:.2f}s")
+        return df
+
+    # Only read the columns we actually use. Downcast to smaller dtypes.
+    usecols = ["step", "nameOrig", "amount", "type", "isFraud"]
+    dtypes = {
+        "step": "int32",
+        "nameOrig": "category",   # categories are very memory efficient
+        "amount": "float32",
+        "type": "category",       # we'll keep as category for XGB; code it for RF
+        "isFraud": "int8"
+    }
+    df = pd.read_csv(DATA_PATH, usecols=usecols, dtype=dtypes, memory_map=True, low_memory=True)
+
+    # Build features (single-pass engine; same output as build_temporal_features)
+    df = build_temporal_features_fast(df, n_partitions=FEATURE_PARTITIONS)
+    df = df[cached_cols]
+    if cache:
+        cache.store(cache_key, df, source=DATA_PATH)
+    state = "miss, stored" if cache else "disabled"
+    print(f"[INFO] Features built from CSV ({state}): {len(df):,} rows in {time.perf_counter() - t_load:.2f}s")
+    return df
+
+
+def split(df: pd.DataFrame):
+    """Stratified 70/15/15 train/val/test split -> X_train, X_val, X_test, y_train, y_val, y_test."""
+    X = df[model_input_features]
+    y = df["isFraud"].astype("int8")
+
+    # Free memory: drop columns we won't use further
+    drop_these = [c for c in df.columns if c not in model_input_features + ["isFraud"]]
+    df.drop(columns=drop_these, inplace=True, errors="ignore")
+    gc.collect()
+
+    # Train/val/test split (fixed bug: split temp into val/test, not X,y again)
+    X_train, X_temp, y_train, y_temp = train_test_split(
+        X, y, test_size=0.30, stratify=y, random_state=RANDOM_SEED
     )
-    pipe = Pipeline(steps=[
-        ("cast", caster),
-        ("model", model),
-    ])
-else:
+    X_val, X_test, y_val, y_test = train_test_split(
+        X_temp, y_temp, test_size=0.50, stratify=y_temp, random_state=RANDOM_SEED
+    )
+    return X_train, X_val, X_test, y_train, y_val, y_test
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Build Pipeline
+# ──────────────────────────────────────────────────────────────────────────────
+# Defaults per model type; a sweep (ML/sweep.py) overrides individual keys
+XGB_PARAMS = dict(
+    tree_method="hist",  # fast & memory efficient
+    max_depth=6,
+    max_bin=256,  # tighter bins reduce memory
+    n_estimators=300,
+    learning_rate=0.1,
+    subsample=0.8,
+    colsample_bytree=0.8,
+    early_stopping_rounds=50,
+)
+RF_PARAMS = dict(
+    n_estimators=200,
+    max_depth=18,
+    max_features="sqrt",
+    bootstrap=True,
+    max_samples=0.8,
+    class_weight="balanced_subsample",
+)
+
+
+def type_categories(X_train: pd.DataFrame):
+    if "type" in X_train.columns:
+        return X_train["type"].astype("category").cat.categories.tolist()
+    return None
+
+
+def build_pipeline(model_type: str, type_cats, y_train, params=None, n_jobs: int = -1, verbose: bool = True) -> Pipeline:
+    caster = FunctionTransformer(cast_fn, validate=False, feature_names_out="one-to-one", kw_args={
+            "cats": type_cats,
+            "num_cols": numeric_cols,
+            "all_cols": all_cols,
+            "categorical_col": "type",
+        },)
+
+    # Handle categorical depending on model choice
+    if model_type == "xgb":
+        import xgboost as xgb  # fixed import name
+        # Imbalance handling in a memory-friendly way
+        pos = max(1, int(y_train.sum()))  # fraud transactions
+        neg = int((y_train == 0).sum())  # non-fraud transactions
+        scale_pos_weight = neg / pos  # tell XGBoost to weigh up-weight fraud samples, so they get equal attention
+
+        if verbose:
+            print(f"[INFO] Training XGBoost (enable_categorical=True). XGBoost version: {xgb.__version__}")
+        model = xgb.XGBClassifier(
+            enable_categorical=True,
+            random_state=RANDOM_SEED,
+            n_jobs=n_jobs,
+            scale_pos_weight=scale_pos_weight,
+            eval_metric=["auc", "logloss", ],
+            **{**XGB_PARAMS, **(params or {})},
+        )
+        return Pipeline(steps=[
+            ("cast", caster),
+            ("model", model),
+        ])
+
     # RandomForest with One-Hot on 'type'
     from sklearn.ensemble import RandomForestClassifier
 
@@ -203,62 +197,85 @@ else:
         verbose_feature_names_out=False,
     )
 
-    print("[INFO] Training RandomForest (OHE on 'type').")
+    if verbose:
+        print("[INFO] Training RandomForest (OHE on 'type').")
     model = RandomForestClassifier(
-        n_estimators=200,
-        max_depth=18,
-        max_features="sqrt",
-        bootstrap=True,
-        max_samples=0.8,
-        n_jobs=-1,
-        class_weight="balanced_subsample",
+        n_jobs=n_jobs,
         random_state=RANDOM_SEED,
+        **{**RF_PARAMS, **(params or {})},
     )
-    pipe = Pipeline(steps=[("cast",caster),
+    return Pipeline(steps=[("cast",caster),
         ("preprocessor", preprocessor),
         ("model", model),
     ])
 
 #pipe.feature_names_in_ = np.asarray(X_train.columns, dtype=object) #turns the Pandas Index of your PaySim feature columns into a plain, 1-D NumPy array of strings to be used in FAST API
 #removing the manual assignment
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Fit
 # ──────────────────────────────────────────────────────────────────────────────
-fit_kwargs = {}
-if use_xgb:
-    # Pass validation to XGB through the pipeline
-    fit_kwargs["model__eval_set"] = [(X_val, y_val)]
-    fit_kwargs["model__verbose"] = True
+def fit_pipeline(pipe: Pipeline, model_type: str, X_train, y_train, X_val, y_val, verbose: bool = True) -> Pipeline:
+    fit_kwargs = {}
+    if model_type == "xgb":
+        # Pass validation to XGB through the pipeline
+        fit_kwargs["model__eval_set"] = [(X_val, y_val)]
+        fit_kwargs["model__verbose"] = verbose
 
-pipe.fit(X_train, y_train, **fit_kwargs)
-expected = getattr(pipe, "feature_names_in_", None)
-if expected is None:
-    expected = np.asarray(X_train.columns, dtype=object)
-    setattr(pipe, "raw_feature_names_in_", expected)   # cleaner than pipe.__dict__[...]=...
-setattr(pipe, "raw_feature_names_in_", np.asarray(all_cols, dtype=object))  #helpful metadata for API check
-setattr(pipe, "type_categories_", type_cats or [])
+    return pipe.fit(X_train, y_train, **fit_kwargs)
 
 
+def attach_metadata(pipe: Pipeline, type_cats) -> Pipeline:
+    """Serving contract read by app/main.py."""
+    setattr(pipe, "raw_feature_names_in_", np.asarray(all_cols, dtype=object))  #helpful metadata for API check
+    setattr(pipe, "type_categories_", type_cats or [])
+    return pipe
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Evaluate
 # ──────────────────────────────────────────────────────────────────────────────
-y_pred = pipe.predict(X_test)
+def evaluate(pipe: Pipeline, X_test, y_test):
+    y_pred = pipe.predict(X_test)
+
+    try:
+        y_proba = pipe.predict_proba(X_test)[:, -1]
+        auc = roc_auc_score(y_test, y_proba)
+    except Exception:
+        y_proba, auc = None, None
 
-try:
-    y_proba = pipe.predict_proba(X_test)[:, -1]
-    auc = roc_auc_score(y_test, y_proba)
-except Exception:
-    y_proba, auc = None, None
+    print("\n=== Classification Report ===")
+    print(classification_report(y_test, y_pred, digits=4))
+    if auc is not None:
+        print(f"AUC: {auc:.4f}")
+    return auc
 
-print("\n=== Classification Report ===")
-print(classification_report(y_test, y_pred, digits=4))
-if auc is not None:
-    print(f"AUC: {auc:.4f}")
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Save model
 # ──────────────────────────────────────────────────────────────────────────────
-joblib.dump(pipe, ARTIFACT)
-print(f"[OK] Saved pipeline {ARTIFACT}")
-print("Expected input columns for serving:", list(expected))
+def save(pipe: Pipeline, path: str = ARTIFACT, native_path: str = NATIVE_ARTIFACT) -> None:
+    for target in filter(None, (path, native_path)):
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"  # a crash or a reading server never sees a half-written artifact
+    joblib.dump(pipe, tmp)
+    os.replace(tmp, path)
+    print(f"[OK] Saved pipeline {path}")
+    if native_path and save_native(pipe, native_path):
+        print(f"[OK] Saved native artifact {native_path} (serve it with MODEL_FILE / AZURE_MODEL_BLOB)")
+    print("Expected input columns for serving:", list(pipe.raw_feature_names_in_))
+
+
+def main():
+    X_train, X_val, X_test, y_train, y_val, y_test = split(load_features())
+    type_cats = type_categories(X_train)
+    pipe = build_pipeline(MODEL_TYPE, type_cats, y_train)
+    fit_pipeline(pipe, MODEL_TYPE, X_train, y_train, X_val, y_val)
+    attach_metadata(pipe, type_cats)
+    evaluate(pipe, X_test, y_test)
+    save(pipe)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# ML/train_incremental.py
+"""
+Out-of-core XGB training: stream the transactions in chunks instead of loading them whole.
+
+    python -m ML.train_incremental                                  # retrain from data/paysim.csv, external memory
+    python -m ML.train_incremental --compare                        # ... and the in-memory ML/train.py fit, side by side
+    python -m ML.train_incremental --update data/daily/day-32.csv   # add trees to model/pipeline.joblib for new days
+
+The CSV (or the listed files, in step order) is read ``TRAIN_CHUNK_ROWS`` rows
+at a time. ``StreamingTemporalFeatures`` (ML/features.py) carries the per-user
+window state across chunk boundaries, so every row gets exactly the features
+the full build would give it. Each featurised chunk is split into
+train/val/test by a hash of its row number (70/15/15, the same rows whatever
+the chunk size) and spilled to a work directory.
+
+* retrain: the train/val chunks are fed to XGBoost through a ``DataIter``; its
+  external-memory DMatrix keeps the quantised pages on disk, so XGBoost holds
+  per-row gradients but never the whole feature matrix.
+* ``--update``: continues boosting the saved pipeline's booster chunk by chunk
+  (``UPDATE_ROUNDS`` trees per chunk), starting from the feature state saved
+  by the previous run (``FEATURE_STATE``), so yesterday's users and windows
+  carry into today's files.
+
+Peak RSS (``ru_maxrss``) is reported after each phase, and validation/test AUC
+are computed chunk by chunk. ``--compare`` runs the in-memory fit on the same
+split in a fresh process and prints both side by side. The model is written
+like a regular training run (pipeline + native artifact), with the feature
+state next to it.
+"""
+import argparse
+import os
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import roc_auc_score
+from sklearn.pipeline import Pipeline
+
+from ML.features import StreamingTemporalFeatures, build_temporal_features_fast
+from ML.train import (ARTIFACT, DATA_PATH, MODEL_DIR, attach_metadata, build_pipeline, fit_pipeline,
+                      model_input_features, save)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Configuration
+# ──────────────────────────────────────────────────────────────────────────────
+CHUNK_ROWS = int(os.environ.get("TRAIN_CHUNK_ROWS", "1000000"))  # rows per chunk: bounds the feature pass's memory
+UPDATE_ROUNDS = int(os.environ.get("UPDATE_ROUNDS", "20"))  # trees added per chunk by --update
+FEATURE_STATE = os.environ.get("FEATURE_STATE", os.path.join(MODEL_DIR, "feature_state.npz"))  # state at the end of the last run
+WORK_DIR = os.environ.get("INCREMENTAL_WORK_DIR")  # spilled chunks + XGBoost page cache (default: a temp dir)
+
+SPLITS = ("train", "val", "test")
+_SPLIT_EDGES = np.array([70, 85], dtype=np.uint64)  # hash % 100 -> train < 70 <= val < 85 <= test
+
+USECOLS = ["step", "nameOrig", "amount", "type", "isFraud"]
+DTYPES = {"step": "int32", "nameOrig": "category", "amount": "float32", "type": "category", "isFraud": "int8"}
+
+
+def peak_rss_mb() -> float:
+    """High-water mark of this process's resident memory (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def split_of(rows: np.ndarray) -> np.ndarray:
+    """0/1/2 (train/val/test) per global row number: deterministic, independent of chunking."""
+    return np.searchsorted(_SPLIT_EDGES, pd.util.hash_array(rows.astype(np.uint64)) % np.uint64(100), side="right")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Featurise: stream chunks -> exact features -> spilled train/val/test parts
+# ──────────────────────────────────────────────────────────────────────────────
+def read_chunks(paths: List[str], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for path in paths:
+        yield from pd.read_csv(path, usecols=USECOLS, dtype=DTYPES, chunksize=chunk_rows)
+
+
+def featurize(paths: List[str], state: StreamingTemporalFeatures, work_dir: str,
+              chunk_rows: int = CHUNK_ROWS) -> Dict[str, List[str]]:
+    """Spills each chunk's model inputs + isFraud as one ``.npz`` per split; returns {split: [paths]}."""
+    parts: Dict[str, List[str]] = {name: [] for name in SPLITS}
+    for i, chunk in enumerate(read_chunks(paths, chunk_rows)):
+        rows = np.arange(state.rows_seen, state.rows_seen + len(chunk))
+        df = state.transform(chunk)
+        which = split_of(rows)
+        for j, name in enumerate(SPLITS):
+            part = df.loc[which == j]
+            if part.empty:
+                continue
+            path = os.path.join(work_dir, f"{name}-{i:05d}.npz")
+            type_col = part["type"].astype("category")
+            np.savez(path, type_codes=type_col.cat.codes.to_numpy(),
+                     type_categories=np.asarray(type_col.cat.categories, dtype=str),
+                     isFraud=part["isFraud"].to_numpy(),
+                     **{c: part[c].to_numpy() for c in model_input_features if c != "type"})
+            parts[name].append(path)
+    return parts
+
+
+def read_part(path: str, type_cats: List[str]) -> Tuple[pd.DataFrame, np.ndarray]:
+    """A spilled part as (model inputs with ``type`` on ``type_cats``, labels)."""
+    with np.load(path) as z:
+        types = z["type_categories"][z["type_codes"]]
+        X = pd.DataFrame({c: pd.Categorical(types, categories=type_cats) if c == "type" else z[c]
+                          for c in model_input_features})
+        return X, z["isFraud"]
+
+
+def part_stats(paths: List[str]) -> Tuple[List[str], int, int]:
+    """(sorted type categories, positives, negatives) over the parts."""
+    cats, pos, neg = set(), 0, 0
+    for path in paths:
+        with np.load(path) as z:
+            cats.update(z["type_categories"][np.unique(z["type_codes"])].tolist())
+            pos += int(z["isFraud"].sum())
+            neg += int((z["isFraud"] == 0).sum())
+    return sorted(cats), pos, neg
+
+
+class SpilledParts(xgb.DataIter):
+    """Feeds spilled parts, cast like the pipeline does, to an external-memory DMatrix."""
+
+    def __init__(self, paths: List[str], pipe: Pipeline, type_cats: List[str], cache_prefix: str):
+        self.paths, self.pipe, self.type_cats = paths, pipe, type_cats
+        self._i = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> int:
+        if self._i == len(self.paths):
+            return 0
+        X, y = read_part(self.paths[self._i], self.type_cats)
+        input_data(data=self.pipe.named_steps["cast"].transform(X), label=y)
+        self._i += 1
+        return 1
+
+    def reset(self) -> None:
+        self._i = 0
+
+
+def streamed_auc(pipe: Pipeline, paths: List[str], type_cats: List[str]) -> Optional[float]:
+    """AUC over spilled parts, predicted one part at a time (keeps only labels + probabilities)."""
+    y, proba = [], []
+    for path in paths:
+        X, labels = read_part(path, type_cats)
+        y.append(labels)
+        proba.append(pipe.predict_proba(X)[:, -1].astype(np.float32))
+    if not y or len(np.unique(np.concatenate(y))) < 2:
+        return None
+    return float(roc_auc_score(np.concatenate(y), np.concatenate(proba)))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Train
+# ──────────────────────────────────────────────────────────────────────────────
+def _trimmed(booster: xgb.Booster) -> xgb.Booster:
+    """Drops the trees early stopping kept past the best round, so further rounds and predictions agree."""
+    best = booster.attr("best_iteration")
+    return booster[: int(best) + 1] if best is not None else booster
+
+
+def retrain(parts: Dict[str, List[str]], work_dir: str) -> Pipeline:
+    """Full XGB fit from spilled parts through external-memory DMatrices (ML/train.py's params)."""
+    type_cats, pos, neg = part_stats(parts["train"])
+    pipe = build_pipeline("xgb", type_cats, np.array([0, 1]), verbose=False)  # class balance set below
+    model = pipe.named_steps["model"]
+    model.set_params(scale_pos_weight=neg / max(1, pos))
+    pipe.named_steps["cast"].fit(read_part(parts["train"][0], type_cats)[0])
+
+    dtrain = xgb.DMatrix(SpilledParts(parts["train"], pipe, type_cats, os.path.join(work_dir, "train")),
+                         enable_categorical=True)
+    dval = xgb.DMatrix(SpilledParts(parts["val"], pipe, type_cats, os.path.join(work_dir, "val")),
+                       enable_categorical=True)
+    print(f"[INFO] External-memory DMatrix: {dtrain.num_row():,} train / {dval.num_row():,} val rows "
+          f"(peak RSS {peak_rss_mb():,.0f} MB)")
+    booster = xgb.train(model.get_xgb_params(), dtrain, num_boost_round=model.n_estimators,
+                        evals=[(dval, "val")], early_stopping_rounds=model.early_stopping_rounds, verbose_eval=False)
+    print(f"[INFO] Trained {booster.num_boosted_rounds()} rounds, best {booster.attr('best_iteration')}")
+    model.load_model(bytearray(_trimmed(booster).save_raw("ubj")))
+    return attach_metadata(pipe, type_cats)
+
+
+def update(pipe: Pipeline, parts: Dict[str, List[str]], rounds: int = UPDATE_ROUNDS) -> Pipeline:
+    """Continues boosting ``pipe``'s booster with ``rounds`` trees per new train part."""
+    type_cats = list(pipe.type_categories_)
+    model = pipe.named_steps["model"]
+    model.load_model(bytearray(_trimmed(model.get_booster()).save_raw("ubj")))
+    # plain attributes: set_params would also push the list-valued eval_metric onto the booster as one string
+    model.n_estimators, model.early_stopping_rounds = rounds, None
+    for path in parts["train"]:
+        X, y = read_part(path, type_cats)
+        model.fit(pipe.named_steps["cast"].transform(X), y, xgb_model=model.get_booster(), verbose=False)
+    print(f"[INFO] Booster now has {model.get_booster().num_boosted_rounds()} rounds")
+    return pipe
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Baseline: in-memory full retrain on the same split (run in a fresh process)
+# ──────────────────────────────────────────────────────────────────────────────
+def full_retrain(paths: List[str]) -> Dict[str, float]:
+    """ML/train.py's in-memory path over the whole data, split by ``split_of``; AUCs and its own peak RSS."""
+    t0 = time.perf_counter()
+    df = pd.concat([pd.read_csv(p, usecols=USECOLS, dtype=DTYPES) for p in paths], ignore_index=True)
+    df["type"] = df["type"].astype("category")  # concat of differently-categorised files falls back to object
+    df["row"] = np.arange(len(df))
+    df = build_temporal_features_fast(df)
+    which = split_of(df["row"].to_numpy())
+    X, y = df[model_input_features], df["isFraud"].astype("int8")
+    X_train, y_train = X[which == 0], y[which == 0]
+    type_cats = X_train["type"].cat.categories.tolist()
+    pipe = build_pipeline("xgb", type_cats, y_train, verbose=False)
+    fit_pipeline(pipe, "xgb", X_train, y_train, X[which == 1], y[which == 1], verbose=False)
+    auc = {name: float(roc_auc_score(y[which == j], pipe.predict_proba(X[which == j])[:, -1]))
+           for j, name in enumerate(SPLITS) if j}
+    return {"val_auc": auc["val"], "test_auc": auc["test"], "seconds": time.perf_counter() - t0,
+            "peak_rss_mb": peak_rss_mb()}
+
+
+def _print_comparison(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"\n{'run':<14} {'peak RSS MB':>12} {'seconds':>9} {'val AUC':>9} {'test AUC':>9}")
+    for name, r in results.items():
+        print(f"{name:<14} {r['peak_rss_mb']:>12,.0f} {r['seconds']:>9.1f} "
+              f"{r['val_auc'] or float('nan'):>9.4f} {r['test_auc'] or float('nan'):>9.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="*", help="CSV files in step order (default: data/paysim.csv)")
+    parser.add_argument("--update", action="store_true",
+                        help=f"continue boosting {os.path.relpath(ARTIFACT)} from the saved feature state")
+    parser.add_argument("--compare", action="store_true", help="also run the in-memory full retrain and compare")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+    paths = args.files or [DATA_PATH]
+    if args.update and args.compare:
+        parser.error("--compare applies to a retrain")
+
+    if args.update:
+        if not os.path.exists(FEATURE_STATE):
+            raise SystemExit(f"{FEATURE_STATE} not found: run a retrain over the history first")
+        state = StreamingTemporalFeatures.load(FEATURE_STATE)
+        pipe = joblib.load(ARTIFACT)
+        if not hasattr(pipe.named_steps["model"], "get_booster"):
+            raise SystemExit(f"{ARTIFACT} is not an XGB pipeline; only boosting can continue from a saved model")
+        print(f"[INFO] Resuming after step {state.max_step} ({state.rows_seen:,} rows, {len(state.keys):,} users)")
+    else:
+        state, pipe = StreamingTemporalFeatures(), None
+
+    work_dir = tempfile.mkdtemp(prefix="train-incremental-", dir=WORK_DIR)
+    try:
+        t0, rows_before = time.perf_counter(), state.rows_seen
+        parts = featurize(paths, state, work_dir, args.chunk_rows)
+        print(f"[INFO] Featurised {state.rows_seen - rows_before:,} rows in chunks of {args.chunk_rows:,} "
+              f"({time.perf_counter() - t0:.1f}s, peak RSS {peak_rss_mb():,.0f} MB)")
+
+        if args.update:
+            type_cats = list(pipe.type_categories_)
+            before = streamed_auc(pipe, parts["val"], type_cats)
+            pipe = update(pipe, parts)
+            after = streamed_auc(pipe, parts["val"], type_cats)
+            print(f"[INFO] Val AUC on the new rows: {before or float('nan'):.4f} before, "
+                  f"{after or float('nan'):.4f} after")
+        else:
+            pipe = retrain(parts, work_dir)
+        print(f"[INFO] Trained (peak RSS {peak_rss_mb():,.0f} MB)")
+
+        type_cats = list(pipe.type_categories_)
+        incremental = {"val_auc": streamed_auc(pipe, parts["val"], type_cats),
+                       "test_auc": streamed_auc(pipe, parts["test"], type_cats),
+                       "seconds": time.perf_counter() - t0, "peak_rss_mb": peak_rss_mb()}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {"incremental": incremental}
+    if args.compare:  # fresh interpreter, so its high-water mark is its own
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            results["full retrain"] = pool.submit(full_retrain, paths).result()
+    _print_comparison(results)
+
+    save(pipe)
+    state.save(FEATURE_STATE)
+    print(f"[OK] Saved feature state {FEATURE_STATE} (through step {state.max_step})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Admission control and the bounded inference executor (one per worker).
+
+Model calls run on a small dedicated thread pool (``concurrency`` slots)
+instead of AnyIO's 40-thread default, and each model call is pinned to
+``model_threads`` threads, so concurrent requests don't oversubscribe the CPU
+with XGBoost/OpenMP threads. Work waiting for a slot is bounded two ways:
+
+* queue depth: more than ``max_queue`` requests waiting -> 429
+* deadline: if the estimated queue wait plus one model call (moving average of
+  recent calls) exceeds the request's latency budget, or a queued request only
+  gets a slot after its deadline -> 503
+
+Both rejections carry ``Retry-After`` (estimated time for the queue to drain),
+so overload is answered in microseconds instead of requests piling up until
+gunicorn kills the worker. ``saturated`` drives /ready so the Service stops
+routing to a pod that is shedding load.
+"""
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from ML.threads import pin_model_threads  # re-exported: app.main pins each loaded model with it
+
+INFERENCE_IN_FLIGHT = Gauge("fraud_inference_in_flight", "Model calls running on the inference executor.")
+INFERENCE_QUEUED = Gauge("fraud_inference_queued", "Requests waiting for an inference executor slot.")
+INFERENCE_WAIT = Histogram(
+    "fraud_inference_wait_seconds",
+    "Time a request waited for an inference executor slot.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+ADMISSION_REJECTED = Counter(
+    "fraud_admission_rejected_total", "Requests shed by admission control.", ["endpoint", "reason"]
+)
+
+_EWMA_ALPHA = 0.2  # weight of the newest model call in the service-time estimate
+
+
+class Overloaded(Exception):
+    """A request shed by admission control; maps to an HTTP 429/503 with Retry-After."""
+
+    def __init__(self, reason: str, status_code: int, retry_after_s: float, detail: str):
+        super().__init__(detail)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after_s = retry_after_s
+        self.detail = detail
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after_s)))}
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for model calls with queue-depth and deadline-aware admission.
+
+    ``max_queue=0`` disables the depth limit, ``budget_s=0`` the deadline checks.
+    """
+
+    def __init__(self, concurrency: int = 2, max_queue: int = 64, budget_s: float = 2.0,
+                 saturated_hold_s: float = 2.0):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.budget_s = budget_s
+        self.saturated_hold_s = saturated_hold_s  # /ready stays 503 this long after the last shed request
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.service_s = 0.0  # moving average of one model call
+        self.last_shed = 0.0
+
+    # --- admission ---
+    def estimated_wait_s(self) -> float:
+        """Expected time before a new request gets a slot."""
+        with self._lock:
+            return self._estimated_wait_locked()
+
+    def _estimated_wait_locked(self) -> float:
+        return ((self.queued + self.in_flight) // self.concurrency) * self.service_s
+
+    def admit(self, budget_s: Optional[float] = None, arrived: Optional[float] = None,
+              reserve: bool = False) -> Optional[float]:
+        """
+        Raises ``Overloaded`` if the request should be shed now; returns its
+        deadline (``perf_counter``, ``arrived + budget``) or None. Time already
+        spent since ``arrived`` (body parsing, event-loop backlog) counts
+        against the budget. With ``reserve`` the request also takes its place
+        in the queue inside the same critical section as the depth check, so
+        concurrent callers cannot all pass the check before any of them is
+        counted; hand that place to ``run(..., reserved=True)``.
+        """
+        budget_s = self.budget_s if budget_s is None else budget_s
+        now = time.perf_counter()
+        arrived = now if arrived is None else arrived
+        with self._lock:
+            wait_s = self._estimated_wait_locked()
+            if self.max_queue and self.queued >= self.max_queue:
+                self._shed()
+                raise Overloaded("queue_full", 429, wait_s,
+                                 f"Inference queue full ({self.queued} waiting); retry later")
+            expected_s = (now - arrived) + wait_s + self.service_s
+            if budget_s and expected_s > budget_s:
+                self._shed()
+                raise Overloaded("deadline", 503, wait_s,
+                                 f"Estimated latency {expected_s * 1000:.0f} ms exceeds the {budget_s * 1000:.0f} ms budget")
+            if reserve:
+                self.queued += 1
+        if reserve:
+            INFERENCE_QUEUED.inc()
+        return arrived + budget_s if budget_s else None
+
+    def _shed(self) -> None:
+        self.last_shed = time.monotonic()
+
+    @property
+    def saturated(self) -> bool:
+        """Queue full, or a request was shed within ``saturated_hold_s``."""
+        if self.max_queue and self.queued >= self.max_queue:
+            return True
+        return self.last_shed > 0 and time.monotonic() - self.last_shed < self.saturated_hold_s
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "concurrency": self.concurrency,
+            "service_ms": round(self.service_s * 1000, 3),
+            "estimated_wait_ms": round(self.estimated_wait_s() * 1000, 3),
+        }
+
+    # --- execution ---
+    async def run(self, fn: Callable, *args, deadline: Optional[float] = None, reserved: bool = False) -> Any:
+        """
+        Runs ``fn(*args)`` on the pool; raises ``Overloaded`` if it only gets a
+        slot after ``deadline``. ``reserved``: the queue place was already
+        taken by ``admit(..., reserve=True)``.
+        """
+        enqueued = time.perf_counter()
+        if not reserved:
+            with self._lock:
+                self.queued += 1
+            INFERENCE_QUEUED.inc()
+        future = self._pool.submit(self._call, fn, args, enqueued, deadline)
+        future.add_done_callback(self._on_cancelled)
+        return await asyncio.wrap_future(future)
+
+    async def call(self, fn: Callable, *args, budget_s: Optional[float] = None, arrived: Optional[float] = None) -> Any:
+        """``admit`` then ``run``, with the queue place taken atomically with the depth check."""
+        deadline = self.admit(budget_s, arrived, reserve=True)
+        return await self.run(fn, *args, deadline=deadline, reserved=True)
+
+    def _call(self, fn: Callable, args, enqueued: float, deadline: Optional[float]) -> Any:
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+        INFERENCE_QUEUED.dec()
+        INFERENCE_IN_FLIGHT.inc()
+        INFERENCE_WAIT.observe(started - enqueued)
+        try:
+            if deadline is not None and started > deadline:  # the client's budget is already spent
+                self._shed()
+                raise Overloaded("deadline_expired", 503, self.estimated_wait_s(),
+                                 f"Waited {(started - enqueued) * 1000:.0f} ms for an inference slot; "
+                                 "latency budget exhausted")
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.in_flight -= 1
+                if not (deadline is not None and started > deadline):
+                    self.service_s += _EWMA_ALPHA * (elapsed - self.service_s) if self.service_s else elapsed
+            INFERENCE_IN_FLIGHT.dec()
+
+    def _on_cancelled(self, future) -> None:
+        if future.cancelled():  # caller went away before the job got a slot
+            with self._lock:
+                self.queued -= 1
+            INFERENCE_QUEUED.dec()
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
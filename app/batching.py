@@ -0,0 +1,176 @@
+"""
+Asyncio micro-batcher for /predict.
+
+Concurrent requests are queued and flushed together when either
+``max_batch_size`` records are waiting or the oldest request has waited
+``max_wait_ms``. Each flush encodes every request separately (so one bad
+request only fails itself), scores all rows in a single vectorised call off
+the event loop, and hands each caller its slice back.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import Histogram
+
+BATCH_RECORDS = Histogram(
+    "fraud_predict_batch_records",
+    "Records scored per micro-batch flush.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+BATCH_REQUESTS = Histogram(
+    "fraud_predict_batch_requests",
+    "Requests coalesced per micro-batch flush.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+QUEUE_WAIT = Histogram(
+    "fraud_predict_queue_wait_seconds",
+    "Time a request waited in the micro-batch queue before scoring started.",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+
+class BatchResult:
+    __slots__ = ("proba", "X", "queue_ms", "compute_ms", "model")
+
+    def __init__(self, proba: np.ndarray, queue_ms: float, compute_ms: float, model: Any,
+                 X: Optional[np.ndarray] = None):
+        self.proba = proba
+        self.X = X  # this request's rows of the batch's encoded matrix (a view), e.g. for shadow scoring
+        self.queue_ms = queue_ms
+        self.compute_ms = compute_ms
+        self.model = model  # the model the batch was actually scored with
+
+
+class _Pending:
+    __slots__ = ("records", "future", "enqueued")
+
+    def __init__(self, records, future, enqueued):
+        self.records = records
+        self.future = future
+        self.enqueued = enqueued
+
+
+class MicroBatcher:
+    """
+    ``get_model`` returns the live model (anything with a compiled ``plan``);
+    it is looked up per flush so a model swap takes effect on the next batch.
+    ``run`` executes the scoring call off the event loop.
+    """
+
+    def __init__(self, get_model: Callable[[], Any], max_batch_size: int = 64, max_wait_ms: float = 2.0,
+                 run: Callable = run_in_threadpool):
+        self.get_model = get_model
+        self.run = run
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self._pending: "deque[_Pending]" = deque()
+        self._pending_records = 0
+        self._nonempty: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._nonempty = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, records: List[Dict[str, Any]]) -> BatchResult:
+        """Queue one request's records and wait for its class-1 probabilities."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_Pending(records, future, time.perf_counter()))
+        self._pending_records += len(records)
+        self._nonempty.set()
+        if self._pending_records >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    @property
+    def queue_depth(self) -> int:
+        """Records waiting to be flushed."""
+        return self._pending_records
+
+    async def _run(self) -> None:
+        while True:
+            await self._nonempty.wait()
+            # wait until the batch is full or the oldest request hits max_wait
+            remaining = self.max_wait_s - (time.perf_counter() - self._pending[0].enqueued)
+            if self._pending_records < self.max_batch_size and remaining > 0:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch, size = [], 0
+            while self._pending and (not batch or size + len(self._pending[0].records) <= self.max_batch_size):
+                item = self._pending.popleft()
+                batch.append(item)
+                size += len(item.records)
+            self._pending_records -= size
+            if not self._pending:
+                self._nonempty.clear()
+            self._full.clear()
+            if self._pending_records >= self.max_batch_size:
+                self._full.set()
+            await self._flush(batch, size)
+
+    async def _flush(self, batch: List[_Pending], size: int) -> None:
+        started = time.perf_counter()
+        BATCH_RECORDS.observe(size)
+        BATCH_REQUESTS.observe(len(batch))
+        for p in batch:
+            QUEUE_WAIT.observe(started - p.enqueued)
+
+        model = self.get_model()
+        try:
+            if model.plan is None:
+                raise RuntimeError("active model has no compiled plan")
+            outcomes = await self.run(self._score, model.plan, [p.records for p in batch])
+        except Exception as e:  # whole-batch failure (e.g. model error)
+            outcomes = [e] * len(batch)
+        compute_ms = (time.perf_counter() - started) * 1000
+
+        for p, out in zip(batch, outcomes):
+            if p.future.done():  # caller went away
+                continue
+            if isinstance(out, Exception):
+                p.future.set_exception(out)
+            else:
+                proba, X = out
+                p.future.set_result(BatchResult(proba, (started - p.enqueued) * 1000, compute_ms, model, X=X))
+
+    @staticmethod
+    def _score(plan, record_lists: List[List[Dict[str, Any]]]) -> List[Any]:
+        """Encode per request, score all valid rows at once, split (proba, X) back per request."""
+        encoded, outcomes = [], []
+        for records in record_lists:
+            try:
+                X = plan.encode(records)
+                encoded.append(X)
+                outcomes.append(len(X))
+            except Exception as e:
+                outcomes.append(e)
+        if not encoded:
+            return outcomes
+
+        X = np.concatenate(encoded) if len(encoded) > 1 else encoded[0]
+        proba = plan.predict_proba_matrix(X)
+        offset = 0
+        for i, out in enumerate(outcomes):
+            if not isinstance(out, Exception):
+                outcomes[i] = proba[offset:offset + out], X[offset:offset + out]
+                offset += out
+        return outcomes
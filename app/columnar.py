@@ -0,0 +1,209 @@
+"""
+Binary request/response bodies for /predict (high-volume callers).
+
+Both formats map straight into the compiled plan's float32 input matrix, so
+no per-row Python objects are built on the way in or out. The request format
+is chosen by ``Content-Type``, the response format by ``Accept`` (defaulting
+to the request's format; JSON stays the default for everyone else).
+
+Arrow IPC (``application/vnd.apache.arrow.stream``)
+    An IPC *stream* of record batches. One column per feature, any order,
+    extra columns ignored. Numeric columns may be any numeric type (nulls are
+    NaN); ``type`` is a string or dictionary<string> column. The response is
+    one batch with ``prediction`` (int8) and ``probability`` (float32) and the
+    model version in the schema metadata (``model_version``).
+
+Raw float32 matrix (``application/x-float32-matrix``), little-endian::
+
+    offset  size  field
+    0       4     magic  b"FF32"
+    4       4     uint32 header length H
+    8       H     UTF-8 JSON header, space-padded so the matrix is 4-byte aligned
+    8+H     4*R*C float32 matrix, row-major, R = header["rows"], C = len(header["columns"])
+
+    request header:  {"columns": [...feature order...], "rows": R, "categories": [...]}
+    response header: {"columns": ["prediction", "probability"], "rows": R, "model_version": "..."}
+
+In a request the categorical column holds integer codes into the header's
+``categories`` list (in the client's order; they are remapped to the model's).
+``encode_matrix`` / ``decode_matrix`` read and write the format for clients.
+"""
+import json
+import struct
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.compiled_plan import MissingFeaturesError
+from ML.dtypes import UnknownCategoryError
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+FLOAT32_MATRIX = "application/x-float32-matrix"
+JSON = "application/json"
+BINARY_MEDIA_TYPES = (ARROW_STREAM, FLOAT32_MATRIX)
+
+_MAGIC = b"FF32"
+_PREFIX = struct.Struct("<4sI")
+
+
+class ColumnarFormatError(ValueError):
+    """Malformed Arrow / float32-matrix body."""
+
+
+def media_type(header: Optional[str]) -> str:
+    """``"application/json; charset=utf-8"`` -> ``"application/json"``."""
+    return (header or "").split(";", 1)[0].strip().lower()
+
+
+def negotiate(accept: Optional[str], request_type: str) -> str:
+    """
+    Response media type: the first binary type listed in ``Accept`` (q-values
+    are ignored), else the request's own format when ``Accept`` is missing or
+    ``*/*``, else JSON.
+    """
+    listed = [media_type(part) for part in (accept or "").split(",")]
+    for t in listed:
+        if t in BINARY_MEDIA_TYPES:
+            return t
+    if request_type in BINARY_MEDIA_TYPES and (not accept or "*/*" in listed):
+        return request_type
+    return JSON
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Raw float32 matrix
+# ──────────────────────────────────────────────────────────────────────────────
+def encode_matrix(header: Dict[str, Any], X: np.ndarray) -> bytes:
+    """Frames a 2-D matrix with its JSON header (``rows`` is filled in)."""
+    X = np.ascontiguousarray(X, dtype="<f4")
+    raw = json.dumps({**header, "rows": int(X.shape[0])}, separators=(",", ":")).encode()
+    raw += b" " * (-(len(raw) + _PREFIX.size) % 4)
+    return _PREFIX.pack(_MAGIC, len(raw)) + raw + X.tobytes()
+
+
+def decode_matrix(body: bytes) -> Tuple[Dict[str, Any], np.ndarray]:
+    """(header, float32 matrix view over ``body``)."""
+    if len(body) < _PREFIX.size:
+        raise ColumnarFormatError("body shorter than the float32-matrix prefix")
+    magic, n = _PREFIX.unpack_from(body)
+    if magic != _MAGIC:
+        raise ColumnarFormatError(f"bad magic {magic!r} (expected {_MAGIC!r})")
+    try:
+        header = json.loads(body[_PREFIX.size:_PREFIX.size + n])
+        columns, rows = list(header["columns"]), int(header["rows"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ColumnarFormatError(f"bad header: {e}")
+    offset = _PREFIX.size + n
+    if len(body) - offset != 4 * rows * len(columns):
+        raise ColumnarFormatError(f"expected {rows}x{len(columns)} float32 values, got {len(body) - offset} bytes")
+    return header, np.frombuffer(body, dtype="<f4", offset=offset).reshape(rows, len(columns))
+
+
+def matrix_to_input(body: bytes, plan) -> np.ndarray:
+    """Request body -> the plan's float32 input matrix (features reordered, category codes remapped)."""
+    header, M = decode_matrix(body)
+    columns = [str(c) for c in header["columns"]]
+    missing = [c for c in plan.features if c not in columns]
+    if missing:
+        raise MissingFeaturesError(missing, columns, plan.features)
+    X = M[:, [columns.index(c) for c in plan.features]]  # fancy indexing copies: X is writable
+
+    cat_pos = plan.features.index(plan.categorical_col)
+    client_cats = [str(c) for c in header.get("categories") or ()]
+    remap = np.array([plan.categories.index(c) if c in plan.categories else -1 for c in client_cats], dtype=np.intp)
+    codes = X[:, cat_pos]
+    valid = np.isfinite(codes) & (codes >= 0) & (codes < len(remap)) & (codes == np.floor(codes))
+    if not valid.all():
+        raise ColumnarFormatError(f"'{plan.categorical_col}' must hold integer codes into header['categories']")
+    mapped = remap[codes.astype(np.intp)]
+    if (mapped < 0).any():
+        unseen = sorted({client_cats[i] for i in np.unique(codes[mapped < 0].astype(np.intp))})
+        raise UnknownCategoryError(f"Unknown category in '{plan.categorical_col}': {unseen}. Allowed: {plan.categories}")
+    X[:, cat_pos] = mapped
+    return X
+
+
+def records_to_matrix(records: Sequence[Dict[str, Any]], features: Sequence[str], categories: Sequence[str],
+                      categorical_col: str = "type") -> bytes:
+    """Client helper: JSON-style records -> float32-matrix request body."""
+    codes = {c: i for i, c in enumerate(categories)}
+    X = np.array([[codes[r[c]] if c == categorical_col else r[c] for c in features] for r in records], dtype=np.float32)
+    return encode_matrix({"columns": list(features), "categories": list(categories)}, X)
+
+
+def matrix_response(labels: np.ndarray, proba: Optional[np.ndarray], model_version: str) -> bytes:
+    columns: List[str] = ["prediction"]
+    out = [labels.astype(np.float32)]
+    if proba is not None:
+        columns.append("probability")
+        out.append(proba.astype(np.float32))
+    return encode_matrix({"columns": columns, "model_version": model_version}, np.column_stack(out))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Arrow IPC stream (pyarrow is imported only when a caller uses it)
+# ──────────────────────────────────────────────────────────────────────────────
+def arrow_to_input(body: bytes, plan) -> np.ndarray:
+    """Arrow IPC stream -> the plan's float32 input matrix."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ColumnarFormatError(f"bad Arrow IPC stream: {e}")
+    columns = table.column_names
+    missing = [c for c in plan.features if c not in columns]
+    if missing:
+        raise MissingFeaturesError(missing, columns, plan.features)
+
+    X = np.empty((table.num_rows, len(plan.features)), dtype=np.float32)
+    for j, c in enumerate(plan.features):
+        col = table.column(c)
+        if c == plan.categorical_col:
+            if pa.types.is_dictionary(col.type):
+                col = col.cast(col.type.value_type)
+            if not (pa.types.is_string(col.type) or pa.types.is_large_string(col.type)):
+                raise ColumnarFormatError(f"column '{c}' must be a string or dictionary<string> column, got {col.type}")
+            codes = pc.index_in(col, value_set=pa.array(plan.categories, type=col.type))
+            if codes.null_count:
+                unseen = pc.unique(pc.filter(col, pc.is_null(codes))).to_pylist()
+                raise UnknownCategoryError(
+                    f"Unknown category in '{c}': {sorted(map(str, unseen))}. Allowed: {plan.categories}")
+            X[:, j] = codes.to_numpy()
+        else:
+            try:
+                X[:, j] = pc.cast(col, pa.float32()).to_numpy()  # nulls -> NaN
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ColumnarFormatError(f"column '{c}': {e}")
+    return X
+
+
+def arrow_response(labels: np.ndarray, proba: Optional[np.ndarray], model_version: str) -> bytes:
+    import pyarrow as pa
+
+    arrays, names = [pa.array(labels.astype(np.int8))], ["prediction"]
+    if proba is not None:
+        arrays.append(pa.array(proba.astype(np.float32)))
+        names.append("probability")
+    batch = pa.RecordBatch.from_arrays(arrays, names=names)
+    batch = batch.replace_schema_metadata({"model_version": model_version})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+DECODERS = {ARROW_STREAM: arrow_to_input, FLOAT32_MATRIX: matrix_to_input}
+ENCODERS = {ARROW_STREAM: arrow_response, FLOAT32_MATRIX: matrix_response}
+
+
+def records_to_arrow(records: Sequence[Dict[str, Any]], features: Sequence[str]) -> bytes:
+    """Client helper: JSON-style records -> Arrow IPC request body."""
+    import pyarrow as pa
+
+    table = pa.table({c: [r.get(c) for r in records] for c in features})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
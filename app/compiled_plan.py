@@ -0,0 +1,219 @@
+"""
+Compiled input plan for the trained pipelines.
+
+Built once at model load from ``raw_feature_names_in_`` / ``type_categories_``:
+records are written straight into a float32 matrix (category -> integer code)
+and fed to the underlying estimator, skipping the per-request DataFrame,
+``cast_fn`` copies and the second pipeline pass for ``predict_proba``.
+"""
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ML.dtypes import UnknownCategoryError
+from ML.forest import export_forest
+from ML.native_artifact import NativeXGBModel
+
+
+class MissingFeaturesError(ValueError):
+    """Raised when required features are absent from every record."""
+
+    def __init__(self, missing: List[str], received: List[str], expected: Optional[List[str]] = None):
+        super().__init__(f"Missing required features: {missing}")
+        self.missing = missing
+        self.received = received
+        self.expected = expected
+
+
+class CompiledPlan:
+    """
+    Encodes request records into the estimator's input matrix and scores them.
+
+    ``kind`` is ``"xgb"`` (codes stay in one categorical column) or ``"rf"``
+    (codes are expanded to the fitted one-hot layout). With a ``forest``
+    (``ML.forest.FlatForest``) scoring uses the flattened NumPy engine instead
+    of the estimator.
+    """
+
+    def __init__(self, kind: str, estimator: Any, features: Sequence[str], categories: Sequence[str],
+                 categorical_col: str = "type", onehot_index: Optional[List[int]] = None,
+                 n_onehot: int = 0, iteration_range=None, forest=None, threshold: float = 0.5):
+        self.kind = kind
+        self.estimator = estimator
+        self.features = list(features)
+        self.categories = list(categories)
+        self.categorical_col = categorical_col
+        self.numeric_cols = [c for c in self.features if c != categorical_col]
+        self._cat_pos = self.features.index(categorical_col)
+        self._codes = {c: i for i, c in enumerate(self.categories)}
+        self._onehot_index = np.asarray(onehot_index if onehot_index is not None else [], dtype=np.intp)
+        self._n_onehot = n_onehot
+        self._iteration_range = iteration_range
+        self._booster = estimator.get_booster() if kind == "xgb" else None
+        self.forest = forest
+        self.threshold = threshold
+
+    @property
+    def engine(self) -> str:
+        return "native" if self.forest is not None else "estimator"
+
+    # --- encoding ---
+    def check_features(self, records: List[Dict[str, Any]]) -> None:
+        """Same column-level contract as the DataFrame path: each feature must appear in some record."""
+        present = set().union(*records)
+        missing = [c for c in self.features if c not in present]
+        if missing:
+            received = list(dict.fromkeys(k for r in records for k in r))
+            raise MissingFeaturesError(missing, received, self.features)
+
+    def encode(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        """Records -> float32 matrix in ``features`` order with integer category codes."""
+        self.check_features(records)
+        nan = math.nan
+        codes = self._codes
+        cat_col = self.categorical_col
+        cat_pos = self._cat_pos
+        rows = []
+        unseen = set()
+        for r in records:
+            row = [r.get(c, nan) for c in self.features]
+            code = codes.get(r.get(cat_col))
+            if code is None:
+                unseen.add(str(r.get(cat_col)))
+                code = nan
+            row[cat_pos] = code
+            rows.append(row)
+        if unseen:
+            # strict: fail on unseen categories (same message as ML.dtypes.cast_fn)
+            raise UnknownCategoryError(f"Unknown category in '{cat_col}': {sorted(unseen)}. Allowed: {self.categories}")
+        return np.array(rows, dtype=np.float32)
+
+    def encode_rows(self, records: List[Any]) -> Tuple[np.ndarray, List[int], Dict[int, str]]:
+        """
+        Per-row variant of ``encode`` for bulk scoring: a bad row (not an object,
+        missing feature, unknown category, non-numeric value) is reported in
+        ``errors`` by index instead of failing the batch. Returns the matrix of
+        valid rows and their indices into ``records``.
+        """
+        codes = self._codes
+        cat_col = self.categorical_col
+        numeric_cols = self.numeric_cols
+        rows, ok, errors = [], [], {}
+        for i, r in enumerate(records):
+            if not isinstance(r, dict):
+                errors[i] = "record must be a JSON object"
+                continue
+            missing = [c for c in self.features if c not in r]
+            if missing:
+                errors[i] = f"Missing required features: {missing}"
+                continue
+            code = codes.get(r[cat_col]) if isinstance(r[cat_col], str) else None
+            if code is None:
+                errors[i] = f"Unknown category in '{cat_col}': {r[cat_col]!r}. Allowed: {self.categories}"
+                continue
+            try:
+                row = [math.nan if r[c] is None else float(r[c]) for c in numeric_cols]
+            except (TypeError, ValueError) as e:
+                errors[i] = f"Non-numeric feature value: {e}"
+                continue
+            row.insert(self._cat_pos, code)
+            rows.append(row)
+            ok.append(i)
+        X = np.array(rows, dtype=np.float32).reshape(len(rows), len(self.features))
+        return X, ok, errors
+
+    def _model_input(self, X: np.ndarray) -> np.ndarray:
+        if self.kind == "xgb":
+            return X
+        # one-hot block first, then the numeric passthrough columns (ColumnTransformer order)
+        n = X.shape[0]
+        out = np.zeros((n, self._n_onehot + len(self.numeric_cols)), dtype=np.float32)
+        codes = X[:, self._cat_pos].astype(np.intp)
+        cols = self._onehot_index[codes]
+        known = cols >= 0
+        out[np.flatnonzero(known), cols[known]] = 1.0
+        out[:, self._n_onehot:] = np.delete(X, self._cat_pos, axis=1)
+        return out
+
+    # --- scoring ---
+    def predict_proba_matrix(self, X: np.ndarray) -> np.ndarray:
+        """Class-1 probability for an encoded matrix."""
+        if self.forest is not None:
+            return self.forest.predict_proba(self._model_input(X))
+        if self.kind == "xgb":
+            return self._booster.inplace_predict(X, iteration_range=self._iteration_range)
+        return self.estimator.predict_proba(self._model_input(X))[:, -1]
+
+    def predict_proba(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        return self.predict_proba_matrix(self.encode(records))
+
+    def labels(self, proba: np.ndarray) -> np.ndarray:
+        """Thresholded labels, matching the estimators' own predict() (class 1 iff p > threshold, 0.5 by default)."""
+        return (proba > self.threshold).astype(np.int64)
+
+
+def compile_plan(pipe: Any, engine: str = "estimator") -> Optional[CompiledPlan]:
+    """
+    Build a plan for a pipeline produced by ML/train.py, or return None if the
+    pipeline has a shape we don't recognise (the caller keeps the pandas path).
+
+    ``engine="native"`` scores with the flattened trees from ``ML.forest``
+    instead of calling the estimator.
+    """
+    if engine not in ("estimator", "native"):
+        raise ValueError(f"Unknown inference engine: {engine!r}. Use 'estimator' or 'native'.")
+    features = getattr(pipe, "raw_feature_names_in_", None)
+    categories = getattr(pipe, "type_categories_", None)
+    steps = getattr(pipe, "named_steps", None)
+    native = isinstance(pipe, NativeXGBModel)  # native artifact: the booster is the whole model
+    if features is None or not categories or (not native and (steps is None or "model" not in steps)):
+        return None
+    features = list(features)
+    if "type" not in features:
+        return None
+    estimator = pipe if native else steps["model"]
+
+    if native or ("preprocessor" not in steps and hasattr(estimator, "get_booster")):
+        try:
+            best = estimator.best_iteration
+            iteration_range = (0, int(best) + 1)
+        except AttributeError:
+            iteration_range = (0, 0)  # all trees
+        plan = CompiledPlan("xgb", estimator, features, categories, iteration_range=iteration_range,
+                            threshold=getattr(pipe, "threshold", 0.5))
+    elif "preprocessor" in steps:
+        ct = steps["preprocessor"]
+        ohe = ct.named_transformers_.get("cat")
+        if ohe is None or not hasattr(ohe, "categories_"):
+            return None
+        fitted = list(ohe.categories_[0])
+        onehot_index = [fitted.index(c) if c in fitted else -1 for c in categories]
+        plan = CompiledPlan("rf", estimator, features, categories, onehot_index=onehot_index,
+                            n_onehot=len(fitted))
+    else:
+        return None
+
+    if engine == "native":
+        plan.forest = export_forest(pipe)
+        if plan.forest is None:
+            return None
+
+    return plan if _matches_pipeline(plan, pipe) else None
+
+
+def _matches_pipeline(plan: CompiledPlan, pipe: Any) -> bool:
+    """Self-check at load time: the plan must reproduce the pipeline on a probe batch."""
+    import pandas as pd
+
+    probe = []
+    for i, cat in enumerate(plan.categories):
+        rec = {c: float(i + 1) * 10.0 ** (j % 4) for j, c in enumerate(plan.numeric_cols)}
+        rec[plan.categorical_col] = cat
+        probe.append(rec)
+    try:
+        ours = plan.predict_proba(probe)
+        ref = pipe.predict_proba(pd.DataFrame(probe)[plan.features])[:, -1]
+    except Exception:
+        return False
+    return bool(np.allclose(ours, ref, rtol=1e-5, atol=1e-6))
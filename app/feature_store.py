@@ -0,0 +1,256 @@
+"""
+Online feature store for the per-user temporal features.
+
+Mirrors ``ML.features.build_temporal_features`` one event at a time so callers
+can send raw PaySim transactions (step, nameOrig, amount, type) instead of
+rebuilding the rolling windows themselves.
+
+PaySim steps are whole hours, so each user's state is a ring buffer of at most
+``LONG_WINDOW_H`` per-step buckets ``[step, count, sum, max]`` plus the last
+step seen and the running transaction count. Every update touches a constant
+number of buckets regardless of how busy the user is.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ML.features import LONG_WINDOW_H, SHORT_WINDOW_H
+
+Event = Tuple[str, int, float]  # (nameOrig, step, amount)
+
+
+def _as_float32(x: float) -> float:
+    """Training reads 'amount' as float32; quantize the same way for parity."""
+    return float(np.float32(x))
+
+
+def _window_features(buckets, step: int, count_so_far: int, last_step: Optional[int]) -> Dict[str, Any]:
+    c2 = c6 = 0
+    s2 = s6 = 0.0
+    m2 = None
+    for b_step, b_count, b_sum, b_max in buckets:
+        c6 += b_count
+        s6 += b_sum
+        if b_step > step - SHORT_WINDOW_H:
+            c2 += b_count
+            s2 += b_sum
+            m2 = b_max if m2 is None or b_max > m2 else m2
+    return {
+        "tx_count_2h": c2,
+        "tx_count_6h": c6,
+        "tx_avg_amt_2h": _as_float32(s2 / c2),
+        "tx_sum_amt_6h": _as_float32(s6),
+        "tx_max_amt_2h": _as_float32(m2),
+        "hours_since_last_tx": float(step - last_step) if count_so_far > 0 else -1.0,
+        "tx_count_so_far": count_so_far,
+        "is_returning_user": int(count_so_far > 0),
+    }
+
+
+def to_model_record(txn_type: str, amount: float, temporal: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine a raw transaction and its temporal features into a /predict record."""
+    amount32 = np.float32(amount)
+    return {
+        "type": txn_type,
+        "amount": float(amount32),
+        "amount_log": float(np.log1p(amount32)),
+        **temporal,
+    }
+
+
+# -----------------------------
+# In-process backend
+# -----------------------------
+class _UserState:
+    __slots__ = ("buckets", "last_step", "count_so_far", "touched")
+
+    def __init__(self):
+        self.buckets = deque(maxlen=LONG_WINDOW_H)
+        self.last_step: Optional[int] = None
+        self.count_so_far = 0
+        self.touched = 0.0
+
+
+class InMemoryFeatureStore:
+    """
+    Per-process store. Users idle for longer than ``ttl_s`` are dropped, and at
+    most ``max_users`` users are kept (least recently seen are evicted first).
+    Each gunicorn worker has its own copy; use the Redis backend to share state.
+    """
+
+    def __init__(self, ttl_s: float = 24 * 3600, max_users: int = 1_000_000):
+        self.ttl_s = ttl_s
+        self.max_users = max_users
+        self._users: "OrderedDict[str, _UserState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def _evict(self, now: float) -> None:
+        users = self._users
+        while users:
+            oldest = next(iter(users.values()))
+            if len(users) <= self.max_users and now - oldest.touched <= self.ttl_s:
+                break
+            users.popitem(last=False)
+
+    def _update_locked(self, name_orig: str, step: int, amount: float, now: float) -> Dict[str, Any]:
+        state = self._users.get(name_orig)
+        if state is None or now - state.touched > self.ttl_s:
+            state = _UserState()
+            self._users[name_orig] = state
+        else:
+            self._users.move_to_end(name_orig)
+        state.touched = now
+
+        # Late events are folded into the latest step so buckets stay ordered.
+        if state.last_step is not None and step < state.last_step:
+            step = state.last_step
+
+        buckets = state.buckets
+        while buckets and buckets[0][0] <= step - LONG_WINDOW_H:
+            buckets.popleft()
+        if buckets and buckets[-1][0] == step:
+            top = buckets[-1]
+            top[1] += 1
+            top[2] += amount
+            top[3] = max(top[3], amount)
+        else:
+            buckets.append([step, 1, amount, amount])
+
+        features = _window_features(buckets, step, state.count_so_far, state.last_step)
+        state.count_so_far += 1
+        state.last_step = step
+        return features
+
+    def update(self, name_orig: str, step: int, amount: float) -> Dict[str, Any]:
+        """Record one transaction and return its temporal features."""
+        return self.update_many([(name_orig, step, amount)])[0]
+
+    def update_many(self, events: Iterable[Event]) -> List[Dict[str, Any]]:
+        """Record transactions in order and return their temporal features."""
+        now = time.monotonic()
+        with self._lock:
+            out = [
+                self._update_locked(str(name), int(step), _as_float32(amount), now)
+                for name, step, amount in events
+            ]
+            self._evict(now)
+        return out
+
+
+# -----------------------------
+# Redis-protocol backend (shared across workers/pods)
+# -----------------------------
+# Same bucket algorithm as InMemoryFeatureStore, executed atomically server-side
+# so concurrent workers never interleave updates for the same user.
+_UPDATE_LUA = """
+local step = tonumber(ARGV[1])
+local amount = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+local short_w = tonumber(ARGV[4])
+local long_w = tonumber(ARGV[5])
+
+local raw = redis.call('GET', KEYS[1])
+local st
+if raw then st = cjson.decode(raw) else st = {n = 0, last = -1, b = {}} end
+if st.n > 0 and step < st.last then step = st.last end
+
+local kept = {}
+for _, b in ipairs(st.b) do
+  if b[1] > step - long_w then kept[#kept + 1] = b end
+end
+local top = kept[#kept]
+if top and top[1] == step then
+  top[2] = top[2] + 1
+  top[3] = top[3] + amount
+  if amount > top[4] then top[4] = amount end
+else
+  kept[#kept + 1] = {step, 1, amount, amount}
+end
+
+local c2, s2, m2, c6, s6 = 0, 0, nil, 0, 0
+for _, b in ipairs(kept) do
+  c6 = c6 + b[2]
+  s6 = s6 + b[3]
+  if b[1] > step - short_w then
+    c2 = c2 + b[2]
+    s2 = s2 + b[3]
+    if m2 == nil or b[4] > m2 then m2 = b[4] end
+  end
+end
+
+local since = -1
+if st.n > 0 then since = step - st.last end
+local so_far = st.n
+st.n = st.n + 1
+st.last = step
+st.b = kept
+redis.call('SET', KEYS[1], cjson.encode(st))
+if ttl > 0 then redis.call('EXPIRE', KEYS[1], ttl) end
+
+return {tostring(c2), tostring(c6), string.format('%.17g', s2), string.format('%.17g', s6),
+        string.format('%.17g', m2), tostring(since), tostring(so_far)}
+"""
+
+
+class RedisFeatureStore:
+    """
+    Shared store on any Redis-protocol server. Keys expire after ``ttl_s`` of
+    inactivity; the memory cap is the server's ``maxmemory`` policy.
+    """
+
+    def __init__(self, url: str, ttl_s: float = 24 * 3600, prefix: str = "fraud:fs:", client=None):
+        if client is None:
+            import redis  # optional backend: only needed when enabled
+            client = redis.Redis.from_url(url)
+        self.ttl_s = int(ttl_s)
+        self.prefix = prefix
+        self._client = client
+        self._script = client.register_script(_UPDATE_LUA)
+
+    def update(self, name_orig: str, step: int, amount: float) -> Dict[str, Any]:
+        """Record one transaction and return its temporal features."""
+        return self.update_many([(name_orig, step, amount)])[0]
+
+    def update_many(self, events: Iterable[Event]) -> List[Dict[str, Any]]:
+        """Record transactions in order (one round trip) and return their temporal features."""
+        pipe = self._client.pipeline(transaction=False)
+        for name, step, amount in events:
+            self._script(
+                keys=[f"{self.prefix}{name}"],
+                args=[int(step), repr(_as_float32(amount)), self.ttl_s, SHORT_WINDOW_H, LONG_WINDOW_H],
+                client=pipe,
+            )
+        out = []
+        for c2, c6, s2, s6, m2, since, so_far in pipe.execute():
+            c2, so_far = int(c2), int(so_far)
+            out.append({
+                "tx_count_2h": c2,
+                "tx_count_6h": int(c6),
+                "tx_avg_amt_2h": _as_float32(float(s2) / c2),
+                "tx_sum_amt_6h": _as_float32(float(s6)),
+                "tx_max_amt_2h": _as_float32(float(m2)),
+                "hours_since_last_tx": float(since),
+                "tx_count_so_far": so_far,
+                "is_returning_user": int(so_far > 0),
+            })
+        return out
+
+
+def make_feature_store(backend: str, redis_url: Optional[str] = None, ttl_s: float = 24 * 3600,
+                       max_users: int = 1_000_000):
+    """Build the configured store ('memory' or 'redis')."""
+    backend = backend.lower()
+    if backend == "memory":
+        return InMemoryFeatureStore(ttl_s=ttl_s, max_users=max_users)
+    if backend == "redis":
+        if not redis_url:
+            raise RuntimeError("FEATURE_STORE_REDIS_URL must be set when FEATURE_STORE_BACKEND=redis.")
+        return RedisFeatureStore(redis_url, ttl_s=ttl_s)
+    raise ValueError(f"Unknown feature store backend: {backend!r}. Use 'memory' or 'redis'.")
+
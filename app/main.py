@@ -1,68 +1,415 @@
+import fcntl
+import gc
 import os
+import signal
+import tempfile
 import time
 from typing import Any, Dict, List, Optional
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 
-import joblib
+_IMPORT_STARTED = time.perf_counter()  # startup phase timings are measured from here
+
+import numpy as np
 import pandas as pd
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from prometheus_fastapi_instrumentator import Instrumentator
-from pydantic import BaseModel, ConfigDict
-from azure.storage.blob import BlobServiceClient  # 👈 added import to fetch model from Azure Blob
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from app.admission import ADMISSION_REJECTED, InferenceExecutor, Overloaded, pin_model_threads
+from app.batching import MicroBatcher
+from app.columnar import (ARROW_STREAM, DECODERS, ENCODERS, FLOAT32_MATRIX, JSON, ColumnarFormatError, media_type,
+                          negotiate)
+from app.compiled_plan import MissingFeaturesError, UnknownCategoryError, compile_plan
+from app.feature_store import make_feature_store, to_model_record
+from app.metrics import STARTUP_PHASE_SECONDS, StageTimings, TimedRoute, begin
+from app.model_store import ArtifactCache, BlobArtifactSource, ModelReloader, file_digest
+from app.prediction_cache import PredictionCache, entry, make_prediction_cache, record_keys
+from app.profiler import ProfilerBusy, collapsed, sample_stacks
+from app.shadow import ShadowBatch, ShadowLog, ShadowScorer, parse_challengers
+from app.streaming import NDJSONStreamingResponse, score_ndjson
+from ML.native_artifact import is_native_artifact, load_native
+
+# -----------------------------
+# Startup phase timings (reported by /healthcheck and fraud_startup_phase_seconds)
+# -----------------------------
+_startup_timings: Dict[str, float] = {}
+
+
+def _record_phase(name: str, seconds: float) -> None:
+    _startup_timings[name] = round(seconds, 4)
+    STARTUP_PHASE_SECONDS.labels(name).set(seconds)
+
+
+@contextmanager
+def _startup_phase(name: str):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_phase(name, time.perf_counter() - t)
+
+
+_record_phase("imports", time.perf_counter() - _IMPORT_STARTED)
 
 # -----------------------------
 # Environment + Config
 # -----------------------------
 APP_VERSION = os.getenv("APP_VERSION", "0.1.0")
-MODEL_DIR = "/model"                                 # where model will be stored inside container
-MODEL_FILE = f"{MODEL_DIR}/pipeline.joblib"          # expected local model path
+MODEL_DIR = os.getenv("MODEL_DIR", "/model")                            # where model will be stored inside container
+MODEL_FILE = os.getenv("MODEL_FILE", f"{MODEL_DIR}/pipeline.joblib")   # expected local model path (joblib pipeline or native .tar, detected by content)
 AZURE_CONN_STR = os.getenv("AZURE_STORAGE_CONNECTION_STRING")  # fetched from K8S secret
 AZURE_CONTAINER = os.getenv("AZURE_MODEL_CONTAINER", "ml-models")  # can be overridden in env
 AZURE_BLOB_NAME = os.getenv("AZURE_MODEL_BLOB", "pipeline.joblib")  # model filename in blob
 
+# Online feature store backing /predict/transactions
+FEATURE_STORE_BACKEND = os.getenv("FEATURE_STORE_BACKEND", "memory")        # "memory" (per worker) or "redis" (shared)
+FEATURE_STORE_REDIS_URL = os.getenv("FEATURE_STORE_REDIS_URL")               # e.g. redis://redis:6379/0
+FEATURE_STORE_TTL_S = float(os.getenv("FEATURE_STORE_TTL_S", str(24 * 3600)))  # drop users idle longer than this
+FEATURE_STORE_MAX_USERS = int(os.getenv("FEATURE_STORE_MAX_USERS", "1000000"))  # memory cap for the in-process store
+
+# Compiled input plan: records -> float32 matrix -> estimator (falls back to the pandas pipeline path)
+USE_COMPILED_PLAN = os.getenv("USE_COMPILED_PLAN", "1") == "1"
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "estimator")  # "estimator" (xgboost/sklearn) or "native" (flattened NumPy trees)
+
+# Opt-in micro-batching for /predict (requires the compiled plan)
+PREDICT_BATCHING = os.getenv("PREDICT_BATCHING", "0") == "1"
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))              # flush once this many records are queued
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "2"))       # ...or once the oldest request waited this long
+
+# Hot reload: poll the blob for a new ETag and swap models without a restart
+MODEL_RELOAD_INTERVAL_S = float(os.getenv("MODEL_RELOAD_INTERVAL_S", "0"))  # 0 disables the reloader
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", f"{MODEL_DIR}/cache")          # content-addressed artifact cache
+MODEL_CACHE_KEEP = int(os.getenv("MODEL_CACHE_KEEP", "3"))                    # versions kept on disk for rollback
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")                                       # required (X-Admin-Token) for /admin/*
+
+# Streaming bulk scoring (/predict/stream)
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "1024"))              # rows scored (and flushed) per chunk
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "65536"))     # longer NDJSON lines are rejected per row
+
+# Idempotent prediction cache for /predict (retried records are answered without re-scoring)
+PREDICTION_CACHE = os.getenv("PREDICTION_CACHE", "0") == "1"
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "100000"))  # per-worker LRU size
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", "300"))              # entry lifetime (both tiers)
+PREDICTION_CACHE_REDIS_URL = os.getenv("PREDICTION_CACHE_REDIS_URL")                      # optional shared tier across workers/pods
+
+# On-demand sampling profiler (/admin/profile)
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))          # longest profile one request may ask for
+
+# Admission control: bounded inference executor per worker (app/admission.py)
+INFERENCE_CONCURRENCY = int(os.getenv("INFERENCE_CONCURRENCY", "2"))        # model calls running at once per worker
+INFERENCE_MODEL_THREADS = int(os.getenv("INFERENCE_MODEL_THREADS", "1"))    # threads per model call (xgboost nthread, n_jobs, BLAS)
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))           # requests waiting for a slot before 429 (0 = unbounded)
+INFERENCE_BUDGET_MS = float(os.getenv("INFERENCE_BUDGET_MS", "2000"))       # default latency budget; X-Request-Budget-Ms overrides (0 = off)
+READY_SATURATED_HOLD_S = float(os.getenv("READY_SATURATED_HOLD_S", "2"))    # /ready stays 503 this long after shedding
+
+# Champion/challenger shadow scoring (app/shadow.py); the champion is MODEL_FILE
+CHALLENGER_MODELS = os.getenv("CHALLENGER_MODELS", "")                      # "name=path,..." local artifacts; empty disables
+SHADOW_QUEUE_MAX = int(os.getenv("SHADOW_QUEUE_MAX", "256"))                # batches waiting for challengers before drops
+SHADOW_LOG_DIR = os.getenv("SHADOW_LOG_DIR", f"{MODEL_DIR}/shadow")         # Arrow IPC logs of champion vs challenger scores
+SHADOW_LOG_ROTATE_ROWS = int(os.getenv("SHADOW_LOG_ROTATE_ROWS", "1000000"))  # rows per log file
+
 # -----------------------------
 # Utility: Download model if not exists
 # -----------------------------
 def download_model_from_blob():
-    """Downloads the model artifact from Azure Blob Storage into /model."""
+    """Downloads the model artifact from Azure Blob Storage into /model (atomically)."""
     if not AZURE_CONN_STR:
         raise RuntimeError("AZURE_STORAGE_CONNECTION_STRING not found in environment variables.")
 
     os.makedirs(MODEL_DIR, exist_ok=True)
     print(f"🔍 Checking Azure Blob for model: container={AZURE_CONTAINER}, blob={AZURE_BLOB_NAME}")
 
-    blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONN_STR)
-    blob_client = blob_service_client.get_blob_client(container=AZURE_CONTAINER, blob=AZURE_BLOB_NAME)
+    blob_client = _get_blob_client()
 
-    # Download model bytes to local /model directory
-    with open(MODEL_FILE, "wb") as f:
-        f.write(blob_client.download_blob().readall())
+    # Download into a temp file next to MODEL_FILE, then rename: readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=MODEL_DIR, prefix=".pipeline.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            downloader = blob_client.download_blob()
+            for chunk in downloader.chunks():  # streamed: the artifact is never held in memory
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        _write_model_etag(downloader.properties.etag)  # before the rename: a present MODEL_FILE has its ETag
+        os.replace(tmp_path, MODEL_FILE)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
     print(f"✅ Model downloaded successfully from Azure Blob to {MODEL_FILE}")
 
+
+def _write_model_etag(etag: Optional[str]) -> None:
+    """Records which blob version MODEL_FILE came from, so the reloader doesn't re-download it."""
+    tmp = f"{MODEL_FILE}.etag.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(etag or "")
+    os.replace(tmp, f"{MODEL_FILE}.etag")
+
+
+def _read_model_etag() -> Optional[str]:
+    try:
+        with open(f"{MODEL_FILE}.etag") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None  # baked into the image / mounted: unknown until the first poll
+
+
+def _get_blob_client():
+    from azure.storage.blob import BlobServiceClient  # imported only when a download/reload actually needs it
+
+    blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONN_STR)
+    return blob_service_client.get_blob_client(container=AZURE_CONTAINER, blob=AZURE_BLOB_NAME)
+
+
+def ensure_model_file():
+    """Downloads the model once per pod: workers racing here serialise on a file lock."""
+    if os.path.exists(MODEL_FILE):
+        print("📁 Local model already present, skipping download...")
+        return
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    with open(f"{MODEL_FILE}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(MODEL_FILE):  # another worker finished while we waited
+                print("📁 Model downloaded by another worker, skipping download...")
+                return
+            print("📦 Local model not found — downloading from Azure Blob...")
+            download_model_from_blob()
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+# -----------------------------
+# Model bundle: one artifact + everything derived from it
+# -----------------------------
+class ModelBundle:
+    """Everything derived from one artifact. Reloads swap the whole bundle as a single reference."""
+
+    def __init__(self, model: Any, digest: str, info: Optional[Dict[str, Any]] = None):
+        self.model = model
+        self.expected_features = _get_expected_features(model)
+        self.supports_proba = hasattr(model, "predict_proba")
+        # pandas path runs the preprocessing steps once and calls the estimator directly (timed per stage)
+        if len(getattr(model, "steps", ())) > 1:  # sklearn Pipeline (native artifacts have no steps)
+            self.preprocess, self.estimator = model[:-1], model[-1]
+        else:
+            self.preprocess, self.estimator = None, model
+        self.allowed_type_categories = getattr(model, "type_categories_", None)
+        pin_model_threads(model, INFERENCE_MODEL_THREADS)  # concurrency comes from the executor, not the model
+        self.plan = compile_plan(model, engine=INFERENCE_ENGINE) if USE_COMPILED_PLAN else None
+        self.digest = digest
+        self.version = digest[:12]  # reported as model_version
+        self.info = dict(info or {})
+        self.loaded_at = time.time()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "sha256": self.digest,
+            "etag": self.info.get("etag"),
+            "blob_version_id": self.info.get("blob_version_id"),
+            "loaded_at": self.loaded_at,
+            "compiled_plan": f"{self.plan.kind}/{self.plan.engine}" if self.plan else None,
+        }
+
+
+def build_bundle(path: str, digest: Optional[str] = None, info: Optional[Dict[str, Any]] = None) -> ModelBundle:
+    """Loads an artifact from disk into a ready-to-serve bundle."""
+    return ModelBundle(load_artifact(path), digest or file_digest(path), info)
+
+
+def load_artifact(path: str) -> Any:
+    """Native artifact (booster + manifest, nothing unpickled) or a joblib-pickled pipeline, by content."""
+    if is_native_artifact(path):
+        return load_native(path)
+    import joblib  # only pickled pipelines need it
+
+    return joblib.load(path)
+
+
+def _swap_bundle(bundle: ModelBundle) -> None:
+    global _bundle
+    previous, _bundle = _bundle, bundle  # in-flight requests keep the bundle they already read
+    if _prediction_cache is not None and previous is not None and previous.version != bundle.version:
+        _prediction_cache.clear_local()  # keys carry the model version; free the old model's entries
+
+
+def load_model():
+    """Downloads (if needed) and loads the model into the module globals."""
+    with _startup_phase("download"):
+        ensure_model_file()
+    with _startup_phase("load"):
+        model = load_artifact(MODEL_FILE)
+        digest = file_digest(MODEL_FILE)
+    with _startup_phase("compile"):
+        bundle = ModelBundle(model, digest)
+    _swap_bundle(bundle)
+    plan_info = f"{_bundle.plan.kind}/{_bundle.plan.engine}" if _bundle.plan else "off"
+    print(f"✅ Model {_bundle.version} loaded successfully and ready for inference (compiled plan: {plan_info}).")
+    if CHALLENGER_MODELS:
+        with _startup_phase("challengers"):
+            load_challengers()
+
+
+def load_challengers():
+    """Loads the CHALLENGER_MODELS artifacts; a challenger that fails to load is skipped, never fatal."""
+    global _challengers
+    _challengers = {}
+    for name, path in parse_challengers(CHALLENGER_MODELS).items():
+        try:
+            bundle = build_bundle(path)
+        except Exception as e:
+            print(f"⚠️ Challenger {name!r} ({path}) not loaded: {e}")
+            continue
+        if bundle.plan is None:
+            print(f"⚠️ Challenger {name!r} skipped: shadow scoring needs a compiled plan.")
+            continue
+        _challengers[name] = bundle
+        print(f"✅ Challenger {name!r} {bundle.version} loaded ({bundle.plan.kind}/{bundle.plan.engine}).")
+
+
+def preload_model():
+    """
+    Called in the gunicorn master (see gunicorn_conf.py) before workers fork.
+    Workers inherit the loaded model copy-on-write; gc.freeze() keeps the
+    collector from touching (and so copying) the inherited objects.
+    """
+    global _preloaded
+    load_model()
+    _preloaded = True
+    gc.collect()
+    gc.freeze()
+
+
+def reload_preloaded():
+    """
+    Called in the gunicorn master on SIGHUP (gunicorn_conf.on_reload), before
+    the workers are respawned. A worker that finds a new version or rolls back
+    records it in the cache's ACTIVE marker and sends the master SIGHUP, so
+    the master loads that version once and every new worker shares it
+    copy-on-write, instead of each worker loading a private copy.
+    """
+    if MODEL_RELOAD_INTERVAL_S <= 0 or _bundle is None:
+        return
+    cache = ArtifactCache(MODEL_CACHE_DIR, keep=MODEL_CACHE_KEEP)
+    digest = cache.active().get("sha256")
+    if not digest or digest == _bundle.digest or not cache.has(digest):
+        return
+    try:
+        bundle = build_bundle(cache.path(digest), digest, cache.meta(digest))
+    except Exception as e:  # respawn the workers on the current model
+        print(f"⚠️ Master could not load model {digest[:12]}: {type(e).__name__}: {e}")
+        return
+    _swap_bundle(bundle)
+    gc.unfreeze()  # let the previous model be collected, then freeze the new one for the workers
+    gc.collect()
+    gc.freeze()
+    print(f"🔄 Master loaded model {bundle.version}; respawning workers.")
+
 # -----------------------------
 # FastAPI lifecycle: load model on startup
 # -----------------------------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """FastAPI lifecycle context: runs on startup and shutdown."""
-    global _model, _expected_features, _supports_proba, _allowed_type_categories
+    global _feature_store, _batcher, _reloader, _prediction_cache, _executor, _shadow
 
-    # Step 1 — Download model if missing
-    if not os.path.exists(MODEL_FILE):
-        print("📦 Local model not found — downloading from Azure Blob...")
-        download_model_from_blob()
+    # Steps 1-2 — Download model if missing and load it (already done in the master when preloaded)
+    if _bundle is None:
+        load_model()
     else:
-        print("📁 Local model already present, skipping download...")
+        print(f"✅ Using model preloaded by the gunicorn master (pid={os.getpid()}).")
+
+    # Step 3 — Online feature store for raw-transaction scoring
+    _feature_store = make_feature_store(
+        FEATURE_STORE_BACKEND,
+        redis_url=FEATURE_STORE_REDIS_URL,
+        ttl_s=FEATURE_STORE_TTL_S,
+        max_users=FEATURE_STORE_MAX_USERS,
+    )
+    print(f"✅ Feature store ready (backend={FEATURE_STORE_BACKEND}).")
 
-    # Step 2 — Load model into memory
-    _model = joblib.load(MODEL_FILE)
-    _expected_features = _get_expected_features(_model)
-    _supports_proba = hasattr(_model, "predict_proba")
-    _allowed_type_categories = getattr(_model, "type_categories_", None)
-    print("✅ Model loaded successfully and ready for inference.")
+    # Step 3b — Optional prediction cache for retried /predict records
+    if PREDICTION_CACHE:
+        _prediction_cache = make_prediction_cache(
+            PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_TTL_S, redis_url=PREDICTION_CACHE_REDIS_URL
+        )
+        tiers = "local+redis" if PREDICTION_CACHE_REDIS_URL else "local"
+        print(f"✅ Prediction cache on ({tiers}, max_entries={PREDICTION_CACHE_MAX_ENTRIES}, ttl={PREDICTION_CACHE_TTL_S:g}s).")
+
+    # Step 3c — Bounded inference executor (model calls + admission control)
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(INFERENCE_MODEL_THREADS)  # BLAS/OpenMP pools in this worker
+    _executor = InferenceExecutor(
+        INFERENCE_CONCURRENCY, INFERENCE_MAX_QUEUE, INFERENCE_BUDGET_MS / 1000, READY_SATURATED_HOLD_S
+    )
+    print(f"✅ Inference executor ready (concurrency={INFERENCE_CONCURRENCY}, model_threads={INFERENCE_MODEL_THREADS}, "
+          f"max_queue={INFERENCE_MAX_QUEUE}, budget_ms={INFERENCE_BUDGET_MS:g}).")
+
+    # Step 4 — Optional micro-batching scheduler
+    if PREDICT_BATCHING:
+        if _bundle.plan is None:
+            print("⚠️ PREDICT_BATCHING=1 needs the compiled plan; serving requests unbatched.")
+        else:
+            _batcher = MicroBatcher(lambda: _bundle, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS,
+                                    run=_executor.run)
+            _batcher.start()
+            print(f"✅ Micro-batching on (max_batch_size={BATCH_MAX_SIZE}, max_wait_ms={BATCH_MAX_WAIT_MS}).")
+
+    # Step 4b — Optional shadow scoring of challengers (loaded with the champion)
+    if _challengers:
+        _shadow = ShadowScorer(_challengers, ShadowLog(SHADOW_LOG_DIR, rotate_rows=SHADOW_LOG_ROTATE_ROWS),
+                               max_queue=SHADOW_QUEUE_MAX)
+        _shadow.start()
+        print(f"✅ Shadow scoring {sorted(_challengers)} against the champion (log dir={SHADOW_LOG_DIR}).")
+
+    # Step 5 — Optional background hot reloader
+    if MODEL_RELOAD_INTERVAL_S > 0:
+        if not AZURE_CONN_STR:
+            raise RuntimeError("MODEL_RELOAD_INTERVAL_S needs AZURE_STORAGE_CONNECTION_STRING.")
+        _reloader = _make_reloader(BlobArtifactSource(_get_blob_client()))
+        _reloader.start()
+        print(f"✅ Model reloader polling every {MODEL_RELOAD_INTERVAL_S:g}s (cache={MODEL_CACHE_DIR}).")
+
+    _record_phase("ready", time.perf_counter() - _IMPORT_STARTED)
+    print("⏱️ Startup: " + ", ".join(f"{k} {v:.3f}s" for k, v in _startup_timings.items()))
     yield
 
+    if _reloader is not None:
+        _reloader.stop()
+        _reloader = None
+    if _batcher is not None:
+        await _batcher.stop()
+        _batcher = None
+    if _shadow is not None:
+        _shadow.stop()
+        _shadow = None
+    _executor.shutdown()
+    _executor = None
+
+
+def _make_reloader(source) -> ModelReloader:
+    """Reloader over the local cache; the startup model is adopted so it can be rolled back to."""
+    cache = ArtifactCache(MODEL_CACHE_DIR, keep=MODEL_CACHE_KEEP)
+    digest = cache.put_file(MODEL_FILE, {"source": MODEL_FILE, "activated_at": _bundle.loaded_at})
+    reloader = ModelReloader(
+        source,
+        cache,
+        load_fn=build_bundle,
+        swap_fn=_swap_bundle,
+        active_digest=lambda: _bundle.digest if _bundle else None,
+        interval_s=MODEL_RELOAD_INTERVAL_S,
+        # preloaded: the master loads new versions (reload_preloaded) and respawns the workers
+        publish=(lambda _digest: os.kill(os.getppid(), signal.SIGHUP)) if _preloaded else None,
+    )
+    reloader.adopt(digest, etag=_read_model_etag())
+    return reloader
+
 
 # -----------------------------
 # App setup
@@ -72,10 +419,12 @@ app = FastAPI(
     version=APP_VERSION,
     description="Serves fraud predictions from a trained fraud-detection pipeline.",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # orjson renders the probability lists several times faster
 )
 
-# Prometheus metrics instrumentation
+# Prometheus metrics instrumentation (per-stage predict histograms: app/metrics.py)
 Instrumentator().instrument(app).expose(app)
+app.router.route_class = TimedRoute
 
 # -----------------------------
 # Request/Response Models
@@ -88,15 +437,39 @@ class PredictResponse(BaseModel):
     probabilities: Optional[List[float]] = None
     model_version: Optional[str] = None
     inference_ms: float  # latency per call in milliseconds
+    queue_ms: Optional[float] = None    # micro-batching only: time waiting for the batch to flush
+    compute_ms: Optional[float] = None  # micro-batching only: time scoring the whole batch
     model_config = ConfigDict(protected_namespaces=())
 
+class Transaction(BaseModel):
+    """Raw PaySim-shaped transaction; temporal features are computed server-side."""
+    step: int
+    nameOrig: str
+    amount: float
+    type: str
+
+class TransactionsRequest(BaseModel):
+    transactions: List[Transaction]
+
+# /predict reads its body itself (JSON or a binary format, see app/columnar.py); documented here
+_BINARY_BODY = {"schema": {"type": "string", "format": "binary"}}
+PREDICT_REQUEST_BODY = {
+    "required": True,
+    "content": {JSON: {"schema": PredictRequest.model_json_schema()}, ARROW_STREAM: _BINARY_BODY, FLOAT32_MATRIX: _BINARY_BODY},
+}
+
 # -----------------------------
 # Global Model Cache
 # -----------------------------
-_model: Optional[Any] = None
-_expected_features: Optional[List[str]] = None
-_supports_proba: bool = False
-_allowed_type_categories: Optional[list] = None
+_bundle: Optional[ModelBundle] = None  # live model; replaced wholesale on reload
+_preloaded = False  # loaded in the gunicorn master before fork (preload_model)
+_feature_store: Optional[Any] = None
+_batcher: Optional[MicroBatcher] = None
+_reloader: Optional[ModelReloader] = None
+_prediction_cache: Optional[PredictionCache] = None
+_executor: Optional[InferenceExecutor] = None
+_challengers: Dict[str, ModelBundle] = {}  # name -> bundle, scored off the request path
+_shadow: Optional[ShadowScorer] = None
 
 def _get_expected_features(m) -> Optional[List[str]]:
     """Extract expected feature names from model."""
@@ -114,65 +487,486 @@ def healthcheck():
     """Kubernetes health probe."""
     return {
         "status": "ok",
-        "model_loaded": _model is not None,
+        "model_loaded": _bundle is not None,
         "version": APP_VERSION,
-        "expected_features": _expected_features,
+        "model_version": _bundle.version if _bundle else None,
+        "expected_features": _bundle.expected_features if _bundle else None,
+        "startup_s": _startup_timings,
     }
 
 @app.get("/ready")
 def ready():
-    """Readiness probe for AKS."""
-    if _model is None:
+    """Readiness probe for AKS; also 503 while this worker is shedding load, so traffic moves to other pods."""
+    if _bundle is None:
         raise HTTPException(status_code=503, detail="Model not loaded yet")
-    return {"status": "ready", "version": APP_VERSION}
+    inference = _executor.stats() if _executor is not None else None
+    if _executor is not None and _executor.saturated:
+        raise HTTPException(status_code=503, detail={"message": "Saturated", "inference": inference})
+    return {"status": "ready", "version": APP_VERSION, "model_version": _bundle.version, "inference": inference}
+
+
+# -----------------------------
+# Admin: model versions
+# -----------------------------
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set, then require it in X-Admin-Token."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled (ADMIN_TOKEN not set)")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.get("/admin/model", dependencies=[Depends(require_admin)])
+def admin_model():
+    """Active model version, cached versions available for rollback, and reloader state."""
+    if _bundle is None:
+        raise HTTPException(status_code=503, detail="Model not loaded yet")
+    out: Dict[str, Any] = {"active": _bundle.describe(), "pid": os.getpid()}
+    if _challengers:
+        out["challengers"] = {name: b.describe() for name, b in _challengers.items()}
+        out["shadow"] = _shadow.stats() if _shadow is not None else None
+    if _reloader is not None:
+        out["cached"] = _reloader.cache.entries()
+        out["reloader"] = {
+            "interval_s": _reloader.interval_s,
+            "last_poll": _reloader.last_poll,
+            "last_etag": _reloader.last_etag,
+            "last_error": _reloader.last_error,
+        }
+    return out
+
+
+@app.post("/admin/model/rollback", dependencies=[Depends(require_admin)])
+def admin_model_rollback(version: str = Query(..., description="Cached model_version / sha256 prefix / ETag")):
+    """
+    Activate a cached version in every worker and hold it until the blob
+    changes again. Under gunicorn preload the workers are respawned on it
+    (``"respawning": true``); otherwise this worker switches now and the others
+    on their next poll.
+    """
+    if _reloader is None:
+        raise HTTPException(status_code=409, detail="Model reloader not enabled (MODEL_RELOAD_INTERVAL_S=0)")
+    digest = _reloader.cache.resolve(version)
+    if digest is None:
+        raise HTTPException(status_code=404, detail=f"No unique cached model matches {version!r}")
+    if _reloader.activate(digest, pin=True) is None:
+        return {"active": _reloader.cache.meta(digest), "respawning": True, "pid": os.getpid()}
+    return {"active": _bundle.describe(), "respawning": False, "pid": os.getpid()}
+
+
+# -----------------------------
+# Admin: on-demand profiling
+# -----------------------------
+@app.get("/admin/profile", dependencies=[Depends(require_admin)], response_class=PlainTextResponse)
+async def admin_profile(
+    seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS, description="How long to sample"),
+    interval_ms: float = Query(10.0, ge=1, le=1000, description="Sampling interval"),
+    idle: bool = Query(False, description="Also count threads parked in wait/select"),
+):
+    """
+    Samples this worker's Python stacks for `seconds` and returns them in
+    collapsed format (flamegraph.pl / speedscope). The worker keeps serving
+    while it is profiled; X-Worker-PID tells which worker answered.
+    """
+    try:
+        stacks, samples = await run_in_threadpool(sample_stacks, seconds, interval_ms / 1000, idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        collapsed(stacks),
+        headers={"X-Worker-PID": str(os.getpid()), "X-Profile-Samples": str(samples)},
+    )
 
 
 # -----------------------------
 # Prediction Endpoint
 # -----------------------------
-@app.post("/predict", response_model=PredictResponse, response_model_exclude_none=True)
-def predict(
-    req: PredictRequest,
+@app.post("/predict", response_model=PredictResponse, response_model_exclude_none=True,
+          openapi_extra={"requestBody": PREDICT_REQUEST_BODY})
+async def predict(
+    request: Request,
     return_proba: bool = Query(True, description="Include class-1 probabilities if supported"),
+    x_request_budget_ms: Optional[float] = Header(None, gt=0, description="Latency budget (default INFERENCE_BUDGET_MS)"),
 ):
-    """Main inference endpoint."""
-    if _model is None:
+    """
+    Main inference endpoint. JSON by default; Arrow IPC or raw float32-matrix
+    bodies by Content-Type, and responses in either by Accept (app/columnar.py).
+    """
+    bundle = _bundle
+    if bundle is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
+    body = await request.body()
+    content_type = media_type(request.headers.get("content-type"))
+    response_type = negotiate(request.headers.get("accept"), content_type)
+    if content_type in DECODERS:
+        return await _predict_columnar(request, bundle, body, content_type, response_type, return_proba,
+                                       x_request_budget_ms)
+
+    try:
+        req = PredictRequest.model_validate_json(body)  # pydantic-core parses + validates in one pass
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
     if not req.records:
         raise HTTPException(status_code=422, detail="`records` must be a non-empty list")
 
     t0 = time.perf_counter()
-    df = pd.DataFrame(req.records)
+    timings = begin(request, "/predict", bundle.version, len(req.records))
+    budget_s = x_request_budget_ms / 1000 if x_request_budget_ms is not None else None
+    arrived = getattr(request.state, "arrived", timings.started)
+    try:
+        cached = await _cache_io(_cache_lookup, bundle, req.records, timings)
+        if cached is not None and None not in cached[1]:  # no model work: answered without an inference slot
+            resp = _cached_response(bundle, cached[1], return_proba, t0)
+        elif _batcher is not None and bundle.plan is not None:
+            _executor.admit(budget_s, arrived)  # the batch itself runs on the executor without a per-request deadline
+            resp = await _score_batched(bundle, req.records, return_proba, t0, timings, cached)
+        else:
+            resp = await _executor.call(_predict_unbatched, bundle, req.records, return_proba, t0, timings, cached,
+                                        budget_s=budget_s, arrived=arrived)
+    except Overloaded as e:
+        raise _shed("/predict", e, timings, len(req.records))
+    timings.finished = time.perf_counter()
+    if response_type != JSON:
+        proba = np.asarray(resp.probabilities, dtype=np.float32) if resp.probabilities is not None else None
+        return _binary_response(response_type, np.asarray(resp.predictions), proba, resp.model_version, resp.inference_ms)
+    return resp
 
-    # --- validate input features ---
-    if _expected_features:
-        missing = [c for c in _expected_features if c not in df.columns]
-        if missing:
+
+async def _predict_columnar(request: Request, bundle: ModelBundle, body: bytes, content_type: str, response_type: str,
+                            return_proba: bool, budget_ms: Optional[float]):
+    """Binary request body: decoded straight into the plan's input matrix (no prediction cache / micro-batching)."""
+    if bundle.plan is None:
+        raise HTTPException(status_code=415, detail=f"{content_type} bodies need the compiled plan (USE_COMPILED_PLAN=1)")
+    t0 = time.perf_counter()
+    timings = begin(request, "/predict", bundle.version, 0)
+    try:
+        labels, proba = await _executor.call(_score_columnar, bundle, body, content_type, timings,
+                                             budget_s=budget_ms / 1000 if budget_ms is not None else None,
+                                             arrived=getattr(request.state, "arrived", timings.started))
+    except Overloaded as e:
+        raise _shed("/predict", e, timings, 0)
+    request.state.stage_records = len(labels)
+    inference_ms = (time.perf_counter() - t0) * 1000
+    timings.finished = time.perf_counter()
+    if response_type == JSON:
+        return PredictResponse(predictions=labels.tolist(), probabilities=proba.tolist() if return_proba else None,
+                               model_version=bundle.version, inference_ms=inference_ms)
+    return _binary_response(response_type, labels, proba if return_proba else None, bundle.version, inference_ms)
+
+
+def _score_columnar(bundle: ModelBundle, body: bytes, content_type: str, timings: StageTimings):
+    plan = bundle.plan
+    try:
+        with timings.stage("decode"):
+            X = DECODERS[content_type](body, plan)
+        if not len(X):
+            raise HTTPException(status_code=422, detail="Request body has no rows")
+        with timings.stage("predict_proba"):
+            proba = plan.predict_proba_matrix(X)
+    except ColumnarFormatError as e:
+        timings.reject("bad_body", 0)
+        raise HTTPException(status_code=400, detail=f"Invalid {content_type} body: {e}")
+    except MissingFeaturesError as e:
+        timings.reject("missing_features", 0)
+        raise HTTPException(status_code=422, detail=_missing_features_detail(e.expected, e.missing, e.received))
+    except UnknownCategoryError as e:
+        timings.reject("unknown_category", 0)
+        raise HTTPException(status_code=400, detail=f"Inference error: {e}")
+    labels = plan.labels(proba)
+    _offer_shadow(bundle, proba, labels, X=X)
+    return labels, proba
+
+
+def _binary_response(response_type: str, labels: np.ndarray, proba: Optional[np.ndarray], model_version: str,
+                     inference_ms: float) -> Response:
+    return Response(
+        ENCODERS[response_type](labels, proba, model_version),
+        media_type=response_type,
+        headers={"X-Model-Version": model_version, "X-Inference-Ms": f"{inference_ms:.3f}"},
+    )
+
+
+def _predict_unbatched(bundle: ModelBundle, records: List[Dict[str, Any]], return_proba: bool,
+                       t0: float, timings: Optional[StageTimings] = None, cached=None) -> PredictResponse:
+    """`cached` is the request's _cache_lookup result (looked up before admission)."""
+    timings = timings or StageTimings("/predict", bundle.version)
+    if bundle.plan is not None:
+        return _score_records(bundle, records, return_proba, t0, timings, cached)
+    with timings.stage("dataframe"):
+        df = pd.DataFrame(records)
+    return _score_frame(bundle, df, return_proba, t0, timings, cached)
+
+
+async def _score_batched(bundle: ModelBundle, records: List[Dict[str, Any]], return_proba: bool, t0: float,
+                         timings: StageTimings, cached=None) -> PredictResponse:
+    """
+    Scores records through the micro-batcher (shared vectorised call with concurrent requests).
+    With `cached` (from _cache_lookup) only the uncached records are submitted.
+    """
+    todo = [i for i, h in enumerate(cached[1]) if h is None] if cached is not None else None
+    try:
+        res = await _batcher.submit([records[i] for i in todo] if todo is not None else records)
+        if todo is not None and res.model.version != bundle.version:  # reloaded meanwhile: hits are the old model's
+            todo, res = None, await _batcher.submit(records)
+    except MissingFeaturesError as e:
+        timings.reject("missing_features", len(records))
+        raise HTTPException(status_code=422, detail=_missing_features_detail(e.expected, e.missing, e.received))
+    except Exception as e:
+        if isinstance(e, UnknownCategoryError):
+            timings.reject("unknown_category", len(records))
+        raise HTTPException(status_code=400, detail=f"Inference error: {e}")
+
+    timings.add("queue", res.queue_ms / 1000)
+    timings.add("batch_compute", res.compute_ms / 1000)
+    labels = res.model.plan.labels(res.proba)
+    _offer_shadow(res.model, res.proba, labels, X=res.X,
+                  records=[records[i] for i in todo] if todo is not None else records)
+    preds, proba = labels.tolist(), res.proba.tolist()
+    if todo is not None:
+        await _cache_io(_cache_store, cached[0], todo, preds, proba)
+        preds, proba = _merge_cached(cached[1], todo, preds, proba)
+    return PredictResponse(
+        predictions=preds,
+        probabilities=proba if return_proba else None,
+        model_version=res.model.version,
+        inference_ms=(time.perf_counter() - t0) * 1000,
+        queue_ms=res.queue_ms,
+        compute_ms=res.compute_ms,
+    )
+
+
+@app.post("/predict/transactions", response_model=PredictResponse, response_model_exclude_none=True)
+async def predict_transactions(
+    req: TransactionsRequest,
+    request: Request,
+    return_proba: bool = Query(True, description="Include class-1 probabilities if supported"),
+    x_request_budget_ms: Optional[float] = Header(None, gt=0, description="Latency budget (default INFERENCE_BUDGET_MS)"),
+):
+    """Scores raw transactions, deriving the temporal features from the online feature store."""
+    bundle = _bundle
+    if bundle is None or _feature_store is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if not req.transactions:
+        raise HTTPException(status_code=422, detail="`transactions` must be a non-empty list")
+
+    # Reject unknown types before they are recorded in the per-user state
+    timings = begin(request, "/predict/transactions", bundle.version, len(req.transactions))
+    allowed = bundle.allowed_type_categories
+    if allowed:
+        unknown = sorted({t.type for t in req.transactions} - set(allowed))
+        if unknown:
+            timings.reject("unknown_category", len(req.transactions))
             raise HTTPException(
                 status_code=422,
                 detail={
-                    "message": "Missing required features",
-                    "missing_features": missing,
-                    "expected_features": _expected_features,
-                    "received_columns": list(df.columns),
+                    "message": "Unknown transaction type",
+                    "unknown_types": unknown,
+                    "allowed_types": list(allowed),
                 },
             )
-        extras = [c for c in df.columns if c not in _expected_features]
+
+    t0 = time.perf_counter()
+    budget_s = x_request_budget_ms / 1000 if x_request_budget_ms is not None else None
+    arrived = getattr(request.state, "arrived", timings.started)
+    try:  # admitted before the feature store is touched: a shed request leaves no per-user state behind
+        resp = await _executor.call(_score_transactions, bundle, req.transactions, return_proba, t0, timings,
+                                    budget_s=budget_s, arrived=arrived)
+    except Overloaded as e:
+        raise _shed("/predict/transactions", e, timings, len(req.transactions))
+    timings.finished = time.perf_counter()
+    return resp
+
+
+def _score_transactions(bundle: ModelBundle, transactions: List[Transaction], return_proba: bool, t0: float,
+                        timings: StageTimings) -> PredictResponse:
+    with timings.stage("features"):
+        temporal = _feature_store.update_many((t.nameOrig, t.step, t.amount) for t in transactions)
+        records = [to_model_record(t.type, t.amount, f) for t, f in zip(transactions, temporal)]
+    if bundle.plan is not None:
+        return _score_records(bundle, records, return_proba, t0, timings)
+    with timings.stage("dataframe"):
+        df = pd.DataFrame(records)
+    return _score_frame(bundle, df, return_proba, t0, timings)
+
+
+@app.post("/predict/stream", response_class=NDJSONStreamingResponse)
+async def predict_stream(
+    request: Request,
+    return_proba: bool = Query(True, description="Include class-1 probabilities if supported"),
+):
+    """
+    Bulk scoring: NDJSON in (one record per line), NDJSON out (one result per
+    line, then a summary). Bad rows are reported per line instead of failing
+    the upload.
+    """
+    bundle = _bundle  # one model version for the whole stream
+    if bundle is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return NDJSONStreamingResponse(
+        score_ndjson(bundle, request.stream(), return_proba, STREAM_CHUNK_ROWS, STREAM_MAX_LINE_BYTES,
+                     run=_executor.run),
+        headers={"X-Model-Version": bundle.version},
+    )
+
+
+def _shed(endpoint: str, e: Overloaded, timings: StageTimings, n_records: int) -> HTTPException:
+    """HTTP 429/503 with Retry-After for a request rejected by admission control."""
+    ADMISSION_REJECTED.labels(endpoint, e.reason).inc()
+    timings.reject(e.reason, n_records)
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+
+
+def _missing_features_detail(expected: List[str], missing: List[str], received: List[str]) -> Dict[str, Any]:
+    return {
+        "message": "Missing required features",
+        "missing_features": missing,
+        "expected_features": expected,
+        "received_columns": received,
+    }
+
+
+# -----------------------------
+# Shadow scoring hand-off
+# -----------------------------
+def _offer_shadow(bundle: ModelBundle, proba: np.ndarray, labels: np.ndarray, X: Optional[np.ndarray] = None,
+                  records: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Hands the champion's batch to the challengers (non-blocking; references only, nothing is copied)."""
+    if _shadow is not None:
+        plan = bundle.plan
+        _shadow.offer(ShadowBatch(bundle.version, proba, labels, X=X, features=plan.features,
+                                  categories=plan.categories, records=records))
+
+
+# -----------------------------
+# Prediction cache helpers
+# -----------------------------
+def _cache_lookup(bundle: ModelBundle, records: List[Dict[str, Any]], timings: StageTimings):
+    """(keys, cached entries) aligned with `records`, or None when the prediction cache is off."""
+    if _prediction_cache is None or not bundle.expected_features:
+        return None
+    with timings.stage("cache"):
+        keys = record_keys(bundle.version, bundle.expected_features, records)
+        return keys, _prediction_cache.get_many(keys)
+
+
+def _cache_store(keys: List[Optional[bytes]], todo: List[int], labels: List[Any], proba: Optional[List[float]]) -> None:
+    """Caches freshly scored rows; `labels` / `proba` are aligned with `todo` (indices into `keys`)."""
+    _prediction_cache.put_many([
+        (keys[i], entry(labels[j], proba[j] if proba is not None else None))
+        for j, i in enumerate(todo) if keys[i] is not None
+    ])
+
+
+async def _cache_io(fn, *args):
+    """The shared tier is network I/O, so it runs off the event loop (local lookups take microseconds)."""
+    if _prediction_cache is not None and _prediction_cache.shared is not None:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+def _cached_response(bundle: ModelBundle, hits: List[Any], return_proba: bool, t0: float) -> PredictResponse:
+    """Every record was cached: answer without touching the model."""
+    return PredictResponse(
+        predictions=[h[0] for h in hits],
+        probabilities=[h[1] for h in hits] if (return_proba and bundle.supports_proba) else None,
+        model_version=bundle.version,
+        inference_ms=(time.perf_counter() - t0) * 1000,
+    )
+
+
+def _score_records(bundle: ModelBundle, records: List[Dict[str, Any]], return_proba: bool,
+                   t0: float, timings: StageTimings, cached=None) -> PredictResponse:
+    """
+    Scores raw records through the compiled plan (single model pass for labels + probabilities).
+    With `cached` (from _cache_lookup) the whole request is still validated, but only the
+    uncached rows are scored.
+    """
+    plan = bundle.plan
+    todo = [i for i, h in enumerate(cached[1]) if h is None] if cached is not None else None
+    try:
+        with timings.stage("encode"):
+            X = plan.encode(records)
+        with timings.stage("predict_proba"):
+            fresh = plan.predict_proba_matrix(X if todo is None else X[todo])
+        if todo is None:
+            proba = fresh
+        else:
+            proba = np.array([h[1] if h is not None else 0.0 for h in cached[1]], dtype=fresh.dtype)
+            proba[todo] = fresh
+    except MissingFeaturesError as e:
+        timings.reject("missing_features", len(records))
+        raise HTTPException(status_code=422, detail=_missing_features_detail(e.expected, e.missing, e.received))
+    except Exception as e:
+        if isinstance(e, UnknownCategoryError):
+            timings.reject("unknown_category", len(records))
+        raise HTTPException(status_code=400, detail=f"Inference error: {e}")
+
+    labels = plan.labels(proba)
+    _offer_shadow(bundle, proba, labels, X=X, records=records)
+    if todo is not None:
+        _cache_store(cached[0], todo, labels[todo].tolist(), fresh.tolist())
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    return PredictResponse(
+        predictions=labels.tolist(),
+        probabilities=proba.tolist() if return_proba else None,
+        model_version=bundle.version,
+        inference_ms=elapsed_ms,
+    )
+
+
+def _score_frame(bundle: ModelBundle, df: pd.DataFrame, return_proba: bool, t0: float,
+                 timings: StageTimings, cached=None) -> PredictResponse:
+    """Validates the feature columns of `df` and runs the model on it (only on the uncached rows with `cached`)."""
+    expected = bundle.expected_features
+    # --- validate input features ---
+    if expected:
+        missing = [c for c in expected if c not in df.columns]
+        if missing:
+            timings.reject("missing_features", len(df))
+            raise HTTPException(status_code=422, detail=_missing_features_detail(expected, missing, list(df.columns)))
+        extras = [c for c in df.columns if c not in expected]
         if extras:
             df = df.drop(columns=extras)
-        df = df[_expected_features]
+        df = df[expected]
 
     # --- perform prediction ---
     try:
-        preds = _model.predict(df).tolist()
-        proba = _model.predict_proba(df)[:, -1].tolist() if (return_proba and _supports_proba) else None
+        X = df
+        if bundle.preprocess is not None:
+            with timings.stage("cast"):
+                X = bundle.preprocess.transform(df)  # once for both predict and predict_proba
+        todo = None
+        if cached is not None:
+            todo = [i for i, h in enumerate(cached[1]) if h is None]
+            X = X.iloc[todo] if hasattr(X, "iloc") else X[todo]
+        with timings.stage("predict"):
+            preds = bundle.estimator.predict(X).tolist()
+        proba = None
+        if bundle.supports_proba and (return_proba or todo is not None):  # cached entries keep the probability
+            with timings.stage("predict_proba"):
+                proba = bundle.estimator.predict_proba(X)[:, -1].tolist()
+        if todo is not None:
+            _cache_store(cached[0], todo, preds, proba)
+            preds, proba = _merge_cached(cached[1], todo, preds, proba)
         elapsed_ms = (time.perf_counter() - t0) * 1000
 
         return PredictResponse(
             predictions=preds,
-            probabilities=proba,
-            model_version=APP_VERSION,
+            probabilities=proba if return_proba else None,
+            model_version=bundle.version,
             inference_ms=elapsed_ms,
         )
     except Exception as e:
+        if isinstance(e, UnknownCategoryError):
+            timings.reject("unknown_category", len(df))
         raise HTTPException(status_code=400, detail=f"Inference error: {e}")
+
+
+def _merge_cached(hits: List[Any], todo: List[int], preds: List[Any], proba: Optional[List[float]]):
+    """Cached entries with the freshly scored rows (aligned with `todo`) written into their slots."""
+    out_preds = [h[0] if h is not None else None for h in hits]
+    out_proba = [h[1] if h is not None else None for h in hits]
+    for j, i in enumerate(todo):
+        out_preds[i] = preds[j]
+        out_proba[i] = proba[j] if proba is not None else None
+    return out_preds, (out_proba if proba is not None else None)
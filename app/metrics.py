@@ -0,0 +1,130 @@
+"""
+Per-stage latency metrics for the predict endpoints.
+
+The Instrumentator only sees whole HTTP requests. Here each request collects
+the time spent in every stage of the predict path and flushes it to
+``fraud_predict_stage_seconds`` once the response is built, together with
+records-per-request and rejection histograms. All series carry the model
+version and the worker PID, so a p99 regression can be pinned to a stage, a
+model rollout or a single worker.
+
+Stages (which ones appear depends on the path a request took):
+
+    parse          body read + JSON decode + Pydantic validation (before ``begin``)
+    decode         Arrow IPC / float32-matrix body -> input matrix (binary /predict bodies)
+    features       online feature store update (/predict/transactions)
+    cache          prediction cache key + lookup (PREDICTION_CACHE=1)
+    dataframe      records -> DataFrame (pandas pipeline path)
+    cast           cast_fn and any other steps before the estimator (pandas path)
+    predict        estimator predict (pandas path)
+    predict_proba  estimator predict_proba (both paths)
+    encode         records -> float32 matrix (compiled plan path)
+    queue          wait in the micro-batch queue (PREDICT_BATCHING=1)
+    batch_compute  scoring the whole micro-batch the request was part of
+    serialize      response model validation + JSON rendering (after the endpoint)
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+from prometheus_client import Gauge, Histogram
+
+_RECORD_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+STAGE_SECONDS = Histogram(
+    "fraud_predict_stage_seconds",
+    "Time spent per stage of the predict path.",
+    ["endpoint", "stage", "model_version", "pid"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+REQUEST_RECORDS = Histogram(
+    "fraud_predict_request_records",
+    "Records per predict request.",
+    ["endpoint", "model_version", "pid"],
+    buckets=_RECORD_BUCKETS,
+)
+REJECTED_RECORDS = Histogram(
+    "fraud_predict_rejected_records",
+    "Records in requests rejected for bad input, by reason (the count is the number of rejected requests).",
+    ["endpoint", "reason", "model_version", "pid"],
+    buckets=_RECORD_BUCKETS,
+)
+STARTUP_PHASE_SECONDS = Gauge(
+    "fraud_startup_phase_seconds",
+    "Duration of each startup phase (imports, download, load, compile) and time from import to ready.",
+    ["phase"],
+)
+
+
+class StageTimings:
+    """Stage durations of one request; flushed to the histograms by ``TimedRoute``."""
+
+    __slots__ = ("endpoint", "model_version", "started", "finished", "durations", "rejection")
+
+    def __init__(self, endpoint: str, model_version: str):
+        self.endpoint = endpoint
+        self.model_version = model_version
+        self.started = time.perf_counter()  # endpoint entered
+        self.finished: Optional[float] = None  # endpoint returned its result
+        self.durations: List[Tuple[str, float]] = []
+        self.rejection: Optional[Tuple[str, int]] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations.append((name, time.perf_counter() - t))
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations.append((name, seconds))
+
+    def reject(self, reason: str, n_records: int) -> None:
+        self.rejection = (reason, n_records)
+
+    def observe(self, n_records: int) -> None:
+        pid = str(os.getpid())
+        for name, seconds in self.durations:
+            STAGE_SECONDS.labels(self.endpoint, name, self.model_version, pid).observe(seconds)
+        REQUEST_RECORDS.labels(self.endpoint, self.model_version, pid).observe(n_records)
+        if self.rejection is not None:
+            reason, n = self.rejection
+            REJECTED_RECORDS.labels(self.endpoint, reason, self.model_version, pid).observe(n)
+
+
+def begin(request: Request, endpoint: str, model_version: str, n_records: int) -> StageTimings:
+    """Called first thing in an endpoint; ``TimedRoute`` picks the timings up from the request."""
+    timings = StageTimings(endpoint, model_version)
+    request.state.stage_timings = timings
+    request.state.stage_records = n_records
+    return timings
+
+
+class TimedRoute(APIRoute):
+    """
+    Times what FastAPI does around an endpoint: building the Pydantic request
+    model before it ("parse") and validating + rendering the response after it
+    ("serialize"). Routes whose endpoint never calls ``begin`` are untouched.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request):
+            t_route = time.perf_counter()
+            request.state.arrived = t_route  # latency budgets (app/admission.py) count from here
+            try:
+                return await handler(request)
+            finally:
+                timings: Optional[StageTimings] = getattr(request.state, "stage_timings", None)
+                if timings is not None:
+                    timings.add("parse", timings.started - t_route)
+                    if timings.finished is not None:
+                        timings.add("serialize", time.perf_counter() - timings.finished)
+                    timings.observe(request.state.stage_records)
+
+        return timed_handler
@@ -0,0 +1,345 @@
+"""
+Versioned local model cache and background hot reloader.
+
+Artifacts live in a content-addressed cache (``<root>/<sha256>/pipeline.joblib``
+plus ``meta.json``). The reloader polls the blob's properties; when the ETag
+changes it streams the new artifact into the cache (verifying the checksum),
+loads it on its own thread and hands it to ``swap_fn``. The last ``keep``
+versions stay on disk so a rollback never needs a download.
+
+The cache directory is shared by every worker of a pod, and its ``ACTIVE``
+marker says which version they all serve. A new ETag is downloaded by the one
+worker that takes the marker lock first; the others find the marker already
+updated and follow it. A rollback rewrites the marker (pinned to the blob's
+current ETag), so it applies to every worker and survives their polls until
+the blob changes again. With ``publish`` set (gunicorn preload), a worker that
+changes the marker notifies the master instead of loading the model itself:
+the master loads it once and respawns the workers, which share it
+copy-on-write.
+"""
+import base64
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+ARTIFACT_NAME = "pipeline.joblib"
+ACTIVE = "ACTIVE"  # marker: the version every worker on this cache serves
+_CHUNK = 1 << 20
+
+
+class ChecksumError(RuntimeError):
+    """Raised when a downloaded artifact does not match the blob's checksum."""
+
+
+def file_digest(path: str) -> str:
+    """sha256 hex digest of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# -----------------------------
+# Content-addressed artifact cache
+# -----------------------------
+class ArtifactCache:
+    def __init__(self, root: str, keep: int = 3):
+        self.root = root
+        self.keep = max(1, keep)
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest, ARTIFACT_NAME)
+
+    def has(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def _lock(self, name: str = ".lock"):
+        f = open(os.path.join(self.root, name), "w")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    @contextmanager
+    def coordinating(self):
+        """Cross-process lock around reading + changing the ACTIVE marker (not held by put_*/prune)."""
+        with self._lock(".active.lock"):
+            yield
+
+    def active(self) -> Dict[str, Any]:
+        """The ACTIVE marker: {"sha256", "etag", "pinned_etag", "updated_at"}, or {} before the first version."""
+        try:
+            with open(os.path.join(self.root, ACTIVE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def set_active(self, digest: str, etag: Optional[str] = None, pinned_etag: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Points every worker at ``digest``. ``etag`` is the blob version it came
+        from; ``pinned_etag`` holds it against that blob ETag (rollback).
+        """
+        marker = {"sha256": digest, "etag": etag, "pinned_etag": pinned_etag, "updated_at": time.time()}
+        path = os.path.join(self.root, ACTIVE)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(marker, f)
+        os.replace(tmp, path)
+        return marker
+
+    def _meta_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest, "meta.json")
+
+    def meta(self, digest: str) -> Dict[str, Any]:
+        try:
+            with open(self._meta_path(digest)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"sha256": digest}
+
+    def _write_meta(self, digest: str, meta: Dict[str, Any]) -> None:
+        tmp = f"{self._meta_path(digest)}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path(digest))
+
+    def update_meta(self, digest: str, **fields) -> Dict[str, Any]:
+        meta = {**self.meta(digest), **{k: v for k, v in fields.items() if v is not None}}
+        self._write_meta(digest, meta)
+        return meta
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Cached versions, most recently activated first."""
+        out = []
+        for name in os.listdir(self.root):
+            if not name.startswith(".") and self.has(name):
+                out.append(self.meta(name))
+        return sorted(out, key=lambda m: m.get("activated_at", m.get("cached_at", 0)), reverse=True)
+
+    def resolve(self, ref: str) -> Optional[str]:
+        """Full digest for a digest prefix (e.g. a reported model_version) or an ETag."""
+        matches = [m["sha256"] for m in self.entries() if m["sha256"].startswith(ref) or m.get("etag") == ref]
+        return matches[0] if len(matches) == 1 else None
+
+    def _commit(self, tmp_file: str, digest: str, meta: Dict[str, Any]) -> None:
+        target = os.path.join(self.root, digest)
+        if self.has(digest):
+            os.unlink(tmp_file)
+        else:
+            staging = tempfile.mkdtemp(dir=self.root, prefix=".staging.")
+            os.replace(tmp_file, os.path.join(staging, ARTIFACT_NAME))
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(staging, target)
+        self.update_meta(digest, sha256=digest, cached_at=time.time(), **meta)
+
+    def put_stream(self, chunks: Iterable[bytes], meta: Optional[Dict[str, Any]] = None,
+                   expected_md5: Optional[bytes] = None) -> str:
+        """Stream an artifact into the cache; verifies ``expected_md5`` when the source provides it."""
+        sha, md5 = hashlib.sha256(), hashlib.md5()
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".download.", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    sha.update(chunk)
+                    md5.update(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            if expected_md5 is not None and md5.digest() != bytes(expected_md5):
+                raise ChecksumError(
+                    f"MD5 mismatch: expected {base64.b64encode(bytes(expected_md5)).decode()}, "
+                    f"got {base64.b64encode(md5.digest()).decode()}"
+                )
+            digest = sha.hexdigest()
+            with self._lock():
+                self._commit(tmp, digest, meta or {})
+            return digest
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def put_file(self, path: str, meta: Optional[Dict[str, Any]] = None) -> str:
+        """Adopt an existing local artifact (hard link when possible, else copy)."""
+        digest = file_digest(path)
+        if self.has(digest):
+            self.update_meta(digest, **(meta or {}))
+            return digest
+        tmp = os.path.join(self.root, f".adopt.{os.getpid()}.part")
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+        with self._lock():
+            self._commit(tmp, digest, meta or {})
+        return digest
+
+    def prune(self, protect: Iterable[str] = ()) -> List[str]:
+        """Drop all but the ``keep`` most recently activated versions (never the ACTIVE one)."""
+        protect = set(protect) | {self.active().get("sha256")}
+        removed = []
+        with self._lock():
+            for m in self.entries()[self.keep:]:
+                if m["sha256"] not in protect:
+                    shutil.rmtree(os.path.join(self.root, m["sha256"]), ignore_errors=True)
+                    removed.append(m["sha256"])
+        return removed
+
+
+# -----------------------------
+# Azure Blob source
+# -----------------------------
+class BlobArtifactSource:
+    """Wraps an azure ``BlobClient`` (or anything with the same two methods)."""
+
+    def __init__(self, blob_client):
+        self.blob_client = blob_client
+
+    def properties(self) -> Dict[str, Any]:
+        p = self.blob_client.get_blob_properties()
+        settings = getattr(p, "content_settings", None)
+        return {
+            "etag": p.etag,
+            "blob_version_id": getattr(p, "version_id", None),
+            "last_modified": str(getattr(p, "last_modified", "")),
+            "size": getattr(p, "size", None),
+            "content_md5": getattr(settings, "content_md5", None),
+        }
+
+    def chunks(self, etag: Optional[str] = None) -> Iterable[bytes]:
+        """Stream the blob; pinned to ``etag`` so a concurrent upload can't mix versions."""
+        kwargs = {}
+        if etag is not None:
+            from azure.core import MatchConditions
+            kwargs = {"etag": etag, "match_condition": MatchConditions.IfNotModified}
+        return self.blob_client.download_blob(**kwargs).chunks()
+
+
+# -----------------------------
+# Background reloader
+# -----------------------------
+class ModelReloader:
+    """
+    ``load_fn(path, digest, meta)`` builds a model bundle (off the request path),
+    ``swap_fn(bundle)`` publishes it, and ``active_digest()`` reports what is live.
+    With ``publish(digest)`` set, versions this worker activates are handed to it
+    instead (e.g. signal the gunicorn master) and the marker is not followed
+    locally: the respawned workers come up with it.
+    """
+
+    def __init__(self, source: BlobArtifactSource, cache: ArtifactCache, load_fn: Callable,
+                 swap_fn: Callable, active_digest: Callable[[], Optional[str]], interval_s: float = 60.0,
+                 publish: Optional[Callable[[str], None]] = None):
+        self.source = source
+        self.cache = cache
+        self.load_fn = load_fn
+        self.swap_fn = swap_fn
+        self.active_digest = active_digest
+        self.interval_s = interval_s
+        self.publish = publish
+        self.last_etag: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.last_poll: Optional[float] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="model-reloader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def adopt(self, digest: str, etag: Optional[str] = None) -> None:
+        """
+        Marks the startup version active unless another worker already set the
+        marker. ``etag`` is the blob version it was downloaded from, so the
+        first poll doesn't fetch (and respawn workers for) the same model again.
+        """
+        if etag is not None:
+            self.cache.update_meta(digest, etag=etag)
+        with self.cache.coordinating():
+            if not self.cache.active():
+                self.cache.set_active(digest, etag=etag)
+
+    def pin(self) -> None:
+        """Hold the active version until the blob changes again (against its ETag as of now, not the last poll)."""
+        etag = self.source.properties()["etag"]
+        with self.cache.coordinating():
+            active = self.cache.active()
+            self.cache.set_active(active["sha256"], etag=active.get("etag"), pinned_etag=etag)
+
+    def activate(self, digest: str, pin: bool = False) -> Any:
+        """
+        Make a cached version live in every worker (used for rollback); ``pin``
+        holds it until the blob changes. Returns the bundle loaded here, or
+        None when it was handed to ``publish``.
+        """
+        with self._lock:
+            pinned_etag = self.source.properties()["etag"] if pin else None
+            bundle = None
+            if self.publish is None:  # load before pointing the other workers at it
+                bundle = self.load_fn(self.cache.path(digest), digest, self.cache.meta(digest))
+            with self.cache.coordinating():
+                self.cache.set_active(digest, etag=self.cache.meta(digest).get("etag"), pinned_etag=pinned_etag)
+            self.cache.update_meta(digest, activated_at=time.time())
+            if bundle is None:
+                self.publish(digest)
+            else:
+                self.swap_fn(bundle)
+            return bundle
+
+    def poll_once(self) -> bool:
+        """Check the blob once and follow the ACTIVE marker; returns True if the live version changed."""
+        with self._lock:
+            self.last_poll = time.time()
+            props = self.source.properties()
+            etag = props["etag"]
+            changed = False
+            with self.cache.coordinating():  # whoever gets here first downloads; the others see its marker
+                active = self.cache.active()
+                if etag not in (active.get("etag"), active.get("pinned_etag")):
+                    md5 = props.pop("content_md5", None)
+                    meta = {k: v for k, v in props.items() if v is not None}
+                    digest = self.cache.resolve(etag)
+                    if digest is None:
+                        digest = self.cache.put_stream(self.source.chunks(etag), meta=meta, expected_md5=md5)
+                    else:
+                        self.cache.update_meta(digest, **meta)
+                    changed = digest != active.get("sha256")  # else: same bytes re-uploaded, just note the ETag
+                    active = self.cache.set_active(digest, etag=etag)
+                    if changed:
+                        self.cache.update_meta(digest, activated_at=time.time())
+            self.last_etag = etag
+            if changed:
+                self.cache.prune()
+            digest = active["sha256"]
+
+            if self.publish is not None:
+                if changed:
+                    self.publish(digest)
+                return changed
+            if digest == self.active_digest() or not self.cache.has(digest):
+                return False
+            self.swap_fn(self.load_fn(self.cache.path(digest), digest, self.cache.meta(digest)))
+            return True
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                if self.poll_once():
+                    print(f"🔄 Model hot-reloaded (etag={self.last_etag}).")
+                self.last_error = None
+            except Exception as e:  # keep serving the current model
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ Model reload failed: {self.last_error}")
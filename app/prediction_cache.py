@@ -0,0 +1,192 @@
+"""
+Idempotent prediction cache for /predict.
+
+Gateways retry on timeouts, so many records arrive more than once. A record's
+key is a 128-bit BLAKE2b hash of the model version plus its canonical form:
+the category string and the numeric features in ``expected_features`` order,
+cast to float32 exactly as the model sees them (so ``9000`` and ``9000.0``
+share an entry, and extra keys are ignored). A new model version gets new
+keys, so entries never outlive the model that produced them.
+
+Two tiers: a bounded per-process LRU with TTL, and optionally a shared
+Redis-protocol tier so retries that land on another worker or pod still hit.
+Records that can't be canonicalised (missing features, non-numeric values)
+get no key and are always scored.
+"""
+import hashlib
+import math
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter
+
+Entry = Tuple[int, float]  # (label, class-1 probability; NaN when the model has none)
+
+CACHE_HITS = Counter("fraud_predict_cache_hits_total", "Records answered from the prediction cache.", ["tier"])
+CACHE_MISSES = Counter("fraud_predict_cache_misses_total", "Records looked up in the prediction cache and scored.")
+CACHE_ERRORS = Counter("fraud_predict_cache_errors_total", "Failed calls to the shared (Redis) cache tier.", ["op"])
+
+_PACK = struct.Struct("<bd")
+
+
+def record_keys(model_version: str, features: Sequence[str], records: List[Dict[str, Any]],
+                categorical_col: str = "type") -> List[Optional[bytes]]:
+    """Cache key per record, or None for records that can't be canonicalised."""
+    numeric = [c for c in features if c != categorical_col]
+    prefix = model_version.encode() + b"\0"
+    keys: List[Optional[bytes]] = []
+    for r in records:
+        try:
+            cat = r[categorical_col]
+            values = [r[c] for c in numeric]
+            if not isinstance(cat, str) or any(type(v) is not float and type(v) is not int for v in values):
+                keys.append(None)
+                continue
+            packed = array("f", values).tobytes()  # float32, like the model input
+        except (KeyError, TypeError, OverflowError):
+            keys.append(None)
+            continue
+        h = hashlib.blake2b(prefix, digest_size=16)
+        h.update(cat.encode())
+        h.update(b"\0")
+        h.update(packed)
+        keys.append(h.digest())
+    return keys
+
+
+# -----------------------------
+# In-process tier
+# -----------------------------
+class LocalLRU:
+    """Bounded LRU with a per-entry TTL; one per worker."""
+
+    def __init__(self, max_entries: int = 100_000, ttl_s: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[bytes, Tuple[float, Entry]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[Entry]]:
+        now = time.monotonic()
+        out: List[Optional[Entry]] = []
+        with self._lock:
+            entries = self._entries
+            for k in keys:
+                item = entries.get(k)
+                if item is None:
+                    out.append(None)
+                elif item[0] < now:
+                    del entries[k]
+                    out.append(None)
+                else:
+                    entries.move_to_end(k)
+                    out.append(item[1])
+        return out
+
+    def put_many(self, items: List[Tuple[bytes, Entry]]) -> None:
+        expires = time.monotonic() + self.ttl_s
+        with self._lock:
+            entries = self._entries
+            for k, v in items:
+                entries[k] = (expires, v)
+                entries.move_to_end(k)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# -----------------------------
+# Shared Redis-protocol tier
+# -----------------------------
+class RedisTier:
+    """Entries as 9-byte values under ``prefix + key``, expiring after ``ttl_s``."""
+
+    def __init__(self, url: str, ttl_s: float = 300.0, prefix: str = "fraud:pc:", client=None):
+        if client is None:
+            import redis  # optional tier: only needed when enabled
+            client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.ttl_s = max(1, int(ttl_s))
+        self.prefix = prefix.encode()
+        self._client = client
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[Entry]]:
+        try:
+            raw = self._client.mget([self.prefix + k for k in keys])
+        except Exception:
+            CACHE_ERRORS.labels("get").inc()
+            return [None] * len(keys)
+        return [_PACK.unpack(v) if v is not None else None for v in raw]
+
+    def put_many(self, items: List[Tuple[bytes, Entry]]) -> None:
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for k, (label, proba) in items:
+                pipe.set(self.prefix + k, _PACK.pack(label, proba), ex=self.ttl_s)
+            pipe.execute()
+        except Exception:
+            CACHE_ERRORS.labels("put").inc()
+
+
+class PredictionCache:
+    """Local LRU in front of an optional shared tier; shared hits are copied into the local tier."""
+
+    def __init__(self, local: LocalLRU, shared: Optional[RedisTier] = None):
+        self.local = local
+        self.shared = shared
+
+    def get_many(self, keys: List[Optional[bytes]]) -> List[Optional[Entry]]:
+        """Entries aligned with ``keys`` (None for misses and for records without a key)."""
+        wanted = [i for i, k in enumerate(keys) if k is not None]
+        out: List[Optional[Entry]] = [None] * len(keys)
+        if not wanted:
+            return out
+        missing = []
+        for i, v in zip(wanted, self.local.get_many([keys[i] for i in wanted])):
+            if v is None:
+                missing.append(i)
+            else:
+                out[i] = v
+        CACHE_HITS.labels("local").inc(len(wanted) - len(missing))
+
+        if missing and self.shared is not None:
+            found = []
+            for i, v in zip(missing, self.shared.get_many([keys[i] for i in missing])):
+                if v is not None:
+                    out[i] = v
+                    found.append((keys[i], v))
+            if found:
+                self.local.put_many(found)
+                CACHE_HITS.labels("redis").inc(len(found))
+                missing = [i for i in missing if out[i] is None]
+        CACHE_MISSES.inc(len(missing))
+        return out
+
+    def put_many(self, items: List[Tuple[bytes, Entry]]) -> None:
+        if not items:
+            return
+        self.local.put_many(items)
+        if self.shared is not None:
+            self.shared.put_many(items)
+
+    def clear_local(self) -> None:
+        self.local.clear()
+
+
+def make_prediction_cache(max_entries: int, ttl_s: float, redis_url: Optional[str] = None) -> PredictionCache:
+    """Local LRU, plus the shared tier when ``redis_url`` is set."""
+    shared = RedisTier(redis_url, ttl_s=ttl_s) if redis_url else None
+    return PredictionCache(LocalLRU(max_entries=max_entries, ttl_s=ttl_s), shared)
+
+
+def entry(label: Any, proba: Optional[float]) -> Entry:
+    return int(label), (math.nan if proba is None else float(proba))
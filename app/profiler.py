@@ -0,0 +1,65 @@
+"""
+In-process sampling profiler for a live worker (served by /admin/profile).
+
+A background thread snapshots every thread's Python stack with
+``sys._current_frames()`` at a fixed interval and counts identical stacks.
+The output is the "collapsed" format read by flamegraph.pl, speedscope and
+inferno: one ``root;caller;...;leaf count`` line per distinct stack. Frames
+are ``function (file:first_line)`` so samples merge per function. Only Python
+frames are visible; time inside C extensions (XGBoost, NumPy) is attributed
+to the Python frame that called them.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Tuple
+
+# Leaf frames of threads that are parked: idle thread-pool workers, the asyncio loop waiting in
+# select, and uvloop (its loop is C code, so an idle loop shows asyncio.Runner.run as the leaf)
+_IDLE_LEAVES = {("threading.py", "wait"), ("selectors.py", "select"), ("runners.py", "run")}
+
+_running = threading.Lock()  # one profile per worker at a time
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(duration_s: float, interval_s: float = 0.01, include_idle: bool = False) -> Tuple[Counter, int]:
+    """Samples all threads except the caller for ``duration_s``. Returns (collapsed stack -> count, samples taken)."""
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running in this worker")
+    try:
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.perf_counter() + duration_s
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                leaf = frame.f_code
+                if not include_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in _IDLE_LEAVES:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(f"thread:{names.get(ident, ident)}")
+                stacks[";".join(reversed(labels))] += 1
+            samples += 1
+            time.sleep(interval_s)
+        return stacks, samples
+    finally:
+        _running.release()
+
+
+def collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,224 @@
+"""
+Champion/challenger shadow scoring.
+
+The champion (MODEL_FILE) answers every request. Challengers (CHALLENGER_MODELS)
+score the same rows afterwards on one background thread per worker. The
+request path only hands over references to what it already built: the input
+matrix encoded once by the champion's plan (validation + casting are not
+repeated) and the champion's probabilities and labels. The hand-off is a
+non-blocking put on a bounded queue. When the queue is full, the batch is
+dropped for the challengers and counted, so a slow or failing challenger never
+delays or fails a request.
+
+Challengers whose input layout (features, categories) matches the champion's
+reuse its matrix; others re-encode the records themselves in the background
+(binary /predict bodies carry no records, so those batches are skipped for
+them). Results are appended to Arrow IPC stream files (zstd-compressed), one
+row per record and challenger::
+
+    ts, batch, row, champion_version, challenger, challenger_version,
+    champion_proba, challenger_proba, delta, champion_label, challenger_label
+
+Read them with ``pyarrow.ipc.open_stream(path).read_all()``. Batches are
+written as they are flushed, so a file cut off by a crash can still be read
+batch by batch (iterate the reader) up to its last complete batch.
+"""
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+SHADOW_RECORDS = Counter("fraud_shadow_scored_records_total", "Records scored by a challenger.", ["challenger"])
+SHADOW_DISAGREEMENTS = Counter(
+    "fraud_shadow_disagreements_total", "Records where a challenger's label differs from the champion's.", ["challenger"]
+)
+SHADOW_DROPPED = Counter(
+    "fraud_shadow_dropped_records_total", "Records not shadow-scored, by reason.", ["reason"]
+)
+SHADOW_QUEUED = Gauge("fraud_shadow_queued_batches", "Batches waiting for the shadow scorer.")
+
+_STOP = object()
+
+
+class ShadowBatch:
+    __slots__ = ("ts", "champion_version", "features", "categories", "X", "records", "proba", "labels")
+
+    def __init__(self, champion_version: str, proba: np.ndarray, labels: np.ndarray, X: Optional[np.ndarray] = None,
+                 features: Optional[List[str]] = None, categories: Optional[List[str]] = None,
+                 records: Optional[List[Dict[str, Any]]] = None):
+        self.ts = time.time()
+        self.champion_version = champion_version
+        self.features = features  # layout of X (the champion plan's)
+        self.categories = categories
+        self.X = X
+        self.records = records
+        self.proba = proba
+        self.labels = labels
+
+
+class ShadowLog:
+    """Buffers result rows and appends them to rotating Arrow IPC stream files."""
+
+    COLUMNS = ("ts", "batch", "row", "champion_version", "challenger", "challenger_version",
+               "champion_proba", "challenger_proba", "delta", "champion_label", "challenger_label")
+
+    def __init__(self, log_dir: str, flush_rows: int = 4096, rotate_rows: int = 1_000_000):
+        import pyarrow as pa  # only needed when challengers are configured
+
+        self._pa = pa
+        self.log_dir = log_dir
+        self.flush_rows = flush_rows
+        self.rotate_rows = rotate_rows
+        codec = next((c for c in ("zstd", "lz4") if pa.Codec.is_available(c)), None)
+        self._options = pa.ipc.IpcWriteOptions(compression=codec)
+        self._schema = pa.schema([
+            ("ts", pa.float64()), ("batch", pa.uint64()), ("row", pa.uint32()),
+            ("champion_version", pa.string()), ("challenger", pa.string()), ("challenger_version", pa.string()),
+            ("champion_proba", pa.float32()), ("challenger_proba", pa.float32()), ("delta", pa.float32()),
+            ("champion_label", pa.int8()), ("challenger_label", pa.int8()),
+        ])
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_rows = 0
+        self._writer = None
+        self._file_rows = 0
+        self.path: Optional[str] = None
+        os.makedirs(log_dir, exist_ok=True)
+
+    def append(self, batch_id: int, batch: ShadowBatch, challenger: str, version: str,
+               proba: np.ndarray, labels: np.ndarray) -> None:
+        n = len(proba)
+        self._pending.append({
+            "ts": np.full(n, batch.ts), "batch": np.full(n, batch_id, dtype=np.uint64),
+            "row": np.arange(n, dtype=np.uint32),
+            "champion_version": [batch.champion_version] * n, "challenger": [challenger] * n,
+            "challenger_version": [version] * n,
+            "champion_proba": batch.proba.astype(np.float32), "challenger_proba": proba.astype(np.float32),
+            "delta": (proba - batch.proba).astype(np.float32),
+            "champion_label": batch.labels.astype(np.int8), "challenger_label": labels.astype(np.int8),
+        })
+        self._pending_rows += n
+        if self._pending_rows >= self.flush_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        pa = self._pa
+        columns = {}
+        for name in self.COLUMNS:
+            parts = [p[name] for p in self._pending]
+            columns[name] = [v for part in parts for v in part] if isinstance(parts[0], list) else np.concatenate(parts)
+        table = pa.table(columns, schema=self._schema)
+        self._pending, self._pending_rows = [], 0
+
+        if self._writer is None or self._file_rows >= self.rotate_rows:
+            self._open()
+        self._writer.write_table(table)
+        self._file_rows += table.num_rows
+
+    def _open(self) -> None:
+        self.close()
+        self.path = os.path.join(self.log_dir, f"shadow-{os.getpid()}-{int(time.time() * 1000)}.arrows")
+        self._writer = self._pa.ipc.new_stream(self._pa.OSFile(self.path, "wb"), self._schema, options=self._options)
+        self._file_rows = 0
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class ShadowScorer:
+    """Background thread scoring challengers on batches the champion already served."""
+
+    def __init__(self, challengers: Dict[str, Any], log: ShadowLog, max_queue: int = 256,
+                 idle_flush_s: float = 1.0):
+        self.challengers = challengers  # name -> bundle with ``plan`` and ``version``
+        self.log = log
+        self.idle_flush_s = idle_flush_s
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._batches = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout_s: float = 5.0) -> None:
+        if self._thread is not None:
+            try:
+                self._queue.put(_STOP, timeout=timeout_s)
+            except queue.Full:
+                pass
+            self._thread.join(timeout_s)
+            alive, self._thread = self._thread.is_alive(), None
+            if alive:  # still scoring: leave the log to it rather than write concurrently
+                return
+        self.log.flush()
+        self.log.close()
+
+    def offer(self, batch: ShadowBatch) -> None:
+        """Called on the request path: never blocks, drops the batch when the queue is full."""
+        try:
+            self._queue.put_nowait(batch)
+        except queue.Full:
+            self.dropped += 1
+            SHADOW_DROPPED.labels("queue_full").inc(len(batch.proba))
+            return
+        SHADOW_QUEUED.inc()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"queued": self._queue.qsize(), "max_queue": self._queue.maxsize, "dropped_batches": self.dropped,
+                "log": self.log.path}
+
+    def _run(self) -> None:
+        try:  # Linux nice values are per thread: the request path wins whenever both want the CPU
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+        while True:
+            try:
+                batch = self._queue.get(timeout=self.idle_flush_s)
+            except queue.Empty:
+                self.log.flush()  # quiet period: make what we have readable
+                continue
+            if batch is _STOP:
+                return
+            SHADOW_QUEUED.dec()
+            self._batches += 1
+            for name, bundle in self.challengers.items():
+                try:
+                    self._score(self._batches, batch, name, bundle)
+                except Exception:
+                    SHADOW_DROPPED.labels("error").inc(len(batch.proba))
+
+    def _score(self, batch_id: int, batch: ShadowBatch, name: str, bundle: Any) -> None:
+        plan = bundle.plan
+        if batch.X is not None and plan.features == batch.features and plan.categories == batch.categories:
+            X = batch.X  # shared: encoded once on the request path
+        elif batch.records is not None:
+            X = plan.encode(batch.records)
+        else:
+            SHADOW_DROPPED.labels("layout").inc(len(batch.proba))
+            return
+        proba = plan.predict_proba_matrix(X)
+        labels = plan.labels(proba)
+        self.log.append(batch_id, batch, name, bundle.version, proba, labels)
+        SHADOW_RECORDS.labels(name).inc(len(proba))
+        SHADOW_DISAGREEMENTS.labels(name).inc(int((labels != batch.labels).sum()))
+
+
+def parse_challengers(spec: str) -> Dict[str, str]:
+    """``"rf=/model/rf.joblib,xgb2=/model/xgb2.tar"`` -> {name: path}."""
+    out: Dict[str, str] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, path = item.partition("=")
+        if not sep or not name.strip() or not path.strip():
+            raise ValueError(f"CHALLENGER_MODELS entries are name=path, got {item!r}")
+        out[name.strip()] = path.strip()
+    return out
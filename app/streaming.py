@@ -0,0 +1,184 @@
+"""
+Streaming NDJSON bulk scoring for /predict/stream.
+
+The request body is one JSON record per line (the same objects ``/predict``
+takes in ``records``). Lines are parsed as the upload arrives, scored in
+fixed-size chunks off the event loop and written back as NDJSON while the
+rest of the body is still being read, so memory is bounded by one chunk no
+matter how large the upload is. Nothing is read ahead of what has been sent:
+a slow reader stalls the ``send`` of the current chunk, which stops us pulling
+the body, which in turn makes the server stop reading the socket.
+
+Each input line gets one output line, in order::
+
+    {"line": 1, "prediction": 0, "probability": 0.0012}
+    {"line": 2, "error": "Unknown category in 'type': 'WIRE'. ..."}
+
+followed by one ``{"summary": {...}}`` line.
+"""
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import orjson
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator reads the request body itself.
+
+    Starlette's version also listens for ``http.disconnect`` on ``receive``,
+    which would swallow the request body chunks the iterator is waiting for.
+    A disconnect still ends the stream: ``Request.stream()`` raises
+    ``ClientDisconnect`` when it sees it.
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Split a byte stream into ``(line_number, line)`` pairs (1-based, blank lines
+    skipped). Lines longer than ``max_line_bytes`` are discarded as they stream
+    in and reported with ``line=None``.
+    """
+    buf = b""
+    lineno = 0
+    oversized = False
+    async for chunk in chunks:
+        buf += chunk
+        start = 0
+        while True:
+            nl = buf.find(b"\n", start)
+            if nl < 0:
+                break
+            lineno += 1
+            line = buf[start:nl].strip()
+            start = nl + 1
+            if oversized or len(line) > max_line_bytes:
+                oversized = False
+                yield lineno, None
+            elif line:
+                yield lineno, line
+        buf = buf[start:]
+        if len(buf) > max_line_bytes:
+            oversized, buf = True, b""
+    lineno += 1
+    if oversized:
+        yield lineno, None
+    elif buf.strip():
+        yield lineno, buf.strip()
+
+
+def score_chunk(bundle: Any, lines: List[Tuple[int, Optional[bytes]]], return_proba: bool) -> Tuple[bytes, int]:
+    """Parses and scores one chunk of lines; returns the NDJSON output and the number of error rows."""
+    linenos, records, results = [], [], {}
+    for lineno, raw in lines:
+        if raw is None:
+            results[lineno] = {"line": lineno, "error": "line exceeds the maximum record size"}
+            continue
+        try:
+            records.append(orjson.loads(raw))
+            linenos.append(lineno)
+        except orjson.JSONDecodeError as e:
+            results[lineno] = {"line": lineno, "error": f"invalid JSON: {e}"}
+
+    if records:
+        if bundle.plan is not None:
+            scored = _score_with_plan(bundle.plan, records, return_proba)
+        else:
+            scored = _score_with_pipeline(bundle, records, return_proba)
+        for lineno, out in zip(linenos, scored):
+            results[lineno] = {"line": lineno, **out}
+
+    body = b"".join(orjson.dumps(results[n]) + b"\n" for n, _ in lines)
+    errors = sum(1 for r in results.values() if "error" in r)
+    return body, errors
+
+
+def _score_with_plan(plan, records: List[Any], return_proba: bool) -> List[Dict[str, Any]]:
+    X, ok, errors = plan.encode_rows(records)
+    out: List[Dict[str, Any]] = [{"error": errors[i]} if i in errors else {} for i in range(len(records))]
+    if ok:
+        try:
+            proba = plan.predict_proba_matrix(X)
+        except Exception as e:
+            for i in ok:
+                out[i] = {"error": f"Inference error: {e}"}
+            return out
+        labels = plan.labels(proba).tolist()
+        proba = proba.tolist()
+        for j, i in enumerate(ok):
+            out[i] = {"prediction": labels[j], "probability": proba[j]} if return_proba else {"prediction": labels[j]}
+    return out
+
+
+def _score_with_pipeline(bundle: Any, records: List[Any], return_proba: bool) -> List[Dict[str, Any]]:
+    """Fallback when the model has no compiled plan: per-row checks, then one DataFrame per chunk."""
+    expected = bundle.expected_features
+    allowed = set(bundle.allowed_type_categories or ())
+    out: List[Dict[str, Any]] = [{} for _ in records]
+    ok = []
+    for i, r in enumerate(records):
+        if not isinstance(r, dict):
+            out[i] = {"error": "record must be a JSON object"}
+        elif expected and any(c not in r for c in expected):
+            out[i] = {"error": f"Missing required features: {[c for c in expected if c not in r]}"}
+        elif allowed and (not isinstance(r.get("type"), str) or r["type"] not in allowed):  # lists/dicts are unhashable
+            out[i] = {"error": f"Unknown category in 'type': {r.get('type')!r}. Allowed: {sorted(allowed)}"}
+        else:
+            ok.append(i)
+    if ok:
+        df = pd.DataFrame([records[i] for i in ok])
+        if expected:
+            df = df[expected]
+        try:
+            labels = bundle.model.predict(df).tolist()
+            proba = bundle.model.predict_proba(df)[:, -1].tolist() if (return_proba and bundle.supports_proba) else None
+        except Exception as e:
+            for i in ok:
+                out[i] = {"error": f"Inference error: {e}"}
+            return out
+        for j, i in enumerate(ok):
+            out[i] = {"prediction": int(labels[j])}
+            if proba is not None:
+                out[i]["probability"] = proba[j]
+    return out
+
+
+async def score_ndjson(bundle: Any, body: AsyncIterator[bytes], return_proba: bool,
+                       chunk_rows: int, max_line_bytes: int, run: Callable = run_in_threadpool) -> AsyncIterator[bytes]:
+    """The response body for /predict/stream: scored NDJSON lines, then a summary line (``run`` scores a chunk off the loop)."""
+    t0 = time.perf_counter()
+    rows = errors = 0
+    chunk: List[Tuple[int, Optional[bytes]]] = []
+    async for item in ndjson_lines(body, max_line_bytes):
+        chunk.append(item)
+        if len(chunk) >= chunk_rows:
+            out, n_err = await run(score_chunk, bundle, chunk, return_proba)
+            rows, errors = rows + len(chunk), errors + n_err
+            chunk = []
+            yield out
+    if chunk:
+        out, n_err = await run(score_chunk, bundle, chunk, return_proba)
+        rows, errors = rows + len(chunk), errors + n_err
+        yield out
+
+    summary = {
+        "rows": rows,
+        "scored": rows - errors,
+        "errors": errors,
+        "model_version": bundle.version,
+        "elapsed_ms": (time.perf_counter() - t0) * 1000,
+    }
+    yield orjson.dumps({"summary": summary}) + b"\n"
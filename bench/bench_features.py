@@ -0,0 +1,104 @@
+"""
+Parity + benchmark: ML.features.build_temporal_features (pandas groupby-rolling)
+vs build_temporal_features_fast (single sort, vectorised windows).
+
+Each engine runs in a fresh subprocess; its memory cost is the peak resident
+set sampled while it runs, minus the RSS after the data was loaded (Linux).
+Parity is checked with assert_frame_equal (exact: values, dtypes, row order)
+on the real data and on a synthetic set with dense same-hour bursts.
+
+    python -m bench.bench_features --data data/paysim.csv --partitions 1,8
+"""
+import argparse
+import json
+import subprocess
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from ML.features import build_temporal_features, build_temporal_features_fast
+from bench.synthetic import synthetic_paysim
+
+USECOLS = ["step", "nameOrig", "amount", "type", "isFraud"]
+DTYPES = {"step": "int32", "nameOrig": "category", "amount": "float32", "type": "category", "isFraud": "int8"}
+
+
+def load(path: str) -> pd.DataFrame:
+    """Reads the data the way ML/train.py does."""
+    return pd.read_csv(path, usecols=USECOLS, dtype=DTYPES, memory_map=True, low_memory=True)
+
+
+def check_parity(df: pd.DataFrame, partitions) -> None:
+    ref = build_temporal_features(df)
+    for p in partitions:
+        pd.testing.assert_frame_equal(build_temporal_features_fast(df, n_partitions=p), ref, check_exact=True)
+
+
+def _rss_mib() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _child(data: str, engine: str, partitions: int) -> None:
+    df = load(data)
+    base = peak = _rss_mib()
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(0.01):
+            peak = max(peak, _rss_mib())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    t0 = time.perf_counter()
+    if engine == "pandas":
+        build_temporal_features(df)
+    else:
+        build_temporal_features_fast(df, n_partitions=partitions)
+    seconds = time.perf_counter() - t0
+    done.set()
+    sampler.join()
+    peak = max(peak, _rss_mib())
+    print(json.dumps({"seconds": seconds, "peak_mib": peak, "extra_mib": peak - base}))
+
+
+def run_engine(data: str, engine: str, partitions: int = 1) -> dict:
+    out = subprocess.check_output([sys.executable, "-m", "bench.bench_features", "--child", engine,
+                                   "--data", data, "--partitions", str(partitions)])
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default="data/paysim.csv")
+    parser.add_argument("--partitions", default="1,8")
+    parser.add_argument("--child", choices=["pandas", "fast"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.data, args.child, int(args.partitions))
+        return
+
+    partitions = [int(x) for x in args.partitions.split(",")]
+    df = load(args.data)
+    check_parity(df, partitions)
+    check_parity(synthetic_paysim(50_000, n_users=40, n_steps=48), partitions)  # dense same-hour bursts
+    print(f"parity: exact on {args.data} ({len(df):,} rows) and synthetic bursts, partitions={partitions}")
+    del df
+
+    print(f"{'engine':>14} {'seconds':>8} {'peak RSS MiB':>13} {'+RSS MiB':>9}")
+    runs = [("pandas", 1)] + [("fast", p) for p in partitions]
+    for engine, p in runs:
+        r = run_engine(args.data, engine, p)
+        label = engine if engine == "pandas" else f"fast/p={p}"
+        print(f"{label:>14} {r['seconds']:>8.2f} {r['peak_mib']:>13.1f} {r['extra_mib']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
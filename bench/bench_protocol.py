@@ -0,0 +1,120 @@
+"""
+/predict wire formats: bytes on the wire and server CPU per 1000 records for JSON, Arrow IPC and the raw float32 matrix.
+
+    python -m bench.bench_protocol --records 1000 --requests 100
+
+Starts one uvicorn worker and sends the same records in each format
+(request and response in the same format), one request at a time. Server CPU
+is the worker's user+system time from /proc over the run, so client-side
+encoding/decoding is excluded. Linux only.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from statistics import median
+from typing import Callable, Dict, List
+
+import httpx
+import joblib
+import orjson
+
+from app.columnar import ARROW_STREAM, FLOAT32_MATRIX, records_to_arrow, records_to_matrix
+from bench.micro import sample_records
+from bench.synthetic import DEFAULT_MODEL, train_synthetic_model
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def _cpu_s(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / _TICKS  # utime + stime
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bodies(records: List[Dict], features: List[str], categories: List[str]) -> Dict[str, Callable[[], bytes]]:
+    return {
+        "json": lambda: orjson.dumps({"records": records}),
+        "arrow": lambda: records_to_arrow(records, features),
+        "float32": lambda: records_to_matrix(records, features, categories),
+    }
+
+
+CONTENT_TYPES = {"json": "application/json", "arrow": ARROW_STREAM, "float32": FLOAT32_MATRIX}
+
+
+def run(model: str, n_records: int, n_requests: int) -> Dict[str, Dict[str, float]]:
+    pipe = joblib.load(model)
+    records = sample_records(pipe, n_records)
+    encoded = {fmt: make() for fmt, make in bodies(records, list(pipe.raw_feature_names_in_),
+                                                      list(pipe.type_categories_)).items()}
+
+    port = _free_port()
+    env = {**os.environ, "MODEL_FILE": os.path.abspath(model), "PYTHONPATH": REPO_ROOT}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+         "--no-access-log"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    results = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            while True:
+                try:
+                    if client.get("/ready").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.05)
+            for fmt, body in encoded.items():
+                headers = {"content-type": CONTENT_TYPES[fmt], "accept": CONTENT_TYPES[fmt]}
+                for _ in range(5):  # warm-up (lazy imports, first-call allocations)
+                    client.post("/predict", content=body, headers=headers).raise_for_status()
+                latencies, response_bytes = [], 0
+                cpu0 = _cpu_s(proc.pid)
+                for _ in range(n_requests):
+                    t0 = time.perf_counter()
+                    r = client.post("/predict", content=body, headers=headers)
+                    latencies.append((time.perf_counter() - t0) * 1000)
+                    r.raise_for_status()
+                    response_bytes = len(r.content)
+                cpu = _cpu_s(proc.pid) - cpu0
+                results[fmt] = {
+                    "request_bytes": len(body),
+                    "response_bytes": response_bytes,
+                    "server_cpu_ms_per_1k": cpu * 1000 / (n_requests * n_records / 1000),
+                    "p50_ms": median(latencies),
+                }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="joblib pipeline; synthetic one trained if missing")
+    parser.add_argument("--records", type=int, default=1000, help="records per request")
+    parser.add_argument("--requests", type=int, default=100, help="requests per format")
+    args = parser.parse_args()
+
+    model = train_synthetic_model(args.model) if args.model == DEFAULT_MODEL else args.model
+    results = run(model, args.records, args.requests)
+    base = results["json"]
+    print(f"{'format':<8} {'request B':>10} {'response B':>11} {'CPU ms/1k rec':>14} {'p50 ms':>8}   vs json (CPU)")
+    for fmt, r in results.items():
+        print(f"{fmt:<8} {r['request_bytes']:>10,} {r['response_bytes']:>11,} {r['server_cpu_ms_per_1k']:>14.2f} "
+              f"{r['p50_ms']:>8.2f}   {base['server_cpu_ms_per_1k'] / r['server_cpu_ms_per_1k']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Cold-start benchmark: wall time from spawning the API to the first 200 from
+/ready, for the joblib pipeline vs the native artifact of the same model.
+
+    python -m bench.bench_startup --model model/pipeline.joblib --runs 5
+
+The native artifact is converted from ``--model`` (ML/native_artifact.py).
+Each run starts a fresh single-worker uvicorn; the startup phases the service
+reports in /healthcheck are averaged alongside.
+"""
+import argparse
+import hashlib
+import os
+import socket
+import subprocess
+import sys
+import time
+from statistics import median
+from typing import Dict, List
+
+import httpx
+import joblib
+
+from ML.native_artifact import save_native
+from bench.synthetic import DEFAULT_MODEL, train_synthetic_model
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_ready(model_file: str, timeout_s: float = 120.0) -> Dict[str, float]:
+    port = _free_port()
+    env = {**os.environ, "MODEL_FILE": os.path.abspath(model_file), "PYTHONPATH": REPO_ROOT}
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with code {proc.returncode}")
+            if time.perf_counter() - t0 > timeout_s:
+                raise TimeoutError(f"{url} not ready after {timeout_s:.0f}s")
+            try:
+                if httpx.get(f"{url}/ready", timeout=0.5).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.005)
+        ready_s = time.perf_counter() - t0
+        phases = httpx.get(f"{url}/healthcheck").json().get("startup_s", {})
+        return {"time_to_ready_s": ready_s, **phases}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="joblib pipeline (XGB); synthetic one trained if missing")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    model = train_synthetic_model(args.model) if args.model == DEFAULT_MODEL else args.model
+    tag = hashlib.blake2b(os.path.abspath(model).encode(), digest_size=4).hexdigest()  # one per source model
+    native = os.path.join(REPO_ROOT, "bench", ".artifacts", f"{os.path.basename(model).replace('.joblib', '')}-{tag}.native.tar")
+    os.makedirs(os.path.dirname(native), exist_ok=True)
+    if save_native(joblib.load(model), native) is None:
+        raise SystemExit(f"{model}: only XGB pipelines have a native artifact")
+
+    results: Dict[str, List[Dict[str, float]]] = {"joblib": [], "native": []}
+    time_to_ready(model)  # warm the page cache / bytecode caches once
+    for _ in range(args.runs):  # interleaved so drift affects both formats alike
+        results["joblib"].append(time_to_ready(model))
+        results["native"].append(time_to_ready(native))
+
+    print(f"{'artifact':<8} {'size':>10}  {'ready p50':>10} {'min':>8}   phases (median s)")
+    for fmt, path in (("joblib", model), ("native", native)):
+        runs = results[fmt]
+        phases = {k: median(r[k] for r in runs) for k in runs[0] if k != "time_to_ready_s"}
+        ready = [r["time_to_ready_s"] for r in runs]
+        print(f"{fmt:<8} {os.path.getsize(path):>10,}  {median(ready):>9.3f}s {min(ready):>7.3f}s   "
+              + ", ".join(f"{k} {v:.3f}" for k, v in phases.items()))
+    j = median(r["time_to_ready_s"] for r in results["joblib"])
+    n = median(r["time_to_ready_s"] for r in results["native"])
+    print(f"\nnative vs joblib: {n - j:+.3f}s to /ready ({(n - j) / j:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
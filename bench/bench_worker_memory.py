@@ -0,0 +1,95 @@
+"""
+Resident memory of a gunicorn pod vs worker count, with and without preload.
+
+Starts `gunicorn -c gunicorn_conf.py app.main:app` for each worker count, warms
+every worker with /predict calls, then sums RSS and PSS (proportional set size:
+shared pages are split between the processes sharing them, so PSS is what the
+pod is actually charged) over the master and its workers, and reports the
+largest worker's private memory (pages that are its own copy). Linux only.
+tests/test_worker_memory.py runs the same measurement as an assertion.
+
+    python -m bench.bench_worker_memory --workers 1,2,4,8
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, Optional
+
+import requests
+
+from bench.bench_preprocessing import SAMPLE_RECORD
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _children(pid: int):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def _mem_kb(pid: int):
+    """(RSS, PSS, private) in KiB; private = pages only this process maps (its own copy, never shared)."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                fields[key] = int(value.split()[0])
+    return fields["Rss"], fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def measure(n_workers: int, preload: bool, port: int, warm_requests: int, env: Optional[Dict[str, str]] = None):
+    """Pod totals (RSS MiB, PSS MiB) and the private MiB of each worker, after warming every worker."""
+    env = dict(os.environ, **(env or {}), WEB_CONCURRENCY=str(n_workers), GUNICORN_PRELOAD="1" if preload else "0",
+               GUNICORN_BIND=f"127.0.0.1:{port}", LOG_LEVEL="warning")
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "app.main:app"],
+                            env=env, cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 180
+        while True:
+            if time.time() > deadline or proc.poll() is not None:
+                raise RuntimeError("gunicorn did not become ready")
+            try:
+                if len(_children(proc.pid)) == n_workers and requests.get(f"{url}/ready", timeout=1).ok:
+                    break
+            except (requests.RequestException, FileNotFoundError):
+                pass
+            time.sleep(0.5)
+
+        # keep-alive off so requests spread across workers
+        for _ in range(warm_requests * n_workers):
+            requests.post(f"{url}/predict", json={"records": [SAMPLE_RECORD]}, timeout=10,
+                          headers={"Connection": "close"}).raise_for_status()
+        time.sleep(1)
+
+        workers = _children(proc.pid)
+        totals = [_mem_kb(p) for p in [proc.pid] + workers]
+        rss = sum(r for r, _, _ in totals) / 1024
+        pss = sum(p for _, p, _ in totals) / 1024
+        return rss, pss, [private / 1024 for _, _, private in totals[1:]]
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--warm-requests", type=int, default=20, help="requests per worker before measuring")
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'mode':>10} {'RSS MiB':>9} {'PSS MiB':>9} {'PSS/worker':>11} {'private/worker':>15}")
+    for n in (int(x) for x in args.workers.split(",")):
+        for preload in (False, True):
+            rss, pss, private = measure(n, preload, args.port, args.warm_requests)
+            mode = "preload" if preload else "per-worker"
+            print(f"{n:>7} {mode:>10} {rss:>9.1f} {pss:>9.1f} {pss / n:>11.1f} {max(private):>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Open-loop load generator for /predict: fires requests at a fixed target rate
+and reports latency percentiles and achieved throughput.
+
+    python -m bench.load --target inprocess --rps 200 --duration 10
+    python -m bench.load --target gunicorn --workers 2 --rps 500
+    python -m bench.load --url http://localhost:8000 --rps 100
+
+Requests are scheduled at ``start + i / rps`` regardless of how fast earlier
+ones complete, and latency is measured from the scheduled send time, so a
+stalled server shows up as queueing delay instead of silently lowering the
+offered load (coordinated omission). ``inprocess`` runs the app under uvicorn
+in a thread of this process; ``gunicorn`` starts the production setup from
+gunicorn_conf.py on a local port. Both serve the synthetic model from
+bench/synthetic.py unless ``--model`` is given.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+import numpy as np
+
+from bench.synthetic import DEFAULT_MODEL, train_synthetic_model
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, timeout_s: float = 60.0, proc: Optional[subprocess.Popen] = None) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} not ready after {timeout_s:.0f}s")
+
+
+# -----------------------------
+# Targets
+# -----------------------------
+@contextlib.contextmanager
+def inprocess_server(model: str) -> Iterator[str]:
+    """The FastAPI app under uvicorn in a background thread of this process."""
+    os.environ["MODEL_FILE"] = os.path.abspath(model)  # read by app.main at import
+    import uvicorn
+    import app.main as api
+
+    api.MODEL_FILE = os.environ["MODEL_FILE"]  # in case app.main was already imported (bench.suite)
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(url)
+        yield url
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+@contextlib.contextmanager
+def gunicorn_server(model: str, workers: int) -> Iterator[str]:
+    """gunicorn + uvicorn workers configured by gunicorn_conf.py, on a free local port."""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "MODEL_FILE": os.path.abspath(model),
+        "GUNICORN_BIND": f"127.0.0.1:{port}",
+        "WEB_CONCURRENCY": str(workers),
+        "LOG_LEVEL": "warning",
+        "PYTHONPATH": REPO_ROOT,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "--access-logfile", "/dev/null", "app.main:app"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(url, proc=proc)
+        yield url
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+# -----------------------------
+# Load generation
+# -----------------------------
+def sample_payload(model: str, batch: int) -> Dict:
+    import joblib
+    from bench.micro import sample_records
+
+    return {"records": sample_records(joblib.load(model), batch)}
+
+
+async def _drive(url: str, payload: Dict, rps: float, duration_s: float, concurrency: int) -> Dict:
+    n = max(1, int(rps * duration_s))
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        await client.post("/predict", json=payload)  # warm-up: connection + first-request costs
+
+        async def one(scheduled: float) -> None:
+            nonlocal errors
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                resp = await client.post("/predict", json=payload)
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - scheduled) * 1000)
+            else:
+                errors += 1
+
+        start = time.perf_counter() + 0.05
+        await asyncio.gather(*(one(start + i / rps) for i in range(n)))
+        elapsed = time.perf_counter() - start
+
+    lat = np.asarray(latencies) if latencies else np.asarray([np.nan])
+    return {
+        "target_rps": float(rps),
+        "achieved_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "max_ms": float(np.max(lat)),
+        "requests": n,
+        "errors": errors,
+    }
+
+
+def run(target: str = "inprocess", rps: float = 100.0, duration_s: float = 10.0, batch: int = 1,
+        concurrency: int = 64, model: str = DEFAULT_MODEL, workers: int = 2, url: Optional[str] = None) -> Dict:
+    model = train_synthetic_model(model)
+    payload = sample_payload(model, batch)
+    if url:
+        server = contextlib.nullcontext(url)
+    elif target == "gunicorn":
+        server = gunicorn_server(model, workers)
+    else:
+        server = inprocess_server(model)
+    with server as base_url:
+        return asyncio.run(_drive(base_url, payload, rps, duration_s, concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", default="inprocess", choices=["inprocess", "gunicorn"])
+    parser.add_argument("--url", help="drive an already running server instead")
+    parser.add_argument("--rps", type=float, default=100.0, help="offered load (requests/s)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--batch", type=int, default=1, help="records per /predict request")
+    parser.add_argument("--concurrency", type=int, default=64, help="max open connections")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers (--target gunicorn)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="trained locally if missing")
+    args = parser.parse_args()
+
+    r = run(args.target, args.rps, args.duration, args.batch, args.concurrency, args.model, args.workers, args.url)
+    print(f"target {r['target_rps']:.0f} rps -> achieved {r['achieved_rps']:.1f} rps, "
+          f"p50 {r['p50_ms']:.2f} ms, p95 {r['p95_ms']:.2f} ms, p99 {r['p99_ms']:.2f} ms, "
+          f"max {r['max_ms']:.2f} ms, errors {r['errors']}/{r['requests']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Micro-benchmarks for the hot paths: ML.dtypes.cast_fn, the /predict handler
+body (compiled plan and pandas pipeline) and the temporal feature builders.
+
+    python -m bench.micro [--model bench/.artifacts/pipeline.joblib]
+"""
+import argparse
+import copy
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from ML.dtypes import cast_fn
+from ML.features import build_temporal_features, build_temporal_features_fast
+from bench.synthetic import DEFAULT_MODEL, synthetic_paysim, train_synthetic_model
+
+BATCH_SIZES = (1, 10, 100, 1000)
+
+
+def measure(fn: Callable[[], object], budget_s: float = 0.5, min_runs: int = 5, max_runs: int = 2000) -> Dict[str, float]:
+    """Calls ``fn`` until the time budget is spent; per-call p50/p95 in ms."""
+    fn()  # warm-up
+    samples: List[float] = []
+    deadline = time.perf_counter() + budget_s
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() < deadline):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"p50_ms": float(np.percentile(samples, 50)), "p95_ms": float(np.percentile(samples, 95)), "runs": len(samples)}
+
+
+def sample_records(pipe, n: int, seed: int = 0) -> List[Dict]:
+    """``n`` /predict records drawn from synthetic data featured like training."""
+    df = build_temporal_features_fast(synthetic_paysim(max(n, 1000), n_users=max(n, 1000) // 8, seed=seed))
+    return df[list(pipe.raw_feature_names_in_)].head(n).astype({"type": str}).to_dict("records")
+
+
+def run(model_path: str, budget_s: float = 0.5) -> Dict[str, Dict[str, float]]:
+    import app.main as api  # imported late: reads its env config at import
+
+    bundle = api.build_bundle(model_path)
+    pandas_bundle = copy.copy(bundle)
+    pandas_bundle.plan = None  # force the DataFrame path, as with USE_COMPILED_PLAN=0
+    pipe = bundle.model
+    cast_kwargs = pipe.named_steps["cast"].kw_args
+
+    results = {}
+    records = sample_records(pipe, max(BATCH_SIZES))
+    for n in BATCH_SIZES:
+        batch = records[:n]
+        frame = pd.DataFrame(batch)
+        results[f"cast_fn/batch={n}"] = measure(lambda: cast_fn(frame, **cast_kwargs), budget_s)
+        if bundle.plan is not None:
+            results[f"predict_handler/compiled/batch={n}"] = measure(
+                lambda: api._predict_unbatched(bundle, batch, True, time.perf_counter()), budget_s)
+        results[f"predict_handler/pipeline/batch={n}"] = measure(
+            lambda: api._predict_unbatched(pandas_bundle, batch, True, time.perf_counter()), budget_s)
+
+    raw = synthetic_paysim(50_000, n_users=6_000)
+    raw["nameOrig"] = raw["nameOrig"].astype("category")
+    results["build_temporal_features/pandas/rows=50000"] = measure(lambda: build_temporal_features(raw), budget_s, min_runs=3)
+    results["build_temporal_features/fast/rows=50000"] = measure(lambda: build_temporal_features_fast(raw), budget_s, min_runs=3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="trained locally if missing")
+    parser.add_argument("--budget-s", type=float, default=0.5, help="time spent per benchmark")
+    args = parser.parse_args()
+
+    results = run(train_synthetic_model(args.model), args.budget_s)
+    for name, r in results.items():
+        print(f"{name:<48} p50 {r['p50_ms']:>9.3f} ms   p95 {r['p95_ms']:>9.3f} ms   ({r['runs']} runs)")
+
+
+if __name__ == "__main__":
+    main()
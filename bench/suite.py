@@ -0,0 +1,135 @@
+"""
+Benchmark suite: runs the micro-benchmarks and a load test against a locally
+trained synthetic model, saves the numbers as a JSON baseline, and compares
+two result files to flag regressions.
+
+    pip install -r requirements-bench.txt   # serving requirements + the bench-only clients
+    python -m bench.suite run --out bench/.artifacts/baseline.json
+    python -m bench.suite run --out current.json --load-target gunicorn --rps 300
+    python -m bench.suite compare bench/.artifacts/baseline.json current.json --threshold 0.15
+
+``compare`` exits with status 1 when any metric got worse by more than the
+threshold (relative): ``*_ms`` metrics are lower-is-better, ``*_rps`` higher-is-
+better; counters and ``max_ms`` are informational. Baselines are machine-
+specific, so compare runs taken on the same host.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from bench.synthetic import DEFAULT_MODEL, train_synthetic_model
+
+LOWER_IS_BETTER = ("_ms",)
+HIGHER_IS_BETTER = ("_rps",)
+INFORMATIONAL = {"max_ms", "target_rps"}  # single samples / inputs, never gated
+
+
+def _git_sha() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(model: str, budget_s: float, load_target: str, rps: float, duration_s: float,
+              batch: int, workers: int) -> Dict:
+    from bench import load, micro
+
+    model = train_synthetic_model(model)
+    results = {f"micro/{name}": r for name, r in micro.run(model, budget_s).items()}
+    if load_target != "none":
+        print(f"[INFO] Load test: {load_target}, {rps:g} rps for {duration_s:g}s (batch={batch})", flush=True)
+        results[f"load/{load_target}/batch={batch}"] = load.run(
+            load_target, rps, duration_s, batch, model=model, workers=workers)
+    return {
+        "meta": {
+            "git_sha": _git_sha(),
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "model": os.path.abspath(model),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> Tuple[List[str], List[str]]:
+    """-> (report lines, regressed metric names)."""
+    lines, regressions = [], []
+    for bench, base in baseline["results"].items():
+        cur = current["results"].get(bench)
+        if cur is None:
+            lines.append(f"  {bench}: missing from current run")
+            continue
+        for metric, before in base.items():
+            after = cur.get(metric)
+            if after is None or not before or metric in INFORMATIONAL:
+                continue
+            if metric.endswith(LOWER_IS_BETTER):
+                change = (after - before) / before
+            elif metric.endswith(HIGHER_IS_BETTER):
+                change = (before - after) / before
+            else:
+                continue
+            flag = "REGRESSION" if change > threshold else ""
+            if flag:
+                regressions.append(f"{bench}.{metric}")
+            lines.append(f"  {bench + '.' + metric:<60} {before:>10.3f} -> {after:>10.3f}  "
+                         f"({'worse' if change > 0 else 'better'} {abs(change):.1%}) {flag}".rstrip())
+    return lines, regressions
+
+
+def _load(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="run the suite and write a JSON result file")
+    p_run.add_argument("--out", required=True)
+    p_run.add_argument("--model", default=DEFAULT_MODEL, help="trained locally if missing")
+    p_run.add_argument("--budget-s", type=float, default=0.5, help="time spent per micro-benchmark")
+    p_run.add_argument("--load-target", default="inprocess", choices=["inprocess", "gunicorn", "none"])
+    p_run.add_argument("--rps", type=float, default=100.0)
+    p_run.add_argument("--duration", type=float, default=10.0)
+    p_run.add_argument("--batch", type=int, default=1, help="records per /predict request in the load test")
+    p_run.add_argument("--workers", type=int, default=2, help="gunicorn workers (--load-target gunicorn)")
+
+    p_cmp = sub.add_parser("compare", help="compare a result file against a baseline")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--threshold", type=float, default=0.15, help="relative slowdown tolerated per metric")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run_suite(args.model, args.budget_s, args.load_target, args.rps, args.duration,
+                           args.batch, args.workers)
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Wrote {len(report['results'])} benchmark results to {args.out}")
+        return
+
+    baseline, current = _load(args.baseline), _load(args.current)
+    print(f"Baseline {baseline['meta']['git_sha']} ({baseline['meta']['created_at']}) vs "
+          f"current {current['meta']['git_sha']} ({current['meta']['created_at']}), threshold {args.threshold:.0%}")
+    lines, regressions = compare(baseline, current, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n[FAIL] {len(regressions)} metric(s) regressed beyond {args.threshold:.0%}")
+        sys.exit(1)
+    print("\n[OK] No regressions beyond threshold")
+
+
+if __name__ == "__main__":
+    main()
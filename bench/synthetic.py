@@ -0,0 +1,73 @@
+"""
+Synthetic PaySim-shaped data and a small locally trained model, so the
+benchmarks run without the real dataset or Azure.
+
+    python -m bench.synthetic --out bench/.artifacts/pipeline.joblib
+"""
+import argparse
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from ML.features import build_temporal_features_fast
+
+TYPES = ["CASH_IN", "CASH_OUT", "DEBIT", "PAYMENT", "TRANSFER"]
+DEFAULT_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".artifacts", "pipeline.joblib")
+
+
+def synthetic_paysim(n_rows: int, n_users: int, n_steps: int = 743, seed: int = 0) -> pd.DataFrame:
+    """
+    Raw PaySim columns (step, type, amount, nameOrig, isFraud), sorted by step
+    like the real file. Fraud is rare and concentrated in large TRANSFER /
+    CASH_OUT bursts, so the temporal features carry signal.
+    """
+    rng = np.random.default_rng(seed)
+    types = rng.choice(TYPES, n_rows, p=[0.22, 0.35, 0.01, 0.34, 0.08])
+    amount = np.round(rng.lognormal(8, 1.5, n_rows), 2)
+    risky = np.isin(types, ["TRANSFER", "CASH_OUT"]) & (amount > np.quantile(amount, 0.9))
+    fraud = risky & (rng.random(n_rows) < 0.15)
+    df = pd.DataFrame({
+        "step": rng.integers(1, n_steps + 1, n_rows).astype("int32"),
+        "type": pd.Categorical(types, categories=TYPES),
+        "amount": amount.astype("float32"),
+        "nameOrig": pd.Categorical([f"C{u}" for u in rng.integers(0, n_users, n_rows)]),
+        "isFraud": fraud.astype("int8"),
+    })
+    return df.sort_values("step", kind="mergesort").reset_index(drop=True)
+
+
+def train_synthetic_model(out: str = DEFAULT_MODEL, n_rows: int = 50_000, model_type: str = "xgb",
+                          n_estimators: int = 50, force: bool = False) -> str:
+    """Trains a small pipeline with ML/train.py's builder and serving metadata; reused if already on disk."""
+    if os.path.exists(out) and not force:
+        return out
+    from ML.train import attach_metadata, build_pipeline, cached_cols, fit_pipeline, split, type_categories
+
+    df = build_temporal_features_fast(synthetic_paysim(n_rows, n_users=n_rows // 8))[cached_cols]
+    X_train, X_val, _, y_train, y_val, _ = split(df)
+    type_cats = type_categories(X_train)
+    pipe = build_pipeline(model_type, type_cats, y_train, {"n_estimators": n_estimators}, verbose=False)
+    fit_pipeline(pipe, model_type, X_train, y_train, X_val, y_val, verbose=False)
+    attach_metadata(pipe, type_cats)
+
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    tmp = f"{out}.{os.getpid()}.tmp"
+    joblib.dump(pipe, tmp)
+    os.replace(tmp, out)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", default=DEFAULT_MODEL)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--model-type", default="xgb", choices=["xgb", "rf"])
+    parser.add_argument("--force", action="store_true", help="retrain even if --out exists")
+    args = parser.parse_args()
+    print(train_synthetic_model(args.out, args.rows, args.model_type, force=args.force))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,3 +9,19 @@ keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "10"))
 accesslog = "-"
 errorlog = "-"
 loglevel = os.getenv("LOG_LEVEL", "info")
+
+# Preload: the master downloads + loads the model once, workers share it copy-on-write
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+
+def on_starting(server):
+    if preload_app:
+        from app.main import preload_model
+        preload_model()
+
+
+def on_reload(server):
+    # SIGHUP from a worker that hot-reloaded / rolled back: load that version here, before workers respawn
+    if preload_app:
+        from app.main import reload_preloaded
+        reload_preloaded()
@@ -0,0 +1,27 @@
+import os
+import sys
+
+# app/ and ML/ are imported as top-level packages from the repo root (as uvicorn/gunicorn run them)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def synthetic_model(tmp_path_factory) -> str:
+    """A small XGB pipeline trained with ML/train.py's builder (bench/synthetic.py)."""
+    from bench.synthetic import train_synthetic_model
+
+    return train_synthetic_model(str(tmp_path_factory.mktemp("model") / "pipeline.joblib"), n_rows=5000,
+                                 n_estimators=10)
+
+
+@pytest.fixture
+def api(monkeypatch, synthetic_model):
+    """app.main serving ``synthetic_model``; set its config globals with monkeypatch before entering TestClient."""
+    import app.main as main
+
+    monkeypatch.setattr(main, "MODEL_FILE", synthetic_model)
+    monkeypatch.setattr(main, "_bundle", None)
+    monkeypatch.setattr(main, "_prediction_cache", None)  # the lifespan only sets it when PREDICTION_CACHE is on
+    return main
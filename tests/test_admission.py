@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app.admission as admission
+from app.admission import InferenceExecutor, Overloaded
+
+
+@pytest.fixture
+def slow_clock(monkeypatch):
+    """A clock read that yields the GIL, so any gap between the depth check and the increment gets interleaved."""
+    def perf_counter() -> float:
+        time.sleep(0.001)
+        return time.perf_counter()
+
+    monkeypatch.setattr(admission, "time", SimpleNamespace(perf_counter=perf_counter, monotonic=time.monotonic))
+
+
+def _wait_for(predicate, timeout_s: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_get_exactly_the_overflow_as_429(slow_clock):
+    max_queue, callers = 5, 64
+    executor = InferenceExecutor(concurrency=1, max_queue=max_queue, budget_s=0)
+    release = threading.Event()
+    results, lock = [], threading.Lock()
+
+    def request() -> None:
+        try:
+            asyncio.run(executor.call(release.wait))
+            outcome = 200
+        except Overloaded as e:
+            outcome = e.status_code
+        with lock:
+            results.append(outcome)
+
+    blocker = threading.Thread(target=request, daemon=True)
+    blocker.start()
+    _wait_for(lambda: executor.in_flight == 1)  # the only slot is taken: everything else queues or is shed
+
+    start = threading.Barrier(callers)
+    threads = [threading.Thread(target=lambda: (start.wait(), request()), daemon=True) for _ in range(callers)]
+    try:
+        for t in threads:
+            t.start()
+        _wait_for(lambda: len(results) + executor.queued == callers)  # every caller was shed or is queued
+        assert executor.queued == max_queue
+        assert results.count(429) == callers - max_queue
+    finally:
+        release.set()
+        for t in threads + [blocker]:
+            t.join(timeout=10)
+        executor.shutdown()
+    assert results.count(200) == max_queue + 1
+    assert executor.queued == 0 and executor.in_flight == 0
@@ -0,0 +1,40 @@
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+
+from app.columnar import ARROW_STREAM, records_to_arrow
+from bench.micro import sample_records
+
+
+def _arrow_body(table: pa.Table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+@pytest.fixture
+def records(synthetic_model):
+    import joblib
+
+    return sample_records(joblib.load(synthetic_model), 4)
+
+
+def test_arrow_body_scores_like_json(api, records):
+    with TestClient(api.app) as client:
+        features = api._bundle.plan.features
+        expected = client.post("/predict", json={"records": records}).json()
+        got = client.post("/predict", content=records_to_arrow(records, features),
+                          headers={"Content-Type": ARROW_STREAM, "Accept": "application/json"}).json()
+    assert got["predictions"] == expected["predictions"]
+
+
+@pytest.mark.parametrize("type_column", [pa.array([1, 2, 3, 4], pa.int64()),
+                                         pa.array([1, 2, 3, 4], pa.int64()).dictionary_encode()])
+def test_non_string_type_column_is_a_400(api, records, type_column):
+    with TestClient(api.app) as client:
+        features = api._bundle.plan.features
+        table = pa.table({c: type_column if c == "type" else pa.array([r[c] for r in records]) for c in features})
+        resp = client.post("/predict", content=_arrow_body(table), headers={"Content-Type": ARROW_STREAM})
+    assert resp.status_code == 400
+    assert "'type'" in resp.json()["detail"]
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import feature_store
+from app.feature_store import InMemoryFeatureStore, RedisFeatureStore
+from bench.synthetic import synthetic_paysim
+from ML.features import LONG_WINDOW_H, TEMPORAL_FEATURES, build_temporal_features
+
+INT_FEATURES = ["tx_count_2h", "tx_count_6h", "tx_count_so_far", "is_returning_user"]
+
+
+def _redis_store(**kwargs) -> RedisFeatureStore:
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis runs the Lua script with lupa
+    return RedisFeatureStore(None, client=fakeredis.FakeRedis(), **kwargs)
+
+
+def _replay(store, df: pd.DataFrame) -> pd.DataFrame:
+    events = zip(df["nameOrig"].astype(str), df["step"], df["amount"])
+    return pd.DataFrame(store.update_many(events))
+
+
+def _reference(df: pd.DataFrame) -> pd.DataFrame:
+    """build_temporal_features, back in the input row order."""
+    out = build_temporal_features(df.assign(_row=np.arange(len(df))))
+    return out.sort_values("_row").reset_index(drop=True)
+
+
+def _assert_parity(online: pd.DataFrame, reference: pd.DataFrame) -> None:
+    for col in TEMPORAL_FEATURES:
+        expected = reference[col].to_numpy()
+        if col in INT_FEATURES:
+            np.testing.assert_array_equal(online[col].to_numpy(), expected, err_msg=col)
+        else:
+            np.testing.assert_array_equal(online[col].to_numpy(np.float32), expected, err_msg=col)
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_replay_matches_build_temporal_features(backend):
+    # few users, many events each: busy windows, same-step bursts and long gaps
+    df = synthetic_paysim(3000, n_users=60, n_steps=200, seed=7)
+    store = InMemoryFeatureStore() if backend == "memory" else _redis_store()
+
+    _assert_parity(_replay(store, df), _reference(df))
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_ring_buffer_rollover(backend):
+    # one user: same-step repeats, steps that drop out of the 2h / 6h windows, gaps longer than the buffer
+    steps = [1, 1, 1, 2, 3, 5, 7, 7, 8, 9, 10, 11, 12, 13, 13, 20, 21, 40]
+    amounts = [float(10 + 7 * i) for i in range(len(steps))]
+    amounts[4] = 1e6  # a large maximum that must leave tx_max_amt_2h once its bucket rolls out
+    df = pd.DataFrame({"step": np.int32(steps), "nameOrig": "C1", "amount": np.float32(amounts),
+                       "type": "TRANSFER", "isFraud": np.int8(0)})
+    store = InMemoryFeatureStore() if backend == "memory" else _redis_store()
+
+    _assert_parity(_replay(store, df), _reference(df))
+    if backend == "memory":
+        assert len(store._users["C1"].buckets) <= LONG_WINDOW_H
+
+
+def test_ttl_drops_idle_users(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(feature_store.time, "monotonic", lambda: now[0])
+    store = InMemoryFeatureStore(ttl_s=60)
+
+    store.update("C1", 1, 10.0)
+    store.update("C2", 1, 10.0)
+    now[0] += 30
+    assert store.update("C1", 2, 10.0)["tx_count_so_far"] == 1
+    now[0] += 45  # C2 idle for 75 s, C1 for 45 s
+    store.update("C3", 3, 10.0)
+
+    assert len(store) == 2  # C2 evicted
+    assert store.update("C1", 4, 10.0)["tx_count_so_far"] == 2
+    now[0] += 61
+    fresh = store.update("C1", 5, 10.0)  # expired: starts over
+    assert (fresh["tx_count_so_far"], fresh["hours_since_last_tx"]) == (0, -1.0)
+
+
+def test_lru_cap_evicts_least_recently_seen():
+    store = InMemoryFeatureStore(max_users=2)
+    store.update("A", 1, 1.0)
+    store.update("B", 1, 1.0)
+    store.update("A", 2, 1.0)  # A is now the most recent
+    store.update("C", 2, 1.0)  # evicts B
+
+    assert len(store) == 2
+    assert store.update("A", 3, 1.0)["tx_count_so_far"] == 2
+    assert store.update("B", 3, 1.0)["tx_count_so_far"] == 0
+
+
+def test_redis_keys_expire_after_ttl():
+    store = _redis_store(ttl_s=120)
+    store.update("C1", 1, 10.0)
+
+    assert 0 < store._client.ttl("fraud:fs:C1") <= 120
+    store._client.delete("fraud:fs:C1")  # what expiry does
+    assert store.update("C1", 2, 10.0)["tx_count_so_far"] == 0
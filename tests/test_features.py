@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench.synthetic import synthetic_paysim
+from ML.features import (TEMPORAL_FEATURES, StreamingTemporalFeatures, build_temporal_features,
+                         build_temporal_features_fast)
+
+
+@pytest.fixture(scope="module", params=["paysim", "bursts"])
+def paysim(request) -> pd.DataFrame:
+    if request.param == "bursts":  # few users, few hours: many same-step rows per user
+        return synthetic_paysim(20_000, n_users=40, n_steps=48, seed=1)
+    return synthetic_paysim(20_000, n_users=2_500)
+
+
+@pytest.fixture(scope="module")
+def reference(paysim) -> pd.DataFrame:
+    return build_temporal_features(paysim)
+
+
+@pytest.mark.parametrize("n_partitions", [1, 4])
+def test_fast_engine_matches_pandas_exactly(paysim, reference, n_partitions):
+    pd.testing.assert_frame_equal(build_temporal_features_fast(paysim, n_partitions=n_partitions), reference,
+                                  check_exact=True)
+
+
+def test_streaming_matches_pandas_across_chunks_and_a_save_load(paysim, reference, tmp_path):
+    """Chunk boundaries cut through users' windows and same-step rows; the state is reloaded halfway."""
+    bounds = [0, 1_000, 1_001, 4_321, 9_000, 9_500, 15_000, len(paysim)]
+    state, parts = StreamingTemporalFeatures(), []
+    for i, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+        if i == 4:
+            state.save(str(tmp_path / "state.npz"))
+            state = StreamingTemporalFeatures.load(str(tmp_path / "state.npz"))
+        parts.append(state.transform(paysim.iloc[lo:hi]))
+    streamed = pd.concat(parts, ignore_index=True)
+
+    # build_temporal_features orders rows by (user, step), stable; the stream keeps input order
+    order = np.lexsort((paysim["step"].to_numpy(), paysim["nameOrig"].cat.codes.to_numpy()))
+    columns = ["step", "nameOrig", "amount"] + TEMPORAL_FEATURES + ["amount_log"]
+    pd.testing.assert_frame_equal(streamed.take(order).reset_index(drop=True)[columns], reference[columns],
+                                  check_exact=True)
+    assert state.rows_seen == len(paysim)
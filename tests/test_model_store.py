@@ -0,0 +1,186 @@
+import hashlib
+import os
+
+import pytest
+
+from app.model_store import ArtifactCache, ChecksumError, ModelReloader
+
+
+class FileSource:
+    """Stand-in for BlobArtifactSource over a local file: ETag changes with every upload."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.uploads = 0
+        self.bad_md5 = False
+
+    def upload(self, data: bytes) -> None:
+        with open(self.path, "wb") as f:
+            f.write(data)
+        self.uploads += 1
+
+    def properties(self):
+        with open(self.path, "rb") as f:
+            md5 = hashlib.md5(f.read()).digest()
+        return {"etag": f'"0x{self.uploads}"', "size": os.path.getsize(self.path),
+                "content_md5": hashlib.md5(b"other").digest() if self.bad_md5 else md5}
+
+    def chunks(self, etag=None):
+        assert etag is None or etag == self.properties()["etag"]
+        with open(self.path, "rb") as f:
+            yield from iter(lambda: f.read(4), b"")
+
+
+class Worker:
+    """One gunicorn worker: its own live version, reloader and (shared) cache directory."""
+
+    def __init__(self, source, cache_dir, keep=3, publish=None):
+        self.live = None
+        self.loads = 0
+        self.reloader = ModelReloader(source, ArtifactCache(cache_dir, keep=keep), load_fn=self._load,
+                                      swap_fn=self._swap, active_digest=lambda: self.live, publish=publish)
+
+    def _load(self, path, digest, meta):
+        self.loads += 1
+        with open(path, "rb") as f:
+            return digest, f.read()
+
+    def _swap(self, bundle):
+        self.live = bundle[0]
+
+    def start(self, artifact: str, etag=None) -> str:
+        """Like app.main._make_reloader: adopt the startup model (``etag``: the blob version it was downloaded from)."""
+        digest = self.reloader.cache.put_file(artifact)
+        self.live = digest
+        self.reloader.adopt(digest, etag=etag)
+        return digest
+
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def source(tmp_path):
+    src = FileSource(str(tmp_path / "blob.joblib"))
+    src.upload(b"model-v1")
+    return src
+
+
+@pytest.fixture
+def startup_file(tmp_path):
+    path = tmp_path / "pipeline.joblib"
+    path.write_bytes(b"model-v1")
+    return str(path)
+
+
+def test_checksum_mismatch_raises_and_leaves_nothing_behind(tmp_path, source, startup_file):
+    w = Worker(source, str(tmp_path / "cache"))
+    v1 = w.start(startup_file)
+    source.upload(b"model-v2")
+    source.bad_md5 = True
+
+    with pytest.raises(ChecksumError):
+        w.reloader.poll_once()
+
+    cache = w.reloader.cache
+    assert w.live == v1
+    assert cache.active()["sha256"] == v1
+    assert not cache.has(_sha(b"model-v2"))
+    assert not [n for n in os.listdir(cache.root) if n.startswith(".download.")]
+
+
+def test_one_worker_downloads_and_the_others_follow(tmp_path, source, startup_file):
+    workers = [Worker(source, str(tmp_path / "cache")) for _ in range(3)]
+    for w in workers:
+        w.start(startup_file)
+    source.upload(b"model-v2")
+    downloads = []
+    chunks = source.chunks
+    source.chunks = lambda etag=None: downloads.append(etag) or chunks(etag)
+
+    assert all(w.reloader.poll_once() for w in workers)
+    assert {w.live for w in workers} == {_sha(b"model-v2")}
+    assert downloads == [source.properties()["etag"]]  # once per pod, not once per worker
+
+
+def test_rollback_pin_survives_polls_in_every_worker(tmp_path, source, startup_file):
+    a, b = Worker(source, str(tmp_path / "cache")), Worker(source, str(tmp_path / "cache"))
+    v1 = a.start(startup_file)
+    b.start(startup_file)
+    source.upload(b"model-v2")
+    a.reloader.poll_once()
+    b.reloader.poll_once()
+    assert a.live == b.live == _sha(b"model-v2")
+
+    a.reloader.activate(v1, pin=True)
+    for _ in range(2):
+        a.reloader.poll_once()
+        b.reloader.poll_once()
+    assert a.live == b.live == v1
+
+    source.upload(b"model-v3")  # a new upload releases the pin
+    a.reloader.poll_once()
+    b.reloader.poll_once()
+    assert a.live == b.live == _sha(b"model-v3")
+
+
+def test_pin_before_the_first_poll_holds(tmp_path, source, startup_file):
+    w = Worker(source, str(tmp_path / "cache"))
+    v1 = w.start(startup_file)
+    w.reloader.cache.put_stream([b"model-v0"])  # an older version still in the cache
+    v0 = _sha(b"model-v0")
+
+    w.reloader.activate(v0, pin=True)  # no poll yet: last_etag is None
+    assert w.reloader.last_etag is None
+    assert w.reloader.cache.active()["pinned_etag"] == source.properties()["etag"]
+    assert w.reloader.poll_once() is False
+    assert w.live == v0 != v1
+
+
+def test_prune_keeps_the_active_version(tmp_path, source, startup_file):
+    w = Worker(source, str(tmp_path / "cache"), keep=1)
+    v1 = w.start(startup_file)
+    w.reloader.activate(v1, pin=True)
+    cache = w.reloader.cache
+    for i in range(3):  # newer, more recently activated versions
+        digest = cache.put_stream([f"model-v{i + 2}".encode()])
+        cache.update_meta(digest, activated_at=1e12 + i)
+
+    cache.prune()
+
+    assert cache.active()["sha256"] == v1
+    assert cache.has(v1)
+    assert [m["sha256"] for m in cache.entries()] == [_sha(b"model-v4"), v1]
+
+
+def test_publish_hands_new_versions_to_the_master(tmp_path, source, startup_file):
+    published = []
+    workers = [Worker(source, str(tmp_path / "cache"), publish=published.append) for _ in range(2)]
+    for w in workers:
+        w.start(startup_file)
+    source.upload(b"model-v2")
+
+    for w in workers:
+        w.reloader.poll_once()
+
+    assert published == [_sha(b"model-v2")]  # once, by the worker that changed the marker
+    assert all(w.loads == 0 for w in workers)  # nothing loaded in the workers
+
+
+@pytest.mark.parametrize("etag_known", [True, False])
+def test_unchanged_blob_publishes_nothing_after_startup(tmp_path, source, startup_file, etag_known):
+    published, downloads = [], []
+    chunks = source.chunks
+    source.chunks = lambda etag=None: downloads.append(etag) or chunks(etag)
+    workers = [Worker(source, str(tmp_path / "cache"), publish=published.append) for _ in range(2)]
+    for w in workers:
+        w.start(startup_file, etag=source.properties()["etag"] if etag_known else None)
+
+    for w in workers:
+        assert w.reloader.poll_once() is False
+
+    assert published == []
+    # without the startup ETag (model baked into the image) the blob is fetched once to compare contents
+    assert downloads == ([] if etag_known else [source.properties()["etag"]])
+    assert workers[0].reloader.cache.active()["etag"] == source.properties()["etag"]
@@ -0,0 +1,58 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.admission import Overloaded
+from bench.micro import sample_records
+
+
+@pytest.fixture
+def records(synthetic_model):
+    import joblib
+
+    return sample_records(joblib.load(synthetic_model), 6)
+
+
+@pytest.mark.parametrize("batching", [True, False])
+def test_partly_cached_request_scores_only_the_misses(api, monkeypatch, records, batching):
+    monkeypatch.setattr(api, "PREDICTION_CACHE", True)
+    monkeypatch.setattr(api, "PREDICT_BATCHING", batching)
+    with TestClient(api.app) as client:
+        expected = client.post("/predict", json={"records": records}).json()
+        api._prediction_cache.clear_local()
+
+        client.post("/predict", json={"records": records[:3]}).raise_for_status()  # warm half of them
+        scored = []
+        if batching:
+            submit = api._batcher.submit
+            monkeypatch.setattr(api._batcher, "submit", lambda recs: scored.append(len(recs)) or submit(recs))
+        else:
+            score = api._score_records
+
+            def counting(bundle, recs, return_proba, t0, timings, cached):
+                scored.append(sum(h is None for h in cached[1]))
+                return score(bundle, recs, return_proba, t0, timings, cached)
+
+            monkeypatch.setattr(api, "_score_records", counting)
+        got = client.post("/predict", json={"records": records}).json()
+
+    assert scored == [3]
+    assert got["predictions"] == expected["predictions"]
+    assert got["probabilities"] == pytest.approx(expected["probabilities"], abs=1e-6)
+
+
+def test_fully_cached_request_needs_no_inference_slot(api, monkeypatch, records):
+    monkeypatch.setattr(api, "PREDICTION_CACHE", True)
+    monkeypatch.setattr(api, "PREDICT_BATCHING", True)
+    with TestClient(api.app) as client:
+        first = client.post("/predict", json={"records": records}).json()
+
+        def shed(*args, **kwargs):
+            raise Overloaded("queue_full", 429, 1.0, "full")
+
+        monkeypatch.setattr(api._executor, "admit", shed)
+        cached = client.post("/predict", json={"records": records})
+        partial = client.post("/predict", json={"records": records + [{**records[0], "amount": 1.0}]})
+
+    assert cached.status_code == 200
+    assert cached.json()["predictions"] == first["predictions"]
+    assert partial.status_code == 429  # anything left to score still goes through admission
@@ -0,0 +1,32 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _worker_threads():
+    from threadpoolctl import threadpool_info
+
+    import ML.score as score
+
+    estimator = score._pipe.steps[-1][1]
+    nthread = int(estimator.get_booster().save_config().split('"nthread":"')[1].split('"')[0])
+    return estimator.n_jobs, nthread, {p["num_threads"] for p in threadpool_info()}
+
+
+def test_workers_are_pinned_after_loading(synthetic_model):
+    """The artifact is trained with n_jobs=-1; each scoring worker must run its share of the CPUs, not all of them."""
+    import ML.score as score
+
+    with ProcessPoolExecutor(max_workers=1, initializer=score._init_worker, initargs=(synthetic_model, 1)) as pool:
+        n_jobs, nthread, pools = pool.submit(_worker_threads).result()
+    assert n_jobs == 1
+    assert nthread == 1
+    assert pools <= {1}
+
+
+def test_batch_scorer_does_not_import_the_serving_app():
+    import subprocess
+    import sys
+
+    code = "import sys, ML.score; print(sorted(m for m in sys.modules if m.split('.')[0] in ('app', 'prometheus_client')))"
+    out = subprocess.check_output([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(__file__)), text=True)
+    assert out.strip() == "[]"
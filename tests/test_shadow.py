@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from bench.micro import sample_records
+
+
+@pytest.mark.parametrize("batching", [True, False])
+def test_challengers_get_the_champions_encoded_rows(api, monkeypatch, synthetic_model, tmp_path, batching):
+    """Every /predict path hands the shadow scorer its encoded matrix, so challengers don't re-encode."""
+    import joblib
+
+    monkeypatch.setattr(api, "CHALLENGER_MODELS", f"twin={synthetic_model}")
+    monkeypatch.setattr(api, "SHADOW_LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(api, "PREDICT_BATCHING", batching)
+    records = sample_records(joblib.load(synthetic_model), 5)
+    with TestClient(api.app) as client:
+        offered = []
+        offer = api._shadow.offer
+        monkeypatch.setattr(api._shadow, "offer", lambda batch: offered.append(batch) or offer(batch))
+        client.post("/predict", json={"records": records}).raise_for_status()
+        expected = api._bundle.plan.encode(records)
+
+    assert len(offered) == 1
+    assert offered[0].X is not None
+    np.testing.assert_array_equal(offered[0].X, expected)
@@ -0,0 +1,26 @@
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from bench.micro import sample_records
+
+
+@pytest.mark.parametrize("compiled_plan", [True, False])
+def test_bad_type_is_a_per_line_error(api, monkeypatch, synthetic_model, compiled_plan):
+    """A list/dict ``type`` is reported on its own line; the rest of the stream is still scored."""
+    import joblib
+
+    monkeypatch.setattr(api, "USE_COMPILED_PLAN", compiled_plan)
+    good = sample_records(joblib.load(synthetic_model), 3)
+    body = [good[0], {**good[1], "type": ["PAYMENT"]}, {**good[1], "type": {"a": 1}}, good[2]]
+    with TestClient(api.app) as client:
+        assert (api._bundle.plan is not None) == compiled_plan
+        resp = client.post("/predict/stream", content=b"\n".join(orjson.dumps(r) for r in body))
+    lines = [orjson.loads(line) for line in resp.content.splitlines()]
+
+    assert resp.status_code == 200
+    assert [line.get("line") for line in lines[:-1]] == [1, 2, 3, 4]
+    assert "prediction" in lines[0] and "prediction" in lines[3]
+    assert lines[1]["error"].startswith("Unknown category in 'type'")
+    assert lines[2]["error"].startswith("Unknown category in 'type'")
+    assert lines[-1]["summary"]["errors"] == 2
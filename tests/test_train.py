@@ -0,0 +1,17 @@
+import os
+
+import joblib
+
+
+def test_save_creates_missing_directories_and_leaves_no_temp_file(synthetic_model, tmp_path):
+    """MODEL_ARTIFACT may point into a directory that does not exist yet (e.g. model/challengers/rf.joblib)."""
+    from ML.train import save
+
+    pipe = joblib.load(synthetic_model)
+    path = tmp_path / "challengers" / "xgb.joblib"
+    native = tmp_path / "native" / "xgb.native.tar"
+    save(pipe, str(path), str(native))
+
+    assert list(joblib.load(path).raw_feature_names_in_) == list(pipe.raw_feature_names_in_)
+    assert native.exists()
+    assert not [n for n in os.listdir(path.parent) if n.endswith(".tmp")]
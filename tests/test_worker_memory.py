@@ -0,0 +1,29 @@
+import os
+import socket
+
+import pytest
+
+pytest.importorskip("gunicorn")
+if not os.path.exists("/proc/self/smaps_rollup"):
+    pytest.skip("needs Linux /proc/<pid>/smaps_rollup", allow_module_level=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_preloaded_workers_share_the_model(synthetic_model, tmp_path):
+    """
+    With preload each worker's private memory (pages it has its own copy of)
+    stays a small fraction of what a worker costs when it loads the model
+    itself: the model and the libraries behind it stay shared with the master.
+    """
+    from bench.bench_worker_memory import measure
+
+    env = {"MODEL_DIR": str(tmp_path), "MODEL_FILE": synthetic_model}
+    _, _, own_copy = measure(2, preload=False, port=_free_port(), warm_requests=10, env=env)
+    _, _, shared = measure(2, preload=True, port=_free_port(), warm_requests=10, env=env)
+    assert len(shared) == 2
+    assert max(shared) < 0.4 * min(own_copy), (shared, own_copy)